@@ -1,295 +1,543 @@
 import os  # the os module is used for file and directory operations
+import io  # the io module is used to build the compressed data in memory
 import math  # the math module provides access to mathematical functions
+import sys  # the sys module is used for the standard input/output streams
+import struct  # the struct module is used to pack the original size
+from LZWCore import FREEZE, LZWEncoder, encode_symbols, decode_bytes, \
+   peak_dict_size  # the shared LZW dictionary engine
+from LZWBits import BitPacker, make_code_length_field, pack_code_stream, \
+   parse_code_length_field, unpack_code_stream, \
+   variable_code_widths  # the shared bit packing utilities
+from LZWContainer import TEXT, ContainerWriter, feature_flags, is_path, \
+   map_file, read_data  # the container format of the compressed files
+from LZWStats import RunStats, count, \
+   measure  # the statistics of the compression and decompression runs
+from LZWEntropy import entropy_id  # the entropy coders of the code stream
+from LZWBlocks import BlockedTextReader, check_block_size, is_blocked_file, \
+   write_blocked_data  # the blocked mode (random access by range or line)
+
+# the highest bit of the padding info (the first byte of a compressed file)
+# shows that the original size (8 bytes) follows the code length info, so the
+# decompressor can allocate the output at once (the streaming compressor does
+# not know the size in advance and writes the file without it)
+ORIGINAL_SIZE_FLAG = 0x80
+PADDING_MASK = 0x7F
 
 # A class that implements the LZW compression and decompression algorithms as
 # well as the necessary utility methods for text files.
 # ------------------------------------------------------------------------------
 class LZWCoding:
-   # A constructor with two input parameters
+   # A constructor with two input parameters (and optional parameters to write
+   # the codes in the variable-width mode or with an entropy coder, to limit
+   # the dictionary size and to compress the input in independent blocks)
    # ---------------------------------------------------------------------------
-   def __init__(self, filename, data_type):
+   def __init__(self, filename, data_type, variable_width=False,
+                max_code_length=None, policy=FREEZE, entropy=None,
+                block_size=None, parallel=True, progress=None,
+                trace_memory=False, profile=False, verbose=False):
       # use the input parameters to set the instance variables
       self.filename = filename
-      self.data_type = data_type   # e.g., 'text'
+      # e.g., 'text' or 'binary' (in the binary mode the file is read and
+      # written as bytes without any changes, so any file can be compressed
+      # without a loss)
+      self.data_type = data_type
+      # write each code with just enough bits (starting from 9 bits) instead of
+      # using codelength bits for all codes
+      self.variable_width = variable_width
+      # limit the dictionary to 2**max_code_length entries (None: no limit)
+      # and handle a full dictionary by using the given policy ('freeze',
+      # 'reset' or 'lru')
+      self.max_code_length = max_code_length
+      self.policy = policy
+      # entropy code the integer codes ('huffman' or 'range', see LZWEntropy)
+      # instead of writing each code with codelength bits (None: no entropy
+      # coder; the decompressor reads the coder from the compressed file)
+      entropy_id(entropy, variable_width)
+      self.entropy = entropy
+      # compress every block_size bytes of the input with a new dictionary and
+      # store an index of the blocks, so a byte range or a range of lines can
+      # be decoded without decoding the whole file (see LZWBlocks and
+      # read_range / read_lines; None: a single code stream)
+      if block_size is not None:
+         check_block_size(block_size)
+      self.block_size = block_size
+      # compress and decompress the blocks of the blocked mode in worker
+      # processes (one for each CPU), so a large input is not coded by a
+      # single core (the output does not depend on the number of workers);
+      # only used with block_size, since the blocks restart the dictionary
+      # and the input is never split into blocks without it
+      self.parallel = parallel
+      # a function that is called as progress(stage, done, total) while the
+      # data is encoded or decoded (e.g., to update a progress bar)
+      self.progress = progress
+      # the statistics of the last compression or decompression run (see
+      # LZWStats) and whether they include the peak memory of each stage and
+      # a profile of the hot stages
+      self.stats = None
+      self.trace_memory = trace_memory
+      self.profile = profile
+      # print the details of each file compressed or decompressed by the file
+      # methods (otherwise nothing is printed; the details are in self.stats)
+      self.verbose = verbose
       # initialize the code length as None 
       # (the actual value is determined based on the compressed data)
       self.codelength = None
 
+   # A method that compresses the given text (str) or bytes in memory and
+   # returns the bytes of the compressed file (see also LZWApi).
+   # ---------------------------------------------------------------------------
+   def compress(self, data):
+      # start collecting the statistics of the run
+      self.stats = RunStats(type(self).__name__, 'compress',
+                            self.trace_memory, self.profile)
+      compressed_data = self.compress_data(data)
+      self.stats.finish(self.original_size, len(compressed_data))
+      return compressed_data
+
+   # A method that compresses the given text or bytes into the bytes of a
+   # container file (used by compress and compress_text_file, which start the
+   # statistics of the run).
+   # ---------------------------------------------------------------------------
+   def compress_data(self, data):
+      # in the blocked mode, compress each block separately and write the
+      # blocks and their index to the data section
+      if self.block_size:
+         return self.compress_blocks(data)
+      # encode the text by using the LZW compression algorithm
+      encoded_text_as_integers = self.encode(data)
+      # pack the integer codes into bytes (codelength bits for each code, a
+      # growing number of bits in the variable-width mode or entropy coded)
+      # and get the number of zeros added to the end for padding (the padding
+      # info also records the entropy coder)
+      with measure(self.stats, 'pack'):
+         packed_codes, extra_bits, codelength_info = pack_code_stream(
+            encoded_text_as_integers, self.codelength, self.variable_width,
+            self.policy, entropy=self.entropy)
+      # add the padding info, the code length info and the original size to
+      # the beginning of the compressed data (the compressed data should
+      # contain everything needed to decompress it) and put it into the data
+      # section of a container (which records the codec and the checksum of
+      # the data)
+      out_buffer = io.BytesIO()
+      with ContainerWriter(out_buffer, TEXT, feature_flags(self)) as container:
+         container.write(bytes([extra_bits | ORIGINAL_SIZE_FLAG, codelength_info]))
+         container.write(struct.pack('>Q', self.original_size))
+         container.write(packed_codes)
+      return out_buffer.getvalue()
+
+   # A method that compresses the given text or bytes in the blocked mode into
+   # the bytes of a container file (see LZWBlocks).
+   # ---------------------------------------------------------------------------
+   def compress_blocks(self, data):
+      symbols = to_symbols(data)
+      out_buffer = io.BytesIO()
+      with ContainerWriter(out_buffer, TEXT, feature_flags(self)) as container:
+         blocks = write_blocked_data(self, container, symbols, self.block_size,
+                                     self.parallel)
+      # the size of the whole input and the longest code length of the blocks
+      self.original_size = len(symbols)
+      self.codelength = max((parse_code_length_field(block[1])[0]
+                             for block in blocks), default=8)
+      return out_buffer.getvalue()
+
+   # A method that compresses a single block with a new dictionary and returns
+   # its bytes (the padding info, the code length info and the codes).
+   # ---------------------------------------------------------------------------
+   def compress_block(self, symbols):
+      encoded_block = self.encode(symbols)
+      with measure(self.stats, 'pack'):
+         packed_codes, extra_bits, codelength_info = pack_code_stream(
+            encoded_block, self.codelength, self.variable_width, self.policy,
+            entropy=self.entropy)
+      return bytes([extra_bits, codelength_info]) + packed_codes
+
    # A method that compresses the contents of a text file to a binary output file 
-   # and returns the path of the output file.
+   # and returns the path of the output file. (the paths are built from the
+   # filename when they are not given)
    # ---------------------------------------------------------------------------
-   def compress_text_file(self):
+   def compress_text_file(self, input_path=None, output_path=None):
       # get the current directory where this program is placed
       current_directory = os.path.dirname(os.path.realpath(__file__))
       # build the path of the input file
-      input_file = self.filename + '.txt'
-      input_path = current_directory + '/' + input_file
+      if input_path is None:
+         input_path = os.path.join(current_directory, self.filename + '.txt')
+      input_file = os.path.basename(input_path)
       # build the path of the output file
-      output_file = self.filename + '.bin'
-      output_path = current_directory + '/' + output_file
+      if output_path is None:
+         output_path = os.path.join(current_directory, self.filename + '.bin')
+      output_file = os.path.basename(output_path)
+      # start collecting the statistics of the run
+      self.stats = RunStats(type(self).__name__, 'compress',
+                            self.trace_memory, self.profile)
 
       # read the contents of the input file
-      in_file = open(input_path, 'r')
-      text = in_file.read().rstrip()
-      in_file.close()
+      with measure(self.stats, 'read'):
+         if self.data_type == 'binary':
+            in_file = open(input_path, 'rb')   # binary mode (bytes as they are)
+            text = in_file.read()
+         else:
+            in_file = open(input_path, 'r')
+            text = in_file.read().rstrip()
+         in_file.close()
+
+      # compress the text in memory
+      compressed_data = self.compress_data(text)
+
+      # write the compressed data to the output file (compressed file)
+      with measure(self.stats, 'write'):
+         out_file = open(output_path, 'wb')
+         out_file.write(compressed_data)
+         out_file.close()
 
-      # encode the text by using the LZW compression algorithm
-      encoded_text_as_integers = self.encode(text)
-      # get the binary string that corresponds to the compressed text
-      encoded_text = self.int_list_to_binary_string(encoded_text_as_integers)
-      # add the code length info to the beginning of the encoded text
-      encoded_text = self.add_code_length_info(encoded_text)
-      # perform padding if needed
-      padded_encoded_text = self.pad_encoded_data(encoded_text)
-      # convert the resulting string into a byte array
-      byte_array = self.get_byte_array(padded_encoded_text)
-
-      # write the bytes in the byte array to the output file (compressed file)
-      out_file = open(output_path, 'wb')   # binary mode
-      out_file.write(bytes(byte_array))
-      out_file.close()
-
-      # notify the user that the compression process is finished
-      print(input_file + ' is compressed into ' + output_file + '.')
-      # compute and print the details of the compression process
       uncompressed_size = len(text)
-      print('Uncompressed Size: ' + '{:,d}'.format(uncompressed_size) + ' bytes')
-      print('Code Length: ' + str(self.codelength))
-      compressed_size = len(byte_array)
-      print('Compressed Size: ' + '{:,d}'.format(compressed_size) + ' bytes')
-      compression_ratio = uncompressed_size / compressed_size
-      print('Compression Ratio: ' + '{:.2f}'.format(compression_ratio))
+      compressed_size = len(compressed_data)
+      if self.verbose:
+         # notify the user that the compression process is finished
+         print(input_file + ' is compressed into ' + output_file + '.')
+         # print the details of the compression process
+         print('Uncompressed Size: ' + '{:,d}'.format(uncompressed_size) + ' bytes')
+         print('Code Length: ' + str(self.codelength))
+         print('Compressed Size: ' + '{:,d}'.format(compressed_size) + ' bytes')
+         compression_ratio = uncompressed_size / compressed_size
+         print('Compression Ratio: ' + '{:.2f}'.format(compression_ratio))
+      self.stats.finish(uncompressed_size, compressed_size)
 
       # return the path of the output file
       return output_path
    
-   # A method that encodes a text input into a list of integer values by using
-   # the LZW compression algorithm and returns the resulting list.
+   # A method that encodes a text input (or a bytes-like input) into a list of
+   # integer values by using the LZW compression algorithm and returns the
+   # resulting list.
    # ---------------------------------------------------------------------------
    def encode(self, uncompressed_data):
-      # build the initial dictionary by mapping the characters in the extended 
-      # ASCII table to their indexes
-      dict_size = 256
-      dictionary = {chr(i): i for i in range(dict_size)}
-
-      # perform the LZW compression algorithm
-      w = ''   # initialize a variable to store the current sequence
-      result = []   # initialize a list to store the encoded values to output
-      # iterate over each item (a character for text files) in the input data
-      for k in uncompressed_data:
-         # keep forming a new sequence until it is not in the dictionary
-         wk = w + k
-         if wk in dictionary:   # if wk exists in the dictionary
-            w = wk   # update the sequence by adding the current item
-         else:   # otherwise
-            # add the code for w (the longest sequence found in the dictionary)
-            # to the list that stores the encoded values
-            result.append(dictionary[w])
-            # add wk (the new sequence) to the dictionary
-            dictionary[wk] = dict_size
-            dict_size += 1
-            # reset w to the current character
-            w = k
-      # add the code for the remaining sequence (if it exists) to the list that 
-      # stores the encoded values (integer codes)
-      if w:
-         result.append(dictionary[w])
-      
+      symbols = to_symbols(uncompressed_data)
+      # the number of bytes (stored in the header of the compressed file)
+      self.original_size = len(symbols)
+      # perform the LZW compression algorithm by using the shared dictionary
+      # engine (each character is processed in constant time)
+      max_dict_size = None
+      if self.max_code_length is not None:
+         max_dict_size = 2 ** self.max_code_length
+      with measure(self.stats, 'lzw'):
+         result, dict_size = encode_symbols(symbols, 256, max_dict_size,
+                                            self.policy, self.progress)
+      count(self.stats, len(symbols), len(result), dict_size)
+
       # set the code length for compressing the encoded values based on the input 
-      # data (by using the size of the resulting dictionary)
-      self.codelength = math.ceil(math.log2(len(dictionary)))
+      # data (by using the largest size of the dictionary)
+      self.codelength = math.ceil(math.log2(dict_size))
 
       # return the encoded values (a list of integer dictionary values)
       return result
 
-   # A method that converts the integer list returned by the compress method
-   # into a binary string and returns the resulting string.
+   # A method that decompresses the given compressed data (the bytes of a
+   # compressed file) in memory and returns the text (a bytearray in the
+   # binary mode).
+   # ---------------------------------------------------------------------------
+   def decompress(self, data):
+      # start collecting the statistics of the run
+      self.stats = RunStats(type(self).__name__, 'decompress',
+                            self.trace_memory, self.profile)
+      decompressed_text = self.decompress_data(data)
+      self.stats.finish(len(data), len(decompressed_text))
+      return decompressed_text
+
+   # A method that decompresses the compressed data of the given source (the
+   # path of a compressed file or its bytes) and returns the text (used by
+   # decompress and decompress_text_file, which start the statistics).
+   # ---------------------------------------------------------------------------
+   def decompress_data(self, source):
+      # read the compressed data (the data section of a container or all the
+      # data if it was written without the container, e.g., by compress_stream)
+      with measure(self.stats, 'read'):
+         data = read_data(source)
+      # the blocks of the blocked mode are independent, so they are decoded
+      # in worker processes (if the data is large enough)
+      if is_blocked_file(data):
+         return self.text_output(BlockedTextReader(data).decode_all(
+            self, self.parallel))
+
+      # the first byte contains the padding info (the number of zeros added to
+      # the end and the entropy coder) and the second byte contains the code
+      # length info (with the variable-width flag and the dictionary policy)
+      extra_padding = data[0] & PADDING_MASK
+      self.codelength, self.variable_width, self.policy = \
+         parse_code_length_field(data[1])
+      # the original size follows (if it is stored)
+      start = 2
+      original_size = None
+      if data[0] & ORIGINAL_SIZE_FLAG:
+         original_size = struct.unpack_from('>Q', data, start)[0]
+         start += 8
+      # unpack the integer codes from the remaining bytes
+      with measure(self.stats, 'unpack'):
+         encoded_text = unpack_code_stream(data[start:], data[1],
+                                           extra_padding).tolist()
+      # decode the encoded text by using the LZW decompression algorithm
+      return self.decode(encoded_text, original_size)
+
+   # A method that decodes a single block of the blocked mode (its bytes as
+   # written by compress_block) into a bytearray of the given size.
    # ---------------------------------------------------------------------------
-   def int_list_to_binary_string(self, int_list):
-      # initialize the binary string as an empty string
-      bitstring = ''
-      # concatenate each integer in the input list to the binary string
-      for num in int_list:
-         # using codelength bits to compress each value
-         for n in range(self.codelength):
-            if num & (1 << (self.codelength - 1 - n)):
-               bitstring += '1'
-            else:
-               bitstring += '0'
-      # return the resulting binary string
-      return bitstring
-
-   # A method that adds the code length to the beginning of the binary string
-   # that corresponds to the compressed data and returns the resulting string.
-   # (the compressed data should contain everything needed to decompress it)
+   def decompress_block(self, data, size):
+      extra_padding = data[0] & PADDING_MASK
+      self.codelength, self.variable_width, self.policy = \
+         parse_code_length_field(data[1])
+      with measure(self.stats, 'unpack'):
+         encoded_block = unpack_code_stream(data[2:], data[1],
+                                            extra_padding).tolist()
+      return self.decode_symbols(encoded_block, size)
+
+   # A method that decodes only the given byte range (start, length) of a
+   # compressed file written in the blocked mode; only the blocks that cover
+   # the range are read and decoded. The source is the path of the file or its
+   # bytes (None: filename + '.bin' next to this program). It returns the text
+   # (a bytearray in the binary mode). Note: the CRC32 of the data section is
+   # not checked, so only the needed blocks are read (see
+   # LZWContainer.verify_file).
    # ---------------------------------------------------------------------------
-   def add_code_length_info(self, bitstring):
-      # create a binary string that stores the code length as a byte
-      codelength_info = '{0:08b}'.format(self.codelength)
-      # add the code length info to the beginning of the given binary string
-      bitstring = codelength_info + bitstring
-      # return the resulting binary string
-      return bitstring
-
-   # A method for adding zeros to the binary string (the compressed data)
-   # to make the length of the string a multiple of 8.
-   # (This is necessary to be able to write the values to the file as bytes.)
+   def read_range(self, start, length, source=None):
+      reader, input_size = self.open_blocks(source)
+      symbols = reader.read_range(self, start, length)
+      self.stats.finish(input_size, len(symbols))
+      return self.text_output(symbols)
+
+   # A method that decodes only the given lines (from first to last - 1,
+   # counted from 0 as in a slice, with their line feeds) of a compressed file
+   # written in the blocked mode (see read_range). The index of the blocks
+   # gives the blocks where the lines start and end.
    # ---------------------------------------------------------------------------
-   def pad_encoded_data(self, encoded_data):
-      # compute the number of the extra bits to add
-      if len(encoded_data) % 8 != 0:
-         extra_bits = 8 - len(encoded_data) % 8
-         # add zeros to the end (padding)
-         for i in range(extra_bits):
-            encoded_data += '0'
-      else:   # no need to add zeros
-         extra_bits = 0
-      # add a byte that stores the number of added zeros to the beginning of
-      # the encoded data
-      padding_info = '{0:08b}'.format(extra_bits)
-      encoded_data = padding_info + encoded_data
-      # return the resulting string after padding
-      return encoded_data
-
-   # A method that converts the padded binary string to a byte array and returns 
-   # the resulting array. 
-   # (This byte array will be written to a file to store the compressed data.)
+   def read_lines(self, first, last, source=None):
+      reader, input_size = self.open_blocks(source)
+      symbols = reader.read_lines(self, first, last)
+      self.stats.finish(input_size, len(symbols))
+      return self.text_output(symbols)
+
+   # A method that starts the statistics of a partial decompression and
+   # returns a reader of the blocks of the given source (mapped into memory if
+   # it is a path) and the size of the source.
    # ---------------------------------------------------------------------------
-   def get_byte_array(self, padded_encoded_data):
-      # the length of the padded binary string must be a multiple of 8
-      if (len(padded_encoded_data) % 8 != 0):
-         print('The compressed data is not padded properly!')
-         exit(0)
-      # create a byte array
-      b = bytearray()
-      # append the padded binary string to byte by byte
-      for i in range(0, len(padded_encoded_data), 8):
-         byte = padded_encoded_data[i : i + 8]
-         b.append(int(byte, 2))
-      # return the resulting byte array
-      return b
+   def open_blocks(self, source):
+      if source is None:
+         current_directory = os.path.dirname(os.path.realpath(__file__))
+         source = os.path.join(current_directory, self.filename + '.bin')
+      if is_path(source):
+         input_size = os.path.getsize(source)
+         source = map_file(source)
+      else:
+         input_size = len(source)
+      self.stats = RunStats(type(self).__name__, 'decompress',
+                            self.trace_memory, self.profile)
+      with measure(self.stats, 'read'):
+         reader = BlockedTextReader(source)
+      return reader, input_size
 
    # A method that reads the contents of a compressed binary file, performs
-   # decompression and writes the decompressed output to a text file.
+   # decompression and writes the decompressed output to a text file. (the
+   # paths are built from the filename when they are not given)
    # ---------------------------------------------------------------------------
-   def decompress_text_file(self):
+   def decompress_text_file(self, input_path=None, output_path=None):
       # get the current directory where this program is placed
       current_directory = os.path.dirname(os.path.realpath(__file__))
       # build the path of the input file
-      input_file = self.filename + '.bin'
-      input_path = current_directory + '/' + input_file
+      if input_path is None:
+         input_path = os.path.join(current_directory, self.filename + '.bin')
+      input_file = os.path.basename(input_path)
       # build the path of the output file
-      output_file = self.filename + '_decompressed.txt'
-      output_path = current_directory + '/' + output_file
+      if output_path is None:
+         output_path = os.path.join(current_directory,
+                                    self.filename + '_decompressed.txt')
+      output_file = os.path.basename(output_path)
+      # start collecting the statistics of the run
+      self.stats = RunStats(type(self).__name__, 'decompress',
+                            self.trace_memory, self.profile)
 
-      # read the contents of the input file
-      in_file = open(input_path, 'rb')   # binary mode
-      bytes = in_file.read()
-      in_file.close()
-
-      # create a binary string from the bytes read from the file
-      from io import StringIO   # using StringIO for efficiency
-      bit_string = StringIO()
-      for byte in bytes:
-         bits = bin(byte)[2:].rjust(8, '0')
-         bit_string.write(bits)
-      bit_string = bit_string.getvalue()
-
-      # remove padding
-      bit_string = self.remove_padding(bit_string)
-      # remove the code length info and set the instance variable codelength
-      bit_string = self.extract_code_length_info(bit_string)
-      # convert the compressed binary string to a list of integer values
-      encoded_text = self.binary_string_to_int_list(bit_string)
-      # decode the encoded text by using the LZW decompression algorithm
-      decompressed_text = self.decode(encoded_text)
+      # decompress the compressed data of the input file (mapped into memory,
+      # so it is not copied into a separate buffer first)
+      decompressed_text = self.decompress_data(map_file(input_path))
 
       # write the decompression output to the output file
-      out_file = open(output_path, 'w')
-      out_file.write(decompressed_text)
-      out_file.close()
+      with measure(self.stats, 'write'):
+         if self.data_type == 'binary':
+            out_file = open(output_path, 'wb')   # binary mode (bytes as they are)
+         else:
+            out_file = open(output_path, 'w')
+         out_file.write(decompressed_text)
+         out_file.close()
 
       # notify the user that the decompression process is finished
-      print(input_file + ' is decompressed into ' + output_file + '.')
+      if self.verbose:
+         print(input_file + ' is decompressed into ' + output_file + '.')
+      self.stats.finish(os.path.getsize(input_path), os.path.getsize(output_path))
       
       # return the path of the output file
       return output_path
 
-   # A method to remove the padding info and the added zeros from the compressed
-   # binary string and return the resulting string.
-   def remove_padding(self, padded_encoded_data):
-      # extract the padding info (the first 8 bits of the input string)
-      padding_info = padded_encoded_data[:8]
-      encoded_data = padded_encoded_data[8:]
-      # remove the extra zeros (if any) and return the resulting string
-      extra_padding = int(padding_info, 2) 
-      if extra_padding != 0:
-         encoded_data = encoded_data[:-1 * extra_padding]
-      return encoded_data
-
-   # A method to extract the code length info from the compressed binary string
-   # and return the resulting string.
-   # ---------------------------------------------------------------------------
-   def extract_code_length_info(self, bitstring):
-      # the first 8 bits of the input string contains the code length info
-      codelength_info = bitstring[:8]
-      self.codelength = int(codelength_info, 2)
-      # return the resulting binary string after removing the code length info
-      return bitstring[8:]
-
-   # A method that converts the compressed binary string to a list of int codes
-   # and returns the resulting list.
-   # ---------------------------------------------------------------------------
-   def binary_string_to_int_list(self, bitstring):
-      # generate the list of integer codes from the binary string
-      int_codes = []
-      # for each compressed value (a binary string with codelength bits)
-      for bits in range(0, len(bitstring), self.codelength):
-         # compute the integer code and add it to the list
-         int_code = int(bitstring[bits: bits + self.codelength], 2)
-         int_codes.append(int_code)
-      # return the resulting list
-      return int_codes
-   
    # A method that decodes a list of encoded integer values into a string (text) 
    # by using the LZW decompression algorithm and returns the resulting output.
+   # (the output is a bytearray in the binary mode)
    # ---------------------------------------------------------------------------
-   def decode(self, encoded_values):
-      # build the initial dictionary by mapping the index values in the extended 
-      # ASCII table to their corresponding characters
-      dict_size = 256
-      dictionary = {i: chr(i) for i in range(dict_size)}
-
-      # perform the LZW decompression algorithm
-      # ------------------------------------------------------------------------
-      from io import StringIO   # using StringIO for efficiency
-      result = StringIO()
-      # initialize w as the character corresponding to the first encoded value
-      # in the list and add this character to the output string
-      w = chr(encoded_values.pop(0))
-      result.write(w)
-      # iterate over each encoded value in the list
-      for k in encoded_values:
-         # if the value is in the dictionary
-         if k in dictionary:
-            # retrieve the corresponding string
-            entry = dictionary[k]
-         # if the value is equal to the current dictionary size
-         elif k == dict_size:
-            # construct the entry
-            entry = w + w[0]   # a special case where the entry is formed
-         # if k is invalid (not in the dictionary and not equal to dict_size)
-         else:
-            # raise an error
-            raise ValueError('Bad compressed k: %s' % k)
-         # add the entry to the output
-         result.write(entry)
-         # w + the first character of the entry is added to the dictionary 
-         # as a new sequence
-         dictionary[dict_size] = w + entry[0]
-         dict_size += 1
-         # update w to the current entry
-         w = entry
-      
+   def decode(self, encoded_values, original_size=None):
+      return self.text_output(self.decode_symbols(encoded_values,
+                                                  original_size))
+
+   # A method that decodes a list of encoded integer values into a bytearray
+   # by using the LZW decompression algorithm (the indexes in the extended
+   # ASCII table).
+   # ---------------------------------------------------------------------------
+   def decode_symbols(self, encoded_values, original_size=None):
+      # perform the LZW decompression algorithm by using the shared dictionary
+      # engine (the dictionary is limited to 2**codelength entries and handled
+      # by the same policy as in the compression); the symbols are written
+      # directly into a bytearray (allocated at once when the original size is
+      # known) and each dictionary entry is kept as the position and the length
+      # of its first occurrence in the output
+      with measure(self.stats, 'lzw'):
+         symbols = decode_bytes(encoded_values, original_size, 256,
+                                2 ** self.codelength, self.policy,
+                                self.progress)
+      count(self.stats, len(symbols), len(encoded_values),
+            peak_dict_size(encoded_values, 256, 2 ** self.codelength,
+                           self.policy))
+      return symbols
+
+   # A method that returns the decoded bytes as the output of the coding mode
+   # (the bytearray itself in the binary mode).
+   # ---------------------------------------------------------------------------
+   def text_output(self, symbols):
+      # the indexes are the bytes of the output in the binary mode
+      if self.data_type == 'binary':
+         return symbols
+      # map the indexes in the extended ASCII table to their characters and
       # return the resulting output (the decompressed string/text)
-      return result.getvalue()
+      return symbols.decode('latin-1')
+
+
+# A function that returns the indexes of the given text (str) or bytes in the
+# initial dictionary of the LZW algorithm.
+# ------------------------------------------------------------------------------
+def to_symbols(data):
+   if isinstance(data, str):
+      # map the characters in the extended ASCII table to their indexes
+      # (the initial dictionary of the LZW algorithm)
+      try:
+         return data.encode('latin-1')
+      except UnicodeEncodeError as error:
+         # a character outside the extended ASCII table has no index
+         character = data[error.start]
+         raise ValueError("The text mode only supports the characters up to "
+                          "U+00FF, but %r was found at position %d; compress "
+                          "the encoded bytes of the text (e.g., "
+                          "text.encode('utf-8')) with data_type='binary' "
+                          "instead." % (character, error.start)) from None
+   # the bytes are already the indexes (bytes, bytearray or memoryview)
+   return memoryview(data).cast('B')
+
+
+# A class that compresses text incrementally (in the style of zlib.compressobj)
+# and produces the data of the .bin format of LZWCoding.compress_text_file
+# (without the container, since the output is written before its size and
+# checksum are known). The code length is fixed in advance and the dictionary
+# stops growing when it is full, so the memory usage does not depend on the
+# size of the input. (In the variable-width mode, codelength is the maximum
+# code length.)
+# ------------------------------------------------------------------------------
+class LZWCompressor:
+   # A constructor with three input parameters (the number of bits for each
+   # code, whether to use the variable-width mode and the dictionary policy)
+   # ---------------------------------------------------------------------------
+   def __init__(self, codelength=16, variable_width=False, policy=FREEZE):
+      # the initial dictionary (the extended ASCII table) requires at least 8
+      # bits and the code length info has 5 bits
+      if codelength < 8 or codelength > 31:
+         raise ValueError('Invalid code length: %s' % codelength)
+      self.codelength = codelength
+      self.variable_width = variable_width
+      self.policy = policy
+      # the dictionary is limited to the codes that fit in codelength bits
+      self.encoder = LZWEncoder(256, 2 ** codelength, policy)
+      # packs the codes and keeps the bits that do not fill a complete byte
+      self.packer = BitPacker()
+      # the number of codes written so far
+      self.num_codes = 0
+      self.header_written = False
+      # the number of zeros added to the end (known after flush is called)
+      self.extra_bits = 0
+
+   # A method that compresses a chunk of text (or bytes) and returns the bytes
+   # of the compressed data that are ready to be written.
+   # ---------------------------------------------------------------------------
+   def compress(self, data):
+      # map the characters in the extended ASCII table to their indexes
+      if isinstance(data, str):
+         data = to_symbols(data)
+      return self.get_header() + self.pack(self.encoder.encode(data))
+
+   # A method that ends the compression and returns the remaining bytes of the
+   # compressed data (including the zeros added to the end for padding).
+   # ---------------------------------------------------------------------------
+   def flush(self):
+      packed_codes = self.pack(self.encoder.finish())
+      last_byte, self.extra_bits = self.packer.flush()
+      return self.get_header() + packed_codes + last_byte
+
+   # A method that packs the given codes and returns the complete bytes.
+   # ---------------------------------------------------------------------------
+   def pack(self, codes):
+      if self.variable_width:
+         # the widths continue from the position of the first code
+         widths = variable_code_widths(len(codes), self.num_codes,
+                                       2 ** self.codelength, self.policy)
+      else:
+         widths = [self.codelength] * len(codes)
+      self.num_codes += len(codes)
+      return self.packer.pack(codes, widths)
+
+   # A method that returns the padding info and the code length info when it is
+   # called for the first time (an empty byte string otherwise).
+   # ---------------------------------------------------------------------------
+   def get_header(self):
+      if self.header_written:
+         return b''
+      self.header_written = True
+      codelength_info = make_code_length_field(self.codelength,
+                                               self.variable_width, self.policy)
+      # the padding info is not known until the end, so it is written as zero
+      # and updated by compress_stream when the output is seekable
+      # (the decompressor ignores the padding anyway, since fewer than 8 bits
+      # can never form a complete code of 8 or more bits)
+      return bytes([0, codelength_info])
+
+
+# A function that compresses a text (or binary) stream chunk by chunk into a
+# binary stream by using an LZWCompressor (the memory usage does not depend on
+# the input).
+# ------------------------------------------------------------------------------
+def compress_stream(in_stream, out_stream, codelength=16, chunk_size=1 << 16,
+                    variable_width=False, policy=FREEZE):
+   compressor = LZWCompressor(codelength, variable_width, policy)
+   start = out_stream.tell() if out_stream.seekable() else None
+   # compress and write the input chunk by chunk
+   chunk = in_stream.read(chunk_size)
+   while chunk:
+      out_stream.write(compressor.compress(chunk))
+      chunk = in_stream.read(chunk_size)
+   out_stream.write(compressor.flush())
+   # write the padding info to the first byte of the output (if possible)
+   if start is not None:
+      end = out_stream.tell()
+      out_stream.seek(start)
+      out_stream.write(bytes([compressor.extra_bits]))
+      out_stream.seek(end)
+   out_stream.flush()
+
+
+# Compress the standard input to the standard output when this file is run as
+# a program (e.g., python LZW.py < input.txt > input.bin). The input is read as
+# bytes, so the output can be decompressed by LZWCoding in the binary mode.
+# The variable-width mode is used when the program is run with the
+# --variable-width option.
+# ------------------------------------------------------------------------------
+if __name__ == '__main__':
+   compress_stream(sys.stdin.buffer, sys.stdout.buffer,
+                   variable_width='--variable-width' in sys.argv[1:])
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Compressing and decompressing in memory with any of the five levels, e.g.
+#   import LZWApi
+#   data = LZWApi.compress(open('lena_color.png', 'rb'), level=5)
+#   pixels = LZWApi.decompress(data)        # a height x width x 3 uint8 array
+#   text = LZWApi.decompress(LZWApi.compress('some text'))
+#   green = LZWApi.decompress_channel(data, 'G')   # only the G plane is decoded
+#   crop = LZWApi.decompress_region(tiled, 0, 0, 64, 64)  # covering tiles only
+# ------------------------------------------------------------------------------
+# The functions never touch the file system: the input is a bytes-like object,
+# a numpy array, a PIL image, a str (Level 1) or a binary file object (which is
+# read to the end) and the output is the bytes of a .bin container file (see
+# LZWContainer), so it can be stored, sent or decompressed from memory. The
+# file methods of the coding classes (compress_text_file, compress_image_file,
+# ...) are thin wrappers that read the input file, call the same in-memory
+# methods (compress / decompress) and write the result.
+#
+# For the image levels (2-5) a bytes-like input or file object holds an encoded
+# image file (e.g., PNG), which is decoded with PIL; a numpy array holds the
+# pixels. For Level 1 the bytes are compressed as they are.
+import io
+import numpy as np
+from PIL import Image
+from LZWContainer import TEXT, COLOR, COLOR_2D_DIFF, FLAG_BINARY, codec_class, read_info
+from LZWTiles import is_tiled_file
+
+# the filename given to the coding objects created by this module (it is only
+# used to build the default paths of the file methods)
+MEMORY_NAME = 'memory'
+
+
+# A function that returns the contents of a binary file object (read to the
+# end) or the given bytes-like object as a memoryview.
+# ------------------------------------------------------------------------------
+def read_input(data):
+    if hasattr(data, 'read'):
+        data = data.read()
+    return memoryview(data).cast('B')
+
+
+# A function that returns the pixels of the given image as a uint8 array in the
+# given PIL mode ('L': height x width, 'RGB': height x width x 3). The image is
+# a numpy array, a PIL image, a path, a binary file object or the bytes of an
+# encoded image file.
+# ------------------------------------------------------------------------------
+def load_pixels(image, mode):
+    if isinstance(image, np.ndarray):
+        ndim = 2 if mode == 'L' else 3
+        if image.dtype == np.uint8 and image.ndim == ndim and \
+                (ndim == 2 or image.shape[2] == 3):
+            return np.ascontiguousarray(image)
+        image = Image.fromarray(image)
+    elif not isinstance(image, Image.Image):
+        if not hasattr(image, 'read') and isinstance(image, (bytes, bytearray, memoryview)):
+            image = io.BytesIO(image)
+        image = Image.open(image)
+    return np.array(image.convert(mode), dtype=np.uint8)
+
+
+# A function that compresses the given data with the given level (1-5) and
+# returns the bytes of the compressed container. The keyword arguments are the
+# options of the coding class (e.g., variable_width=True, tile_size=256,
+# color_transform='ycocg', entropy='range', block_size=1 << 20).
+# ------------------------------------------------------------------------------
+def compress(data, level=TEXT, **options):
+    if level == TEXT:
+        data_type = 'text' if isinstance(data, str) else 'binary'
+        if isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).view(np.uint8).ravel()
+        elif not isinstance(data, str):
+            data = read_input(data)
+    else:
+        data_type = 'image'
+    return codec_class(level)(MEMORY_NAME, data_type, **options).compress(data)
+
+
+# A function that decompresses the given container (bytes-like object or binary
+# file object) and returns the original data: a str or a bytearray for Level 1
+# (a bytearray unless a str was compressed) and a uint8 pixel array for Level
+# 2-5. The level is read from the container header; it is only needed for the
+# data written without the container.
+# ------------------------------------------------------------------------------
+def decompress(data, level=None, **options):
+    data = read_input(data)
+    info = read_info(data)
+    if info is not None:
+        level = info.codec_id
+    elif level is None:
+        raise ValueError("The data was written without the container; the level "
+                         "has to be given.")
+    if level == TEXT:
+        text_mode = info is not None and not info.flags & FLAG_BINARY
+        data_type = 'text' if text_mode else 'binary'
+    else:
+        data_type = 'image'
+    return codec_class(level)(MEMORY_NAME, data_type, **options).decompress(data)
+
+
+# A function that decompresses only the given channel (0-2 or 'R', 'G', 'B') of
+# the given color container (Level 4 or 5) and returns it as a height x width
+# uint8 array; the data of the other channels is not decoded (see read_channel
+# of the coding classes). For a file written with a color transform the channel
+# can also be a stored plane (e.g., 'Y'; see LZWColorTransform).
+# ------------------------------------------------------------------------------
+def decompress_channel(data, channel, level=None, **options):
+    data = read_input(data)
+    info = read_info(data)
+    if info is not None:
+        level = info.codec_id
+    if level not in (COLOR, COLOR_2D_DIFF):
+        raise ValueError("Single channels can only be decoded from the color "
+                         "levels (4 and 5).")
+    return codec_class(level)(MEMORY_NAME, 'image', **options).read_channel(channel, data)
+
+
+# A function that decompresses only the given rectangle (x, y, w, h) of the
+# given tiled image container (Level 2-5, written with tile_size) and returns
+# it as an h x w (gray level) or h x w x 3 (color) uint8 array; only the tiles
+# that cover the rectangle are decoded (see decode_region of the coding
+# classes).
+# ------------------------------------------------------------------------------
+def decompress_region(data, x, y, w, h, level=None, **options):
+    data = read_input(data)
+    info = read_info(data)
+    if info is not None:
+        level = info.codec_id
+    if level is None or level == TEXT or not is_tiled_file(data):
+        raise ValueError("Regions can only be decoded from the tiled images "
+                         "(levels 2-5 with a tile size).")
+    return codec_class(level)(MEMORY_NAME, 'image', **options).decode_region(x, y, w, h, data)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# A command-line tool that compresses or decompresses many files with any of
+# the five levels (without the GUI), e.g. (in this directory):
+#   python -m LZWBatch compress --level 5 --jobs 8 --report report.json photos/
+#   python -m LZWBatch compress --level 1 'logs/**/*.log' -o archive/
+#   python -m LZWBatch decompress archive/ -o restored/
+# ------------------------------------------------------------------------------
+# The inputs can be files, glob patterns and directories (which are searched
+# recursively for the files that match --pattern). The files are processed by
+# a pool of worker processes, the largest files first (so a large file does
+# not start last and hold up the whole batch), and a summary of each file
+# (file sizes, raw and compressed sizes, ratio, time and the statistics of the
+# stages) is written to a JSON report. The ratio is computed from the raw data
+# (e.g., the pixels of an image), so it does not depend on the input format.
+# Decompression detects the level of each file from its container header (see
+# LZWContainer); --level is only needed for files written without the
+# container.
+#
+# The exit status is 0 if every file succeeded, 1 if any file failed and 2 for
+# invalid arguments.
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from LZWCore import POLICIES, FREEZE
+from LZWPredict import PREDICTORS, ADAPTIVE
+from LZWColorTransform import TRANSFORMS
+from LZWEntropy import ENTROPY_CODERS
+from LZWContainer import TEXT, IMAGE_DIFF, COLOR, COLOR_2D_DIFF, FLAG_BINARY, codec_class, \
+    read_info
+
+COMPRESS = 'compress'
+DECOMPRESS = 'decompress'
+# the default pattern of the files searched in the directories
+DEFAULT_PATTERNS = {COMPRESS: '*', DECOMPRESS: '*.bin'}
+
+
+# A function that returns the files given by the paths (files, glob patterns
+# or directories) as (path, root) pairs, where root is the directory that the
+# relative output path is built from.
+# ------------------------------------------------------------------------------
+def collect_files(paths, pattern):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, names in os.walk(path):
+                subdirectories.sort()
+                for name in sorted(fnmatch.filter(names, pattern)):
+                    files.append((os.path.join(directory, name), path))
+        elif os.path.isfile(path):
+            files.append((path, os.path.dirname(path)))
+        else:
+            matches = sorted(glob.glob(path, recursive=True))
+            if not matches:
+                raise ValueError(f"No such file or directory: {path}")
+            files.extend((match, os.path.dirname(match))
+                         for match in matches if os.path.isfile(match))
+    return files
+
+
+# A function that returns the name of the output file for the given input file
+# and codec id.
+# ------------------------------------------------------------------------------
+def output_name(mode, input_path, codec_id):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    if mode == COMPRESS:
+        return stem + '.bin'
+    return stem + ('_decompressed.txt' if codec_id == TEXT else '_decompressed.png')
+
+
+# A function that returns the codec id of the given file to decompress (from
+# its container header or the given level) and the data type for the coding
+# class.
+# ------------------------------------------------------------------------------
+def detect_level(input_path, level):
+    info = read_info(input_path)
+    if info is None:
+        if level is None:
+            raise ValueError("the file was written without the container; use --level")
+        return level, 'binary' if level == TEXT else 'image'
+    if info.codec_id == TEXT:
+        return TEXT, 'binary' if info.flags & FLAG_BINARY else 'text'
+    return info.codec_id, 'image'
+
+
+# A function that returns the constructor arguments of the coding class of the
+# given level for the command-line options.
+# ------------------------------------------------------------------------------
+def codec_options(level, options):
+    kwargs = {'variable_width': options['variable_width'],
+              'max_code_length': options['max_code_length'],
+              'policy': options['policy'],
+              'entropy': options['entropy']}
+    kwargs['parallel'] = options['parallel']
+    if level == TEXT:
+        kwargs['block_size'] = options['block_size']
+    else:
+        kwargs['tile_size'] = options['tile_size']
+    if level in (IMAGE_DIFF, COLOR_2D_DIFF):
+        kwargs['predictor'] = options['predictor']
+    if level in (COLOR, COLOR_2D_DIFF):
+        kwargs['color_transform'] = options['color_transform']
+    if level == COLOR:
+        kwargs['interleaved'] = options['interleaved']
+    return kwargs
+
+
+# A function that compresses or decompresses a single file and returns its
+# summary (it runs in a worker process, so it never raises an exception).
+# ------------------------------------------------------------------------------
+def run_task(task):
+    mode, level, input_path, output_path, options = task
+    summary = {'input': input_path, 'output': output_path, 'level': level,
+               'input_size': os.path.getsize(input_path)}
+    start = time.perf_counter()
+    try:
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        if mode == COMPRESS:
+            data_type = 'binary' if level == TEXT else 'image'
+            codec = codec_class(level)(stem, data_type, **codec_options(level, options))
+            if level == TEXT:
+                codec.compress_text_file(input_path, output_path)
+            else:
+                codec.compress_image_file(input_path, output_path)
+        else:
+            level, data_type = detect_level(input_path, level)
+            summary['level'] = level
+            # (the coding options are read from the file, but the channels,
+            # tiles or blocks are only decoded in parallel as in compress)
+            codec = codec_class(level)(stem, data_type, parallel=options['parallel'])
+            if level == TEXT:
+                codec.decompress_text_file(input_path, output_path)
+            else:
+                codec.decompress_image_file(input_path, output_path)
+        summary['output_size'] = os.path.getsize(output_path)
+        # the stage times, the counts and the dictionary size (see LZWStats)
+        summary['stats'] = codec.stats.as_dict()
+        # the ratio is always compressed size / original size, where the
+        # original size is the size of the raw data that the codec coded (the
+        # pixels of an image, not its PNG file; input_size and output_size are
+        # the sizes of the files on disk)
+        compressed, original = codec.stats.output_bytes, codec.stats.input_bytes
+        if mode == DECOMPRESS:
+            compressed, original = original, compressed
+        summary['original_bytes'] = original
+        summary['compressed_bytes'] = compressed
+        summary['ratio'] = round(compressed / original, 6) if original else None
+        summary['status'] = 'ok'
+    except Exception as e:
+        summary['status'] = 'error'
+        summary['error'] = f"{type(e).__name__}: {e}"
+    summary['seconds'] = round(time.perf_counter() - start, 6)
+    return summary
+
+
+# A function that builds the tasks (largest input first) for the given files.
+# ------------------------------------------------------------------------------
+def build_tasks(mode, files, level, output_dir, options):
+    tasks, outputs = [], {}
+    for input_path, root in files:
+        codec_id = level
+        if mode == DECOMPRESS:
+            info = read_info(input_path)
+            codec_id = level if info is None else info.codec_id
+        name = output_name(mode, input_path, codec_id)
+        if output_dir is None:
+            directory = os.path.dirname(input_path)
+        else:
+            directory = os.path.join(output_dir, os.path.relpath(
+                os.path.dirname(input_path) or os.curdir, root or os.curdir))
+        output_path = os.path.normpath(os.path.join(directory, name))
+        if output_path in outputs:
+            raise ValueError(f"{input_path} and {outputs[output_path]} would both be "
+                             f"written to {output_path}")
+        outputs[output_path] = input_path
+        tasks.append((mode, level, input_path, output_path, options))
+    tasks.sort(key=lambda task: os.path.getsize(task[2]), reverse=True)
+    return tasks
+
+
+# A function that runs the tasks (in a pool of the given number of worker
+# processes) and returns the list of the summaries in the completion order.
+# ------------------------------------------------------------------------------
+def run_tasks(tasks, jobs, progress=None):
+    for task in tasks:
+        os.makedirs(os.path.dirname(task[3]) or '.', exist_ok=True)
+    summaries = []
+    if jobs == 1:
+        for task in tasks:
+            summaries.append(run_task(task))
+            if progress:
+                progress(summaries[-1])
+        return summaries
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # the tasks are submitted in order, so the largest files start first
+        futures = [pool.submit(run_task, task) for task in tasks]
+        for future in as_completed(futures):
+            summaries.append(future.result())
+            if progress:
+                progress(summaries[-1])
+    return summaries
+
+
+# A function that returns the report of a batch run.
+# ------------------------------------------------------------------------------
+def make_report(mode, level, jobs, summaries, wall_seconds):
+    done = [s for s in summaries if s['status'] == 'ok']
+    input_bytes = sum(s['input_size'] for s in done)
+    output_bytes = sum(s['output_size'] for s in done)
+    original = sum(s['original_bytes'] for s in done)
+    compressed = sum(s['compressed_bytes'] for s in done)
+    return {'mode': mode, 'level': level, 'jobs': jobs,
+            'wall_seconds': round(wall_seconds, 6),
+            'totals': {'files': len(summaries), 'failed': len(summaries) - len(done),
+                       'input_bytes': input_bytes, 'output_bytes': output_bytes,
+                       'original_bytes': original, 'compressed_bytes': compressed,
+                       'ratio': round(compressed / original, 6) if original else None,
+                       'cpu_seconds': round(sum(s['seconds'] for s in summaries), 6)},
+            'files': sorted(summaries, key=lambda s: s['input'])}
+
+
+# A function that parses the command-line arguments.
+# ------------------------------------------------------------------------------
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m LZWBatch',
+        description='Compress or decompress files with the LZW coding classes (Level 1-5).')
+    parser.add_argument('mode', choices=(COMPRESS, DECOMPRESS))
+    parser.add_argument('paths', nargs='+', help='files, glob patterns or directories')
+    parser.add_argument('-l', '--level', type=int, choices=range(1, 6),
+                        help='1: text, 2: gray level image, 3: gray level difference, '
+                             '4: color image, 5: color differences (required for '
+                             'compression; for decompression only used for files '
+                             'without a container header)')
+    parser.add_argument('-o', '--output-dir',
+                        help='directory of the output files (default: next to the inputs)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-p', '--pattern',
+                        help="file name pattern in directories (default: '*' for "
+                             "compression, '*.bin' for decompression)")
+    parser.add_argument('-r', '--report', help="path of the JSON report ('-' for stdout)")
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not print progress')
+    options = parser.add_argument_group('compression options')
+    options.add_argument('--variable-width', action='store_true')
+    options.add_argument('--max-code-length', type=int)
+    options.add_argument('--policy', choices=POLICIES, default=FREEZE)
+    options.add_argument('--entropy', choices=ENTROPY_CODERS,
+                         help='entropy coder of the codes (instead of fixed-width codes)')
+    options.add_argument('--block-size', type=int,
+                         help='blocked mode with random access by range or line and '
+                              'parallel coding of the blocks (Level 1)')
+    options.add_argument('--tile-size', type=int, help='tiled mode (Level 2-5)')
+    options.add_argument('--predictor', choices=PREDICTORS + (ADAPTIVE,),
+                         help='pixel predictor (Level 3 and 5)')
+    options.add_argument('--color-transform', choices=TRANSFORMS,
+                         help='reversible color transform (Level 4 and 5)')
+    options.add_argument('--interleaved', action='store_true',
+                         help='palette indices with one shared dictionary (Level 4)')
+    args = parser.parse_args(argv)
+    if args.mode == COMPRESS and args.level is None:
+        parser.error('--level is required for compression')
+    if args.predictor and args.level not in (IMAGE_DIFF, COLOR_2D_DIFF):
+        parser.error('--predictor can only be used with level 3 or 5')
+    if args.color_transform and args.level not in (COLOR, COLOR_2D_DIFF):
+        parser.error('--color-transform can only be used with level 4 or 5')
+    if args.interleaved and args.level != COLOR:
+        parser.error('--interleaved can only be used with level 4')
+    if args.interleaved and (args.tile_size or args.color_transform):
+        parser.error('--interleaved cannot be combined with --tile-size or --color-transform')
+    if args.tile_size and args.level == TEXT:
+        parser.error('--tile-size can only be used with levels 2-5')
+    if args.block_size and args.level != TEXT:
+        parser.error('--block-size can only be used with level 1')
+    if args.block_size is not None and not args.block_size > 0:
+        parser.error('--block-size must be positive')
+    if args.entropy and args.variable_width:
+        parser.error('--entropy cannot be combined with --variable-width')
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    return args
+
+
+# The main function of the tool (returns the exit status).
+# ------------------------------------------------------------------------------
+def main(argv=None):
+    args = parse_args(argv)
+    options = {'variable_width': args.variable_width,
+               'max_code_length': args.max_code_length,
+               'policy': args.policy,
+               'entropy': args.entropy,
+               'block_size': args.block_size,
+               'tile_size': args.tile_size,
+               'predictor': args.predictor,
+               'color_transform': args.color_transform,
+               'interleaved': args.interleaved,
+               # the channels, tiles and blocks of a file are only processed in
+               # parallel when the files themselves are not
+               'parallel': args.jobs == 1}
+    try:
+        files = collect_files(args.paths, args.pattern or DEFAULT_PATTERNS[args.mode])
+        tasks = build_tasks(args.mode, files, args.level, args.output_dir, options)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    def progress(summary):
+        if summary['status'] == 'ok':
+            print(f"[ok] {summary['input']} -> {summary['output']} "
+                  f"(ratio {summary['ratio']}, {summary['seconds']:.3f} s)", file=sys.stderr)
+        else:
+            print(f"[error] {summary['input']}: {summary['error']}", file=sys.stderr)
+
+    start = time.perf_counter()
+    summaries = run_tasks(tasks, min(args.jobs, max(1, len(tasks))),
+                          None if args.quiet else progress)
+    report = make_report(args.mode, args.level, args.jobs, summaries,
+                         time.perf_counter() - start)
+    totals = report['totals']
+    if not args.quiet:
+        print(f"{totals['files']} file(s), {totals['failed']} failed, "
+              f"{totals['input_bytes']:,d} -> {totals['output_bytes']:,d} bytes "
+              f"in {report['wall_seconds']:.3f} s", file=sys.stderr)
+    if args.report == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if totals['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
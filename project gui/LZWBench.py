@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# A reproducible benchmark of the coding classes (Level 1-5), e.g. (in this
+# directory):
+#   python -m LZWBench --output bench.json
+#   python -m LZWBench --quick --baseline bench.json
+# ------------------------------------------------------------------------------
+# Every level is run on sample.txt / lena_color.png and on synthetic inputs of
+# increasing size ('flat', 'noise', 'gradient' and 'natural', generated with a
+# fixed seed). For each run the encode and decode throughput (MB/s of the raw
+# data: the bytes of the text or the pixels of the image, best of --repeats
+# runs), the peak memory (tracemalloc, measured in a separate run) and the
+# compression ratio (compressed size / original size) are recorded, together
+# with the zlib and lzma baselines on the same raw data. The decoded output is
+# compared with the input, so a benchmark run also checks that every level is
+# lossless. The Level 1 inputs are also compressed in the blocked mode
+# ('lzw-blocked', --block-size bytes per block), so the cost of restarting the
+# dictionary in each block is shown next to the single code stream ('lzw').
+# The inputs of every level are also compressed with each entropy coder of
+# LZWEntropy ('lzw-huffman' and 'lzw-range', --entropy), so their gain and
+# their cost are shown next to the fixed-width codes (both coders take a Python
+# step for each code, so their scaling exponents should stay close to 1).
+#
+# The encode and decode times of the synthetic inputs are fitted to
+# time = c * size ** exponent (least squares in log-log scale); an exponent
+# well above 1 means that the cost per symbol grows with the input (e.g., a
+# quadratic regression). The results are written as JSON and can be compared
+# with a stored baseline (--baseline): a changed ratio, a throughput drop
+# larger than --tolerance (for the inputs of at least 64 KiB) or a
+# superlinear exponent is reported and the exit status is 1. The result table
+# and the messages are printed to stderr, so the report can be written to
+# stdout (--output -) and piped to another program.
+import argparse
+import json
+import lzma
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime, timezone
+import numpy as np
+from PIL import Image
+from LZWContainer import TEXT, IMAGE, IMAGE_DIFF, codec_class
+from LZWEntropy import ENTROPY_CODERS
+
+LEVELS = (1, 2, 3, 4, 5)
+KINDS = ('flat', 'noise', 'gradient', 'natural')
+# the side lengths of the synthetic images (the Level 1 inputs have the same
+# number of bytes as the gray level images)
+DEFAULT_SIDES = (64, 128, 256, 512)
+QUICK_SIDES = (64, 128, 256)
+DEFAULT_REPEATS = 3
+# the seed of the synthetic inputs
+SEED = 2024
+# the block size of the blocked Level 1 runs (small enough to split the larger
+# synthetic inputs into several blocks)
+DEFAULT_BLOCK_SIZE = 1 << 15
+# the scaling exponent above which a codec is reported as superlinear
+SCALING_LIMIT = 1.25
+# the allowed relative drop of the throughput in the baseline comparison
+DEFAULT_TOLERANCE = 0.25
+# the throughput of smaller inputs is dominated by the fixed costs (e.g.,
+# reading the PNG file) and the timer noise, so it is not compared
+MIN_COMPARED_BYTES = 1 << 16
+MB = 1e6
+
+
+# A function that returns a synthetic side x side (x channels) uint8 image of
+# the given kind.
+# ------------------------------------------------------------------------------
+def synthetic_image(kind, side, channels=1, seed=SEED):
+    rng = np.random.default_rng(seed)
+    shape = (side, side, channels)
+    y, x, c = np.indices(shape, dtype=np.float64)
+    if kind == 'flat':
+        pixels = np.full(shape, 128.0)
+    elif kind == 'noise':
+        pixels = rng.integers(0, 256, shape).astype(np.float64)
+    elif kind == 'gradient':
+        # a different direction for each channel
+        pixels = (x * (1 + c) + y * (channels - c)) * 255 / (side * (channels + 1))
+    elif kind == 'natural':
+        # smooth shapes with some texture and sensor noise
+        u, v = x / side, y / side
+        pixels = 128 + 60 * np.sin(6 * u + 2 * c) * np.cos(4 * v) + \
+            40 * np.sin(40 * u * v + c) + rng.normal(0, 4, shape)
+    else:
+        raise ValueError(f"Unknown input kind: {kind}")
+    pixels = np.clip(np.rint(pixels), 0, 255).astype(np.uint8)
+    return pixels[..., 0] if channels == 1 else pixels
+
+
+# A function that returns the raw bytes of the synthetic Level 1 input of the
+# given kind and size ('natural' is sample.txt repeated, the other kinds are the
+# bytes of the gray level image).
+# ------------------------------------------------------------------------------
+def synthetic_text(kind, side, sample_text):
+    size = side * side
+    if kind == 'natural':
+        return (sample_text * (size // len(sample_text) + 1))[:size]
+    return synthetic_image(kind, side).tobytes()
+
+
+# A function that returns the number of the image channels of the given level.
+# ------------------------------------------------------------------------------
+def channels_of(level):
+    return 1 if level in (IMAGE, IMAGE_DIFF) else 3
+
+
+# A function that writes the input files of the benchmark into the given
+# directory and returns the list of the cases (dictionaries with the name, the
+# kind, the level, the input path and the raw bytes of each input).
+# ------------------------------------------------------------------------------
+def prepare_cases(directory, levels, kinds, sides, source_directory):
+    cases = []
+    with open(os.path.join(source_directory, 'sample.txt'), 'rb') as f:
+        sample_text = f.read()
+    lena = Image.open(os.path.join(source_directory, 'lena_color.png'))
+
+    def add(name, kind, level, data, side=None):
+        stem = f"{name}_L{level}"
+        if level == TEXT:
+            path = os.path.join(directory, stem + '.txt')
+            with open(path, 'wb') as f:
+                f.write(data)
+            raw = data
+        else:
+            path = os.path.join(directory, stem + '.png')
+            Image.fromarray(data).save(path)
+            raw = data.tobytes()
+        cases.append({'name': name, 'kind': kind, 'level': level, 'side': side,
+                      'path': path, 'raw': raw})
+
+    for level in levels:
+        if level == TEXT:
+            add('sample.txt', 'real', level, sample_text)
+        else:
+            mode = 'L' if channels_of(level) == 1 else 'RGB'
+            add('lena_color.png', 'real', level, np.array(lena.convert(mode)))
+        for kind in kinds:
+            for side in sides:
+                name = f"{kind}-{side}"
+                if level == TEXT:
+                    add(name, kind, level, synthetic_text(kind, side, sample_text), side)
+                else:
+                    add(name, kind, level, synthetic_image(kind, side, channels_of(level)), side)
+    return cases
+
+
+# A function that compresses and decompresses the input of the given case once
+# (a Level 1 input in blocks of the given size and the codes with the given
+# entropy coder, if any) and returns the encode time, the decode time, the
+# compressed size and the decoded raw bytes.
+# ------------------------------------------------------------------------------
+def run_codec(case, directory, block_size=None, entropy=None):
+    level, stem = case['level'], os.path.splitext(os.path.basename(case['path']))[0]
+    compressed = os.path.join(directory, stem + '.bin')
+    output = os.path.join(directory, stem + ('_out.txt' if level == TEXT else '_out.png'))
+    # the channels, tiles and blocks are not processed in parallel, so the
+    # results do not depend on the number of CPUs
+    if level == TEXT:
+        codec = codec_class(level)(stem, 'binary', block_size=block_size, parallel=False,
+                                   entropy=entropy)
+    else:
+        codec = codec_class(level)(stem, 'image', parallel=False, entropy=entropy)
+    start = time.perf_counter()
+    if level == TEXT:
+        codec.compress_text_file(case['path'], compressed)
+    else:
+        codec.compress_image_file(case['path'], compressed)
+    encode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    if level == TEXT:
+        codec.decompress_text_file(compressed, output)
+    else:
+        codec.decompress_image_file(compressed, output)
+    decode_seconds = time.perf_counter() - start
+    if level == TEXT:
+        with open(output, 'rb') as f:
+            decoded = f.read()
+    else:
+        decoded = np.array(Image.open(output)).tobytes()
+    return encode_seconds, decode_seconds, os.path.getsize(compressed), decoded
+
+
+# A function that returns the peak memory (in bytes, traced by tracemalloc) of
+# the given function call.
+# ------------------------------------------------------------------------------
+def peak_memory(function, *args):
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# A function that returns the result record of a run.
+# ------------------------------------------------------------------------------
+def make_result(case, codec, encode_seconds, decode_seconds, compressed_size,
+                peak_bytes, lossless=True):
+    size = len(case['raw'])
+    return {'input': case['name'], 'kind': case['kind'], 'level': case['level'],
+            'codec': codec, 'side': case['side'], 'raw_bytes': size,
+            'compressed_bytes': compressed_size,
+            'ratio': round(compressed_size / size, 6),
+            'encode_seconds': round(encode_seconds, 6),
+            'decode_seconds': round(decode_seconds, 6),
+            'encode_mb_s': round(size / MB / encode_seconds, 3) if encode_seconds else None,
+            'decode_mb_s': round(size / MB / decode_seconds, 3) if decode_seconds else None,
+            'peak_bytes': peak_bytes, 'lossless': lossless}
+
+
+# A function that benchmarks the coding class of the given case (a Level 1
+# input in blocks of the given size and the codes with the given entropy coder,
+# if any).
+# ------------------------------------------------------------------------------
+def bench_lzw(case, directory, repeats, block_size=None, entropy=None):
+    runs = [run_codec(case, directory, block_size, entropy) for _ in range(repeats)]
+    lossless = all(run[3] == case['raw'] for run in runs)
+    peak = peak_memory(run_codec, case, directory, block_size, entropy)
+    name = 'lzw-blocked' if block_size else f'lzw-{entropy}' if entropy else 'lzw'
+    return make_result(case, name,
+                       min(run[0] for run in runs), min(run[1] for run in runs),
+                       runs[0][2], peak, lossless)
+
+
+# A function that benchmarks a stdlib compressor (compress, decompress) on the
+# raw bytes of the given case.
+# ------------------------------------------------------------------------------
+def bench_baseline(case, name, compress, decompress, repeats):
+    encode_times, decode_times = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        data = compress(case['raw'])
+        encode_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        decoded = decompress(data)
+        decode_times.append(time.perf_counter() - start)
+    peak = peak_memory(lambda: decompress(compress(case['raw'])))
+    return make_result(case, name, min(encode_times), min(decode_times), len(data), peak,
+                       decoded == case['raw'])
+
+
+BASELINES = (('zlib', lambda data: zlib.compress(data, 6), zlib.decompress),
+             ('lzma', lambda data: lzma.compress(data, preset=6), lzma.decompress))
+
+
+# A function that fits time = c * size ** exponent to the synthetic results of
+# each (codec, level, kind) and returns the list of the exponents.
+# ------------------------------------------------------------------------------
+def scaling_exponents(results):
+    groups = {}
+    for result in results:
+        if result['side'] is not None:
+            key = (result['codec'], result['level'], result['kind'])
+            groups.setdefault(key, []).append(result)
+    curves = []
+    for (codec, level, kind), group in sorted(groups.items()):
+        if len(group) < 3:
+            continue
+        sizes = np.log([r['raw_bytes'] for r in group])
+        curve = {'codec': codec, 'level': level, 'kind': kind}
+        for stage in ('encode', 'decode'):
+            seconds = np.log([max(r[stage + '_seconds'], 1e-9) for r in group])
+            curve[stage + '_exponent'] = round(float(np.polyfit(sizes, seconds, 1)[0]), 3)
+        curve['superlinear'] = max(curve['encode_exponent'],
+                                   curve['decode_exponent']) > SCALING_LIMIT
+        curves.append(curve)
+    return curves
+
+
+# A function that runs the benchmark and returns the report.
+# ------------------------------------------------------------------------------
+def run_benchmark(levels=LEVELS, kinds=KINDS, sides=DEFAULT_SIDES, repeats=DEFAULT_REPEATS,
+                  baselines=True, progress=None, block_size=DEFAULT_BLOCK_SIZE,
+                  entropy=ENTROPY_CODERS):
+    source_directory = os.path.dirname(os.path.realpath(__file__))
+    results = []
+    with tempfile.TemporaryDirectory(prefix='lzwbench-') as directory:
+        cases = prepare_cases(directory, levels, kinds, sides, source_directory)
+        for case in cases:
+            case_results = [bench_lzw(case, directory, repeats)]
+            if block_size and case['level'] == TEXT:
+                case_results.append(bench_lzw(case, directory, repeats, block_size))
+            case_results.extend(bench_lzw(case, directory, repeats, entropy=coder)
+                                for coder in entropy)
+            if baselines:
+                case_results.extend(bench_baseline(case, name, compress, decompress, repeats)
+                                    for name, compress, decompress in BASELINES)
+            for result in case_results:
+                if progress:
+                    progress(result)
+            results.extend(case_results)
+    return {'meta': {'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                     'python': platform.python_version(), 'numpy': np.__version__,
+                     'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                     'levels': list(levels), 'kinds': list(kinds), 'sides': list(sides),
+                     'repeats': repeats, 'seed': SEED, 'block_size': block_size,
+                     'entropy': list(entropy)},
+            'results': results,
+            'scaling': scaling_exponents(results)}
+
+
+# A function that compares the report with a baseline report and returns the
+# list of the regressions (as messages).
+# ------------------------------------------------------------------------------
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    def key(result):
+        return result['codec'], result['level'], result['input']
+
+    old_results = {key(r): r for r in baseline['results']}
+    regressions = []
+    for result in report['results']:
+        name = f"{result['codec']} L{result['level']} {result['input']}"
+        if not result['lossless']:
+            regressions.append(f"{name}: the decoded output differs from the input")
+        old = old_results.get(key(result))
+        if old is None:
+            continue
+        if result['compressed_bytes'] != old['compressed_bytes']:
+            regressions.append(f"{name}: compressed size {old['compressed_bytes']:,d} -> "
+                               f"{result['compressed_bytes']:,d} bytes")
+        if result['raw_bytes'] < MIN_COMPARED_BYTES:
+            continue
+        for stage in ('encode', 'decode'):
+            new_speed, old_speed = result[stage + '_mb_s'], old[stage + '_mb_s']
+            if new_speed and old_speed and new_speed < old_speed * (1 - tolerance):
+                regressions.append(f"{name}: {stage} {old_speed:.2f} -> {new_speed:.2f} MB/s")
+    for curve in report['scaling']:
+        if curve['superlinear']:
+            regressions.append(f"{curve['codec']} L{curve['level']} {curve['kind']}: "
+                               f"superlinear scaling (encode exponent "
+                               f"{curve['encode_exponent']}, decode exponent "
+                               f"{curve['decode_exponent']})")
+    return regressions
+
+
+# A function that prints a line of the result table (to stderr, as all the
+# messages of the tool, so the JSON report can be written to stdout).
+# ------------------------------------------------------------------------------
+def print_result(result):
+    print(f"L{result['level']} {result['codec']:11s} {result['input']:16s} "
+          f"{result['raw_bytes']:>10,d} B  ratio {result['ratio']:7.4f}  "
+          f"enc {result['encode_mb_s']:8.2f} MB/s  dec {result['decode_mb_s']:8.2f} MB/s  "
+          f"peak {result['peak_bytes'] / 2 ** 20:7.2f} MiB"
+          f"{'' if result['lossless'] else '  NOT LOSSLESS'}", file=sys.stderr, flush=True)
+
+
+# The main function of the tool (returns the exit status).
+# ------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m LZWBench',
+        description='Benchmark the LZW coding classes (Level 1-5) against zlib and lzma.')
+    parser.add_argument('-o', '--output', help="path of the JSON report ('-' for stdout)")
+    parser.add_argument('-b', '--baseline', help='JSON report to compare the results with')
+    parser.add_argument('-l', '--levels', type=int, nargs='+', choices=LEVELS, default=LEVELS)
+    parser.add_argument('-k', '--kinds', nargs='+', choices=KINDS, default=KINDS)
+    parser.add_argument('-s', '--sides', type=int, nargs='+',
+                        help='side lengths of the synthetic images (default: %s)'
+                             % ' '.join(map(str, DEFAULT_SIDES)))
+    parser.add_argument('-r', '--repeats', type=int, default=DEFAULT_REPEATS,
+                        help='runs per input (the best time is kept)')
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative throughput drop against the baseline')
+    parser.add_argument('--quick', action='store_true',
+                        help='smaller inputs and a single run per input')
+    parser.add_argument('--no-baselines', action='store_true', help='skip zlib and lzma')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+                        help='block size of the blocked Level 1 runs (0: no blocked runs)')
+    parser.add_argument('-e', '--entropy', nargs='*', choices=ENTROPY_CODERS,
+                        default=ENTROPY_CODERS,
+                        help='entropy coders of the entropy coded runs (none: no such runs)')
+    args = parser.parse_args(argv)
+    sides = args.sides or (QUICK_SIDES if args.quick else DEFAULT_SIDES)
+    repeats = 1 if args.quick else args.repeats
+    if repeats < 1:
+        parser.error('--repeats must be at least 1')
+    if args.block_size < 0:
+        parser.error('--block-size must not be negative')
+
+    report = run_benchmark(args.levels, args.kinds, sides, repeats,
+                           not args.no_baselines, print_result, args.block_size,
+                           args.entropy)
+    for curve in report['scaling']:
+        if curve['codec'].startswith('lzw'):
+            print(f"L{curve['level']} {curve['codec']:11s} {curve['kind']:9s} scaling "
+                  f"exponent: encode {curve['encode_exponent']:.2f}, "
+                  f"decode {curve['decode_exponent']:.2f}"
+                  f"{'  SUPERLINEAR' if curve['superlinear'] else ''}", file=sys.stderr)
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {'results': []}   # without a baseline only the current run is checked
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(report, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION: {message}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# Bit packing utilities shared by the coding classes (Level 1-5).
+# ------------------------------------------------------------------------------
+# The integer codes are written MSB-first with a fixed number of bits per code
+# and the last byte is padded with zeros, which is exactly the layout that the
+# '0'/'1' string pipeline used to produce. The work is done on NumPy arrays in
+# chunks, so no intermediate bit string is ever built.
+#
+# In the variable-width mode (as in GIF and Unix compress) each code is written
+# with just enough bits for the largest code that can appear at that position:
+# the width starts at 9 bits and grows by one bit every time the dictionary
+# size crosses a power of two. The width of each code depends only on its
+# position in the stream, so both directions can still work on whole arrays.
+import numpy as np
+from LZWCore import FREEZE, RESET, LRU, first_free_code
+
+# the number of codes handled at once (a multiple of 8, so that every chunk
+# except the last one ends on a byte boundary)
+CHUNK_SIZE = 1 << 18
+
+# the code length field of a header stores the code length (the maximum code
+# length in the variable-width mode) in its low 5 bits, the dictionary policy
+# in the next 2 bits and the variable-width flag in the highest bit (a field
+# with only the code length is a file written without these options)
+VARIABLE_WIDTH_FLAG = 0x80
+POLICY_MASK = 0x60
+POLICY_BITS = {FREEZE: 0x00, RESET: 0x20, LRU: 0x40}
+CODE_LENGTH_MASK = 0x1F
+# the bit above them marks a residual stream whose code stream is preceded by
+# the predictor id of each row (see LZWPredict)
+PREDICTOR_FLAG = 0x100
+# and the next 2 bits store the color transform of a color channel (0: none;
+# see LZWColorTransform)
+COLOR_TRANSFORM_SHIFT = 9
+COLOR_TRANSFORM_MASK = 0x600
+# the padding byte stores the number of the zero bits added to the end of the
+# codes (0-7) in its low 3 bits and the entropy coder of the code stream (0:
+# none; see LZWEntropy) in bits 4-5
+PADDING_BITS = 0x07
+ENTROPY_SHIFT = 4
+ENTROPY_MASK = 0x30
+# the width of the first codes in the variable-width mode
+MIN_VARIABLE_WIDTH = 9
+# the widest code supported in the variable-width mode
+MAX_VARIABLE_WIDTH = 32
+
+
+# A function that packs a sequence of integer codes into bytes by using
+# code_length bits for each code and returns the packed bytes and the number
+# of zero bits added to the end of the last byte.
+# ------------------------------------------------------------------------------
+def pack_codes(codes, code_length):
+    codes = np.asarray(codes, dtype=np.uint64)
+    if codes.ndim != 1:
+        codes = codes.ravel()
+    if code_length < 1 or code_length > 64:
+        raise ValueError(f"Unsupported code length: {code_length}")
+
+    total_bits = codes.size * code_length
+    extra_padding = (8 - total_bits % 8) % 8
+
+    # 32-bit words are enough for any realistic dictionary size
+    word_bits = 32 if code_length <= 32 else 64
+    word_type = '>u4' if word_bits == 32 else '>u8'
+
+    chunks = []
+    for start in range(0, codes.size, CHUNK_SIZE):
+        chunk = codes[start:start + CHUNK_SIZE]
+        # big-endian bytes of each code -> one row of word_bits bits per code
+        as_bytes = chunk.astype(word_type).view(np.uint8)
+        bits = np.unpackbits(as_bytes.reshape(-1, word_bits // 8), axis=1)
+        # keep the low code_length bits of each code (MSB first) and pack the
+        # rows back into bytes (packbits pads the last byte with zeros)
+        chunks.append(np.packbits(bits[:, word_bits - code_length:]).tobytes())
+
+    return b''.join(chunks), extra_padding
+
+
+# A function that unpacks the integer codes from the given bytes (each code is
+# stored by using code_length bits) and returns them as a NumPy array.
+# (extra_padding is the number of zero bits added to the end of the last byte)
+# ------------------------------------------------------------------------------
+def unpack_codes(data, code_length, extra_padding=0):
+    if code_length < 1 or code_length > 64:
+        raise ValueError(f"Unsupported code length: {code_length}")
+    data = np.frombuffer(data, dtype=np.uint8)
+
+    # the number of complete codes in the data (the padding bits and an
+    # incomplete code at the end, if any, are ignored)
+    num_codes = (data.size * 8 - extra_padding) // code_length
+    word_bits = 32 if code_length <= 32 else 64
+    word_type = '>u4' if word_bits == 32 else '>u8'
+
+    codes = np.empty(num_codes, dtype=np.uint64)
+    for start in range(0, num_codes, CHUNK_SIZE):
+        count = min(CHUNK_SIZE, num_codes - start)
+        # every chunk starts on a byte boundary (CHUNK_SIZE is a multiple of 8)
+        first_byte = start * code_length // 8
+        last_byte = (start * code_length + count * code_length + 7) // 8
+        bits = np.unpackbits(data[first_byte:last_byte])[:count * code_length]
+        # one row per code, left-padded with zeros up to a full word
+        rows = np.zeros((count, word_bits), dtype=np.uint8)
+        rows[:, word_bits - code_length:] = bits.reshape(count, code_length)
+        words = np.packbits(rows, axis=1).view(word_type).ravel()
+        codes[start:start + count] = words
+
+    return codes
+
+
+# A generator that yields (width, count) pairs describing the code widths used
+# in the variable-width mode for the codes starting from the given position,
+# where max_size is the limit of the dictionary size (count is None for the
+# last width, which is used for all remaining codes) and alphabet_size is the
+# number of the single symbols.
+# ------------------------------------------------------------------------------
+def variable_width_segments(start=0, max_size=None, policy=FREEZE, alphabet_size=256):
+    first_size = first_free_code(alphabet_size, policy)
+    period = None
+    if policy == RESET:
+        # a CLEAR code is written after max_size - alphabet_size codes (one
+        # code per dictionary entry plus the code written when the dictionary
+        # is full), then the dictionary size starts over
+        period = max_size - alphabet_size + 1
+        start %= period
+    position = start
+    while True:
+        size = first_size + position
+        if max_size is not None:
+            size = min(size, max_size)
+        # the largest code that can be written is size - 1
+        width = max(MIN_VARIABLE_WIDTH, (size - 1).bit_length())
+        if width > MAX_VARIABLE_WIDTH:
+            raise ValueError(f"Code width exceeds {MAX_VARIABLE_WIDTH} bits.")
+        # the dictionary sizes up to 2**width need the same number of bits
+        if max_size is not None and max_size <= (1 << width):
+            if period is None:
+                yield width, None
+                return
+            count = period - position
+        else:
+            count = (1 << width) - size + 1
+        yield width, count
+        position += count
+        if position == period:
+            position = 0
+
+
+# A function that returns the widths of num_codes codes (starting from the
+# given position) in the variable-width mode as a NumPy array.
+# ------------------------------------------------------------------------------
+def variable_code_widths(num_codes, start=0, max_size=None, policy=FREEZE,
+                         alphabet_size=256):
+    widths = []
+    remaining = num_codes
+    for width, count in variable_width_segments(start, max_size, policy, alphabet_size):
+        if remaining == 0:
+            break
+        if count is None or count >= remaining:
+            widths.append(np.full(remaining, width, dtype=np.uint8))
+            break
+        widths.append(np.full(count, width, dtype=np.uint8))
+        remaining -= count
+    if not widths:
+        return np.zeros(0, dtype=np.uint8)
+    return np.concatenate(widths)
+
+
+# A function that returns the number of complete codes stored in total_bits
+# bits in the variable-width mode.
+# ------------------------------------------------------------------------------
+def count_variable_codes(total_bits, max_size=None, policy=FREEZE, alphabet_size=256):
+    num_codes = 0
+    if policy == RESET:
+        # skip the complete periods between two CLEAR codes at once
+        period = max_size - alphabet_size + 1
+        period_bits = int(variable_code_widths(period, 0, max_size, policy,
+                                               alphabet_size).sum(dtype=np.int64))
+        num_codes = total_bits // period_bits * period
+        total_bits %= period_bits
+    for width, count in variable_width_segments(0, max_size, policy, alphabet_size):
+        if count is None or count * width > total_bits:
+            return num_codes + total_bits // width
+        num_codes += count
+        total_bits -= count * width
+
+
+# A class that packs codes with varying widths into bytes incrementally (the
+# bits that do not fill a complete byte are kept for the next call).
+# ------------------------------------------------------------------------------
+class BitPacker:
+    def __init__(self):
+        self.leftover = np.zeros(0, dtype=np.uint8)   # fewer than 8 bits
+
+    # A method that packs the given codes (widths[i] bits for codes[i]) and
+    # returns the bytes that are complete.
+    # --------------------------------------------------------------------------
+    def pack(self, codes, widths):
+        codes = np.asarray(codes, dtype=np.uint64).ravel()
+        widths = np.asarray(widths, dtype=np.uint8).ravel()
+        chunks = []
+        for start in range(0, codes.size, CHUNK_SIZE):
+            chunk = codes[start:start + CHUNK_SIZE]
+            chunk_widths = widths[start:start + CHUNK_SIZE]
+            # one row of 64 bits per code (big-endian, MSB first)
+            as_bytes = chunk.astype('>u8').view(np.uint8).reshape(-1, 8)
+            rows = np.unpackbits(as_bytes, axis=1)
+            # keep the low widths[i] bits of row i (row-major order keeps the
+            # codes and their bits in the output order)
+            keep = np.arange(64) >= (64 - chunk_widths[:, None].astype(np.int64))
+            bits = np.concatenate((self.leftover, rows[keep]))
+            complete = bits.size - bits.size % 8
+            chunks.append(np.packbits(bits[:complete]).tobytes())
+            self.leftover = bits[complete:]
+        return b''.join(chunks)
+
+    # A method that returns the last (zero padded) byte and the number of the
+    # zeros added to it.
+    # --------------------------------------------------------------------------
+    def flush(self):
+        extra_padding = (8 - self.leftover.size % 8) % 8
+        last_byte = np.packbits(self.leftover).tobytes()
+        self.leftover = np.zeros(0, dtype=np.uint8)
+        return last_byte, extra_padding
+
+
+# A function that packs a sequence of integer codes into bytes in the
+# variable-width mode and returns the packed bytes and the number of zero bits
+# added to the end of the last byte.
+# ------------------------------------------------------------------------------
+def pack_variable_codes(codes, max_size=None, policy=FREEZE, alphabet_size=256):
+    codes = np.asarray(codes, dtype=np.uint64).ravel()
+    widths = variable_code_widths(codes.size, 0, max_size, policy, alphabet_size)
+    packer = BitPacker()
+    packed_codes = packer.pack(codes, widths)
+    last_byte, extra_padding = packer.flush()
+    return packed_codes + last_byte, extra_padding
+
+
+# A function that reads fields of the given widths (at most 32 bits each) that
+# follow each other from the start of the given bytes and returns them as a
+# NumPy array.
+# ------------------------------------------------------------------------------
+def read_bit_fields(data, widths):
+    data = np.frombuffer(data, dtype=np.uint8)
+    widths = np.asarray(widths, dtype=np.int64)
+    # the bit offset of each field in the data
+    ends = np.cumsum(widths, dtype=np.int64)
+    offsets = ends - widths
+    if ends.size and ends[-1] > data.size * 8:
+        raise ValueError("The packed bits are truncated.")
+    # zero bytes at the end, so that a 5-byte window can be read for any field
+    data = np.concatenate((data, np.zeros(5, dtype=np.uint8)))
+
+    values = np.empty(widths.size, dtype=np.uint64)
+    for start in range(0, widths.size, CHUNK_SIZE):
+        chunk_offsets = offsets[start:start + CHUNK_SIZE]
+        chunk_widths = widths[start:start + CHUNK_SIZE].astype(np.uint64)
+        first_byte = chunk_offsets >> 3
+        # a field of up to 32 bits starting at any bit of a byte lies within
+        # the 40 bits (5 bytes) starting at that byte
+        window = np.zeros(chunk_offsets.size, dtype=np.uint64)
+        for i in range(5):
+            window = (window << np.uint64(8)) | data[first_byte + i]
+        shift = np.uint64(40) - (chunk_offsets & 7).astype(np.uint64) - chunk_widths
+        mask = (np.uint64(1) << chunk_widths) - np.uint64(1)
+        values[start:start + chunk_offsets.size] = (window >> shift) & mask
+    return values
+
+
+# A function that unpacks the integer codes written in the variable-width mode
+# from the given bytes and returns them as a NumPy array.
+# ------------------------------------------------------------------------------
+def unpack_variable_codes(data, extra_padding=0, max_size=None, policy=FREEZE,
+                          alphabet_size=256):
+    total_bits = len(data) * 8 - extra_padding
+    num_codes = count_variable_codes(total_bits, max_size, policy, alphabet_size)
+    widths = variable_code_widths(num_codes, 0, max_size, policy, alphabet_size)
+    return read_bit_fields(data, widths)
+
+
+# A function that returns the value to store in the code length field of a
+# header for the given code length, code width mode and dictionary policy.
+# ------------------------------------------------------------------------------
+def make_code_length_field(code_length, variable_width=False, policy=FREEZE):
+    if code_length > CODE_LENGTH_MASK:
+        raise ValueError(f"Unsupported code length: {code_length}")
+    field = code_length | POLICY_BITS[policy]
+    if variable_width:
+        field |= VARIABLE_WIDTH_FLAG
+    return field
+
+
+# A function that splits the value of the code length field of a header into
+# the code length, the code width mode and the dictionary policy.
+# ------------------------------------------------------------------------------
+def parse_code_length_field(field):
+    policy_bits = field & POLICY_MASK
+    for policy, bits in POLICY_BITS.items():
+        if bits == policy_bits:
+            return field & CODE_LENGTH_MASK, bool(field & VARIABLE_WIDTH_FLAG), policy
+    raise ValueError(f"Invalid code length field: {field:#x}")
+
+
+# A function that packs the codes either with a fixed code length or in the
+# variable-width mode (with code_length as the maximum code length) and returns
+# the packed bytes, the number of zero bits added to the end and the value to
+# store in the code length field of the header.
+# (the dictionary is limited to 2**code_length entries by the given policy and
+# starts with alphabet_size single symbols). When an entropy coder is given
+# ('huffman' or 'range'), the codes are entropy coded instead and the coder is
+# recorded in the returned padding value.
+# ------------------------------------------------------------------------------
+def pack_code_stream(codes, code_length, variable_width=False, policy=FREEZE,
+                     alphabet_size=256, entropy=None):
+    field = make_code_length_field(code_length, variable_width, policy)
+    if entropy is not None:
+        # (imported here: the entropy coders use the bit packer of this module)
+        from LZWEntropy import entropy_encode, entropy_id
+        coder = entropy_id(entropy, variable_width)
+        packed_codes, extra_padding = entropy_encode(codes, coder, code_length, policy,
+                                                     alphabet_size)
+        return packed_codes, extra_padding | coder << ENTROPY_SHIFT, field
+    if not variable_width:
+        packed_codes, extra_padding = pack_codes(codes, code_length)
+    else:
+        packed_codes, extra_padding = pack_variable_codes(codes, 1 << code_length, policy,
+                                                          alphabet_size)
+    return packed_codes, extra_padding, field
+
+
+# A function that unpacks the codes written by pack_code_stream by using the
+# value of the code length field of the header (and the entropy coder in the
+# padding value) and returns them as a NumPy array.
+# ------------------------------------------------------------------------------
+def unpack_code_stream(data, code_length_field, extra_padding=0, alphabet_size=256):
+    code_length, variable_width, policy = parse_code_length_field(code_length_field)
+    coder = (extra_padding & ENTROPY_MASK) >> ENTROPY_SHIFT
+    if coder:
+        from LZWEntropy import entropy_decode
+        return entropy_decode(data, coder, code_length, policy, alphabet_size)
+    extra_padding &= PADDING_BITS
+    if not variable_width:
+        return unpack_codes(data, code_length, extra_padding)
+    return unpack_variable_codes(data, extra_padding, 1 << code_length, policy,
+                                 alphabet_size)
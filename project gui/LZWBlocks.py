@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# The blocked text mode of the text coding class (Level 1).
+# ------------------------------------------------------------------------------
+# The input is split into blocks of a fixed size (e.g., 1 MiB) and every block
+# is compressed with its own dictionary, so any byte range or any range of
+# lines can be decoded by reading only the blocks that cover it (e.g., a time
+# window of a large log file). The layout of the DATA section is:
+#   magic 'LZWB' (4 bytes), block size (4 bytes), original size (8 bytes),
+#   number of blocks (4 bytes),
+#   block data (the blocks in input order),
+#   block index ((number of blocks + 1) x 16 bytes at the end of the section:
+#   for each block the offset of its data relative to the start of the block
+#   data (8 bytes) and the number of line feeds before it (8 bytes); the last
+#   entry holds the end of the block data and the number of all line feeds)
+# and each block stores the padding info (1 byte), the code length info
+# (1 byte) and the codes (as a file of LZWCoding without the original size,
+# which follows from the block size). Block i holds the bytes from
+# i x block size, so the index only has to map the line numbers.
+#
+# The codec object provides compress_block and decompress_block for a single
+# block, which are applied to the blocks instead of the whole input. Since the
+# blocks are independent, they are compressed and decompressed in worker
+# processes (as the tiles of LZWTiles): the input or output is shared with the
+# workers through shared memory and the compressed blocks are written in
+# input order, so the result does not depend on the number of workers. The
+# blocked data can be read from a file or from memory (a path or a bytes-like
+# source).
+import multiprocessing
+import os
+import struct
+from multiprocessing import shared_memory
+import numpy as np
+from LZWContainer import DATA, is_path, read_at, read_info, source_name
+from LZWParallel import WorkerPool, add_counts
+from LZWStats import measure
+
+BLOCK_MAGIC = b'LZWB'
+BLOCK_HEADER = struct.Struct('>4sIQI')
+BLOCK_ENTRY = struct.Struct('>QQ')
+# the default block size (in bytes)
+DEFAULT_BLOCK_SIZE = 1 << 20
+# the line feed that ends a line
+LINE_FEED = 0x0A
+# the smallest input (in bytes) for which starting the worker processes pays off
+PARALLEL_MIN_BYTES = 1 << 20
+
+
+# A function that returns True if the given source (a path or the data) is a
+# blocked text file.
+# ------------------------------------------------------------------------------
+def is_blocked_file(source):
+    info = read_info(source)
+    start = 0 if info is None else info.section(DATA)[1]
+    return bytes(read_at(source, start, len(BLOCK_MAGIC))) == BLOCK_MAGIC
+
+
+# A function that returns the number of blocks of the given size that hold the
+# given number of bytes.
+# ------------------------------------------------------------------------------
+def block_count(size, block_size):
+    return -(-size // block_size)
+
+
+# A function that checks the given block size (None: the default size).
+# ------------------------------------------------------------------------------
+def check_block_size(block_size):
+    if block_size is None:
+        return DEFAULT_BLOCK_SIZE
+    if not 0 < block_size < 1 << 32:
+        raise ValueError(f"Invalid block size: {block_size}")
+    return block_size
+
+
+# A function that decides how many worker processes are used for the given
+# number of bytes and blocks (0: the blocks are processed in this process). A
+# process that is itself a worker of another pool (e.g., of LZWBatch with
+# several jobs) does not start its own workers, so the CPUs are not
+# oversubscribed.
+# ------------------------------------------------------------------------------
+def worker_count(parallel, size, num_blocks):
+    cpus = os.cpu_count() or 1
+    if not parallel or cpus < 2 or num_blocks < 2 or size < PARALLEL_MIN_BYTES or \
+            multiprocessing.parent_process() is not None:
+        return 0
+    return min(num_blocks, cpus)
+
+
+# A function that compresses one block and returns its data and the number of
+# line feeds in it.
+# ------------------------------------------------------------------------------
+def compress_block(codec, symbols):
+    return codec.compress_block(symbols), bytes(symbols).count(b'\n')
+
+
+# A function that compresses the given symbols (a bytes-like object) block by
+# block by using the given codec and writes the blocked layout to the given
+# output (e.g., a ContainerWriter). It returns the compressed blocks.
+# ------------------------------------------------------------------------------
+def write_blocked_data(codec, out, symbols, block_size, parallel=True):
+    size = len(symbols)
+    num_blocks = block_count(size, block_size)
+    out.write(BLOCK_HEADER.pack(BLOCK_MAGIC, block_size, size, num_blocks))
+    workers = worker_count(parallel, size, num_blocks)
+    if workers:
+        results = compress_blocks_parallel(codec, symbols, block_size, workers)
+    else:
+        results = [compress_block(codec, symbols[start:start + block_size])
+                   for start in range(0, size, block_size)]
+    offset, lines = 0, 0
+    index = []
+    for block, block_lines in results:
+        index.append(BLOCK_ENTRY.pack(offset, lines))
+        out.write(block)
+        offset += len(block)
+        lines += block_lines
+    index.append(BLOCK_ENTRY.pack(offset, lines))
+    out.write(b''.join(index))
+    return [block for block, _ in results]
+
+
+# A class that reads the header and the index of a blocked text file (a path or
+# the data) and decodes the blocks that cover a byte range or a range of lines.
+# The decoded blocks are kept while the reader is used, so the blocks that are
+# needed to find the start and the end of a range of lines are decoded once.
+# ------------------------------------------------------------------------------
+class BlockedTextReader:
+    def __init__(self, source):
+        self.source = source
+        info = read_info(source)
+        if info is None:
+            pos = 0
+            end = os.path.getsize(source) if is_path(source) else len(source)
+        else:
+            _, pos, length, _ = info.section(DATA)
+            end = pos + length
+        header = read_at(source, pos, BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size or bytes(header[:len(BLOCK_MAGIC)]) != BLOCK_MAGIC:
+            raise ValueError(f"{source_name(source)} is not a blocked text file.")
+        _, self.block_size, self.original_size, self.num_blocks = BLOCK_HEADER.unpack(header)
+        self.data_start = pos + BLOCK_HEADER.size
+        # the index is at the end of the section
+        index_size = BLOCK_ENTRY.size * (self.num_blocks + 1)
+        index = read_at(source, end - index_size, index_size)
+        if end - index_size < self.data_start or len(index) < index_size:
+            raise ValueError(f"{source_name(source)} is truncated.")
+        entries = np.frombuffer(index, dtype='>u8').astype(np.int64).reshape(-1, 2)
+        self.offsets = entries[:, 0]
+        self.first_lines = entries[:, 1]
+        self.cache = {}
+
+    # A method that decodes the given block by using the given codec and
+    # returns its bytes.
+    # --------------------------------------------------------------------------
+    def read_block(self, codec, i):
+        start = self.data_start + int(self.offsets[i])
+        payload = read_at(self.source, start, int(self.offsets[i + 1] - self.offsets[i]))
+        size = min(self.block_size, self.original_size - i * self.block_size)
+        return codec.decompress_block(payload, size)
+
+    # A method that returns the decoded bytes of the given block (decoded once
+    # for the reader).
+    # --------------------------------------------------------------------------
+    def decode_block(self, codec, i):
+        if i not in self.cache:
+            self.cache[i] = self.read_block(codec, i)
+        return self.cache[i]
+
+    # A method that decodes all the blocks (in worker processes if parallel is
+    # True and the data is large enough) and returns the original bytes.
+    # --------------------------------------------------------------------------
+    def decode_all(self, codec, parallel=True):
+        workers = worker_count(parallel, self.original_size, self.num_blocks)
+        if workers:
+            return decompress_blocks_parallel(codec, self, workers)
+        symbols = bytearray()
+        for i in range(self.num_blocks):
+            symbols += self.read_block(codec, i)
+        return symbols
+
+    # A method that decodes the given byte range (clipped to the original size)
+    # by using the given codec and returns it as a bytearray.
+    # --------------------------------------------------------------------------
+    def read_range(self, codec, start, length):
+        if start < 0 or length < 0:
+            raise ValueError(f"Invalid range: start {start}, length {length}")
+        end = min(start + length, self.original_size)
+        if start >= end:
+            return bytearray()
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        symbols = bytearray()
+        for i in range(first, last + 1):
+            symbols += self.decode_block(codec, i)
+        offset = first * self.block_size
+        return symbols[start - offset:end - offset]
+
+    # A method that returns the byte offset where the given line (counted from
+    # 0) starts (the original size for the lines after the last one) by using
+    # the given codec. Only the block with the line feed that ends the previous
+    # line is decoded.
+    # --------------------------------------------------------------------------
+    def line_offset(self, codec, line):
+        if line <= 0:
+            return 0
+        if line > self.first_lines[-1]:
+            return self.original_size
+        # the block with the line-th line feed
+        i = int(np.searchsorted(self.first_lines, line, side='left')) - 1
+        block = np.frombuffer(self.decode_block(codec, i), dtype=np.uint8)
+        line_feeds = np.flatnonzero(block == LINE_FEED)
+        return i * self.block_size + int(line_feeds[line - self.first_lines[i] - 1]) + 1
+
+    # A method that decodes the given lines (from first to last - 1, counted
+    # from 0 as in a slice; the line feeds are kept) by using the given codec
+    # and returns them as a bytearray.
+    # --------------------------------------------------------------------------
+    def read_lines(self, codec, first, last):
+        if first < 0 or last < 0:
+            raise ValueError(f"Invalid lines: {first} to {last}")
+        start = self.line_offset(codec, first)
+        end = self.line_offset(codec, last)
+        return self.read_range(codec, start, max(end - start, 0))
+
+
+# A function that compresses the blocks of the given symbols in worker
+# processes that read the input from shared memory and returns the data and
+# the number of line feeds of each block (in input order).
+# ------------------------------------------------------------------------------
+def compress_blocks_parallel(codec, symbols, block_size, workers):
+    size = len(symbols)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        shm.buf[:size] = symbols
+        with measure(getattr(codec, 'stats', None), 'parallel'), \
+                WorkerPool(codec, workers, block_count(size, block_size)) as pool:
+            futures = [pool.submit(compress_block_task, shm.name, start,
+                                   min(block_size, size - start))
+                       for start in range(0, size, block_size)]
+            pool.wait(futures, 'blocks')
+            results = []
+            for future in futures:
+                block, lines, worker_stats = future.result()
+                add_counts(codec, worker_stats)
+                results.append((block, lines))
+            return results
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# A function that decompresses all the blocks of the given reader in worker
+# processes that write the bytes into shared memory and returns the original
+# bytes.
+# ------------------------------------------------------------------------------
+def decompress_blocks_parallel(codec, reader, workers):
+    shm = shared_memory.SharedMemory(create=True, size=reader.original_size)
+    try:
+        with measure(getattr(codec, 'stats', None), 'parallel'), \
+                WorkerPool(codec, workers, reader.num_blocks) as pool:
+            futures = []
+            for i in range(reader.num_blocks):
+                start = reader.data_start + int(reader.offsets[i])
+                length = int(reader.offsets[i + 1] - reader.offsets[i])
+                # (a memoryview cannot be pickled, so the blocks are sent as
+                # bytes)
+                payload = bytes(read_at(reader.source, start, length))
+                futures.append(pool.submit(decompress_block_task, shm.name,
+                                           i * reader.block_size,
+                                           min(reader.block_size, reader.original_size
+                                               - i * reader.block_size), payload))
+            pool.wait(futures, 'blocks')
+            for future in futures:
+                add_counts(codec, future.result())
+        return bytearray(shm.buf[:reader.original_size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# The task run by a worker process to compress one block (returns the block
+# data, the number of line feeds and the statistics of the worker codec, if
+# any).
+# ------------------------------------------------------------------------------
+def compress_block_task(codec, shm_name, start, length):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        symbols = bytes(shm.buf[start:start + length])
+        block, lines = compress_block(codec, symbols)
+        return block, lines, getattr(codec, 'stats', None)
+    finally:
+        shm.close()
+
+
+# The task run by a worker process to decompress one block into shared memory
+# (returns the statistics of the worker codec, if any).
+# ------------------------------------------------------------------------------
+def decompress_block_task(codec, shm_name, start, length, data):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        shm.buf[start:start + length] = codec.decompress_block(data, length)
+        return getattr(codec, 'stats', None)
+    finally:
+        shm.close()
@@ -1,16 +1,53 @@
 #!/usr/bin/env python3
+import io
 import os
 import math
 import struct
 import numpy as np
 from PIL import Image
+from LZWCore import FREEZE, encode_symbols, decode_bytes, decode_into, first_free_code, \
+    peak_dict_size
+from LZWBits import pack_code_stream, parse_code_length_field, unpack_code_stream
+from LZWParallel import CHANNEL_HEADER, compress_planes, decompress_planes, split_channels
+from LZWTiles import TiledImageReader, is_tiled_file, write_tiled_file
+from LZWContainer import COLOR, ContainerWriter, feature_flags, is_path, map_file, \
+    read_data
+from LZWApi import load_pixels
+from LZWColorTransform import channel_from_planes, field_transform, forward_transform, \
+    inverse_transform, select_channel, transform_field, transform_id
+from LZWPalette import PALETTE_HEADER, PALETTE_MAGIC, alphabet_size, build_palette, \
+    index_buffer, is_palette_data
+from LZWStats import RunStats, count, measure
+from LZWEntropy import entropy_id
 
 class LZWColorCoding:
-    def __init__(self, filename, data_type):
+    def __init__(self, filename, data_type, variable_width=False,
+                 max_code_length=None, policy=FREEZE, tile_size=None,
+                 parallel=True, color_transform=None, interleaved=False,
+                 entropy=None, progress=None, trace_memory=False, profile=False,
+                 verbose=False):
         """
         Basit LZW tabanlı renkli (RGB) görüntü sıkıştırma/açma sınıfı.
         filename: giriş/çıkış dosya adı gövdesi (ör. 'lena_color')
         data_type: 'image' vb.
+        parallel: True ise büyük görüntülerde kanallar ayrı süreçlerde işlenir
+        color_transform: 'ycocg' veya 'subtract_green' verilirse kanallar
+        sıkıştırmadan önce kayıpsız bir renk dönüşümüyle birbirinden
+        arındırılır (bkz. LZWColorTransform); None ise R, G, B saklanır
+        interleaved: True ise kanallar ayrılmaz; görüntüdeki farklı renklerden
+        bir palet oluşturulur ve piksellerin palet numaraları tek bir ortak
+        sözlükle sıkıştırılır (az renkli grafik/sentetik görüntüler için,
+        bkz. LZWPalette)
+        entropy: 'huffman' veya 'range' verilirse kodlar sabit genişlikte
+        yazılmak yerine entropi kodlanır (bkz. LZWEntropy); açarken dosyadan
+        okunur
+        progress: kodlama/açma sırasında progress(stage, done, total) olarak
+        çağrılan fonksiyon (ör. ilerleme çubuğu için)
+        trace_memory / profile: self.stats'a (son işlemin aşama süreleri ve
+        sayıları, bkz. LZWStats) aşama başına bellek tepe değerini / sıcak
+        döngülerin cProfile profilini ekler
+        verbose: True ise dosya metotları her dosyanın ayrıntılarını yazdırır
+        (False: hiçbir şey yazdırılmaz; ayrıntılar self.stats'tadır)
         """
         self.filename = filename
         self.data_type = data_type
@@ -18,251 +55,418 @@ class LZWColorCoding:
         self.code_length_R = None
         self.code_length_G = None
         self.code_length_B = None
-
-    def compress_image_file(self):
+        # True ise kodlar 9 bitten başlayıp büyüyen genişliklerle yazılır;
+        # dosyada code_length alanının en üst bitinde (0x80) işaretlenir
+        self.variable_width = variable_width
+        # Her kanalın sözlüğü en fazla 2**max_code_length girdi içerir
+        # (None: sınırsız); dolduğunda policy uygulanır ('freeze', 'reset', 'lru')
+        self.max_code_length = max_code_length
+        self.policy = policy
+        # Entropi kodlayıcısı (None: yok); değişken genişlik moduyla birlikte
+        # kullanılmaz
+        entropy_id(entropy, variable_width)
+        self.entropy = entropy
+        # Kanallar birbirinden bağımsız olduğu için her biri ayrı bir süreçte
+        # (ayrı bir çekirdekte) sıkıştırılıp açılabilir (bkz. LZWParallel)
+        self.parallel = parallel
+        # tile_size verilirse görüntü tile_size x tile_size'lık döşemelere
+        # bölünür; her döşemenin her kanalı kendi sözlüğüyle sıkıştırılır ve
+        # decode_region ile yalnızca istenen bölgenin döşemeleri açılabilir
+        self.tile_size = tile_size
+        # Renk dönüşümü (None: yok); dönüşümün numarası her kanalın code_length
+        # alanında saklanır, açarken oradan okunur (geçersiz bir ad ValueError
+        # verir)
+        transform_id(color_transform)
+        self.color_transform = color_transform
+        # Ortak sözlüklü mod tek bir akış üretir; döşemelerle ve renk
+        # dönüşümüyle (palet boyutunu değiştirmez) birlikte kullanılmaz
+        if interleaved and (tile_size or color_transform):
+            raise ValueError("The interleaved mode cannot be combined with tiles "
+                             "or a color transform.")
+        self.interleaved = interleaved
+        self.progress = progress
+        self.stats = None
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.verbose = verbose
+
+    def compress(self, image):
+        """
+        Bellekte sıkıştırma (dosya sistemine dokunulmaz, bkz. LZWApi).
+        image: numpy dizisi, PIL görüntüsü, dosya nesnesi veya kodlanmış
+        görüntü (ör. PNG) byte'ları
+        return: .bin dosyasının byte'ları
+        """
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(image, 'RGB')  # 3 kanal (R, G, B)
+        compressed_data = self.compress_pixels(pixel_array)
+        self.stats.finish(pixel_array.size, len(compressed_data))
+        return compressed_data
+
+    def compress_pixels(self, pixel_array):
         """
-        1) Renkli görüntüyü oku (R, G, B)
         2) Her kanalı (R, G, B) ayrı ayrı LZW sıkıştır
         3) Her kanal için code_length hesapla
-        4) Tek bir .bin dosyasına meta bilgi + sıkıştırılmış veriyi yaz
+        4) Meta bilgi + sıkıştırılmış veriyi kapsayıcının byte'ları olarak döndür
         """
-        current_directory = os.path.dirname(os.path.realpath(__file__))
-        input_file = self.filename + '.png'   # örnek uzantı
-        input_path = os.path.join(current_directory, input_file)
-        output_file = self.filename + '.bin'
-        output_path = os.path.join(current_directory, output_file)
-
-        # 1) Renkli görüntüyü oku
-        img = Image.open(input_path).convert('RGB')  # 3 kanal (R, G, B)
-        pixel_array = np.array(img)
         height, width, channels = pixel_array.shape  # channels = 3
+        # Renk dönüşümü (seçildiyse) tüm görüntüye kanal işlemlerinden önce uygulanır
+        with measure(self.stats, 'transform'):
+            pixel_array = forward_transform(pixel_array, transform_id(self.color_transform))
+        out_buffer = io.BytesIO()
+        with ContainerWriter(out_buffer, COLOR, feature_flags(self)) as f:
+            if self.tile_size:
+                # Döşemeli mod: döşemeler (büyük görüntülerde paralel olarak)
+                # sıkıştırılır ve döşeme ofset tablosuyla birlikte yazılır
+                write_tiled_file(self, f, pixel_array, self.tile_size,
+                                 parallel=self.parallel)
+            elif self.interleaved:
+                # Ortak sözlüklü mod: palet ve palet numaralarının tek akışı
+                f.write(self.compress_interleaved(pixel_array))
+            else:
+                # 2-4) Her kanalı (R, G, B) ayrı ayrı LZW ile sıkıştır ve paketle
+                # (büyük görüntülerde üç kanal paralel olarak işlenir)
+                results = compress_planes(self, pixel_array, self.parallel)
+                byte_array_R, extra_pad_R, info_R, self.code_length_R = results[0]
+                byte_array_G, extra_pad_G, info_G, self.code_length_G = results[1]
+                byte_array_B, extra_pad_B, info_B, self.code_length_B = results[2]
+
+                # Dosyaya yazacağımız format (basit bir örnek):
+                # width (4 byte), height (4 byte)
+                # code_length_R (2 byte), extra_pad_R (1 byte), R data length (4 byte), R data
+                # code_length_G (2 byte), extra_pad_G (1 byte), G data length (4 byte), G data
+                # code_length_B (2 byte), extra_pad_B (1 byte), B data length (4 byte), B data
+                # width, height
+                f.write(struct.pack('>I', width))
+                f.write(struct.pack('>I', height))
+
+                # R meta
+                f.write(struct.pack('>H', info_R))  # 2 byte
+                f.write(struct.pack('>B', extra_pad_R))         # 1 byte (R padding)
+                f.write(struct.pack('>I', len(byte_array_R)))   # 4 byte (R data uzunluğu)
+                f.write(byte_array_R)
+
+                # G meta
+                f.write(struct.pack('>H', info_G))
+                f.write(struct.pack('>B', extra_pad_G))
+                f.write(struct.pack('>I', len(byte_array_G)))
+                f.write(byte_array_G)
+
+                # B meta
+                f.write(struct.pack('>H', info_B))
+                f.write(struct.pack('>B', extra_pad_B))
+                f.write(struct.pack('>I', len(byte_array_B)))
+                f.write(byte_array_B)
+        return out_buffer.getvalue()
+
+    def compress_interleaved(self, pixel_array):
+        """
+        Ortak sözlüklü mod: görüntüdeki farklı renklerden palet oluşturulur,
+        piksellerin palet numaraları (alfabe = palet) tek bir LZW akışı olarak
+        sıkıştırılır. Aynı RGB üçlüsü üç ayrı sözlükte öğrenilmez ve her kod
+        tam piksellerden oluşan bir diziyi gösterir.
+        return: DATA bölümünün byte'ları (düzen için bkz. LZWPalette)
+        """
+        height, width, _ = pixel_array.shape
+        with measure(self.stats, 'transform'):
+            palette, indices = build_palette(pixel_array)
+        alphabet = alphabet_size(len(palette))
+        encoded, dict_size = self.encode_channel(indices.tolist(), alphabet)
+        # (küçük paletlerde de 'reset' politikasının CLEAR kodundan sonra en az
+        # bir girdiye yer olmalı, bkz. LZWCore.dictionary_limit)
+        dict_size = max(dict_size, first_free_code(alphabet, self.policy) + 1)
+        code_length = max(1, math.ceil(math.log2(dict_size)))
+        with measure(self.stats, 'pack'):
+            byte_array, extra_pad, info = pack_code_stream(
+                encoded, code_length, self.variable_width, self.policy, alphabet,
+                self.entropy)
+        # Başlık (palet boyutu dahil), palet ve tek kanal gibi saklanan kodlar
+        return (PALETTE_HEADER.pack(PALETTE_MAGIC, width, height, len(palette)) +
+                palette.tobytes() + CHANNEL_HEADER.pack(info, extra_pad, len(byte_array)) +
+                byte_array)
+
+    def compress_image_file(self, input_path=None, output_path=None):
+        """
+        1) Renkli görüntüyü oku (R, G, B)
+        2-4) Bellekte sıkıştır (compress_pixels)
+        5) Sonucu .bin dosyasına yaz
+        """
+        # (input_path / output_path verilmemişse dosya adı gövdesinden oluşturulur)
+        current_directory = os.path.dirname(os.path.realpath(__file__))
+        if input_path is None:
+            input_path = os.path.join(current_directory, self.filename + '.png')   # örnek uzantı
+        if output_path is None:
+            output_path = os.path.join(current_directory, self.filename + '.bin')
+        input_file = os.path.basename(input_path)
+        output_file = os.path.basename(output_path)
 
-        # Ayrı kanallara ayır (R, G, B)
-        R_channel = pixel_array[..., 0].flatten().tolist()
-        G_channel = pixel_array[..., 1].flatten().tolist()
-        B_channel = pixel_array[..., 2].flatten().tolist()
-
-        # 2) Her kanalı LZW ile sıkıştır
-        encoded_R, dict_size_R = self.encode_channel(R_channel)
-        encoded_G, dict_size_G = self.encode_channel(G_channel)
-        encoded_B, dict_size_B = self.encode_channel(B_channel)
-
-        # 3) code_length hesapla
-        self.code_length_R = math.ceil(math.log2(dict_size_R))
-        self.code_length_G = math.ceil(math.log2(dict_size_G))
-        self.code_length_B = math.ceil(math.log2(dict_size_B))
-
-        # 4) Kodları bit string'e çevirip padding ekle
-        bitstring_R = self.int_list_to_bitstring(encoded_R, self.code_length_R)
-        padded_R, extra_pad_R = self.pad_bitstring(bitstring_R)
-        byte_array_R = self.bitstring_to_byte_array(padded_R)
-
-        bitstring_G = self.int_list_to_bitstring(encoded_G, self.code_length_G)
-        padded_G, extra_pad_G = self.pad_bitstring(bitstring_G)
-        byte_array_G = self.bitstring_to_byte_array(padded_G)
-
-        bitstring_B = self.int_list_to_bitstring(encoded_B, self.code_length_B)
-        padded_B, extra_pad_B = self.pad_bitstring(bitstring_B)
-        byte_array_B = self.bitstring_to_byte_array(padded_B)
-
-        # Dosyaya yazacağımız format (basit bir örnek):
-        # width (4 byte), height (4 byte)
-        # code_length_R (2 byte), extra_pad_R (1 byte), R data length (4 byte), R data
-        # code_length_G (2 byte), extra_pad_G (1 byte), G data length (4 byte), G data
-        # code_length_B (2 byte), extra_pad_B (1 byte), B data length (4 byte), B data
-        with open(output_path, 'wb') as f:
-            # width, height
-            f.write(struct.pack('>I', width))
-            f.write(struct.pack('>I', height))
-
-            # R meta
-            f.write(struct.pack('>H', self.code_length_R))  # 2 byte
-            f.write(struct.pack('>B', extra_pad_R))         # 1 byte (R padding)
-            f.write(struct.pack('>I', len(byte_array_R)))   # 4 byte (R data uzunluğu)
-            f.write(byte_array_R)
-
-            # G meta
-            f.write(struct.pack('>H', self.code_length_G))
-            f.write(struct.pack('>B', extra_pad_G))
-            f.write(struct.pack('>I', len(byte_array_G)))
-            f.write(byte_array_G)
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
 
-            # B meta
-            f.write(struct.pack('>H', self.code_length_B))
-            f.write(struct.pack('>B', extra_pad_B))
-            f.write(struct.pack('>I', len(byte_array_B)))
-            f.write(byte_array_B)
+        # 1) Renkli görüntüyü oku
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(input_path, 'RGB')  # 3 kanal (R, G, B)
+        height, width, _ = pixel_array.shape
+        compressed_data = self.compress_pixels(pixel_array)
+        # 5) Dosyaya yaz
+        with measure(self.stats, 'write'), open(output_path, 'wb') as f:
+            f.write(compressed_data)
 
         # Sıkıştırma oranı hesaplama (isteğe bağlı)
         original_size = width * height * 3  # her piksel 3 byte (RGB)
-        compressed_size = os.path.getsize(output_path)
-        print(f"{input_file} is compressed into {output_file}.")
-        print(f"Original pixel count (3 channels): {original_size} bytes")
-        print(f"Compressed file size: {compressed_size} bytes")
-        if original_size != 0:
-            ratio = compressed_size / original_size
-            print(f"Compression Ratio: {ratio:.3f}")
-
-    def encode_channel(self, channel_data):
+        compressed_size = len(compressed_data)
+        if self.verbose:
+            print(f"{input_file} is compressed into {output_file}.")
+            print(f"Original pixel count (3 channels): {original_size} bytes")
+            print(f"Compressed file size: {compressed_size} bytes")
+            if original_size != 0:
+                ratio = compressed_size / original_size
+                print(f"Compression Ratio: {ratio:.3f}")
+        self.stats.finish(original_size, compressed_size)
+        return output_path
+
+    def compress_plane(self, plane):
         """
-        channel_data: 0..255 aralığında int list (örneğin R kanalının piksel değerleri).
-        return: (encoded_list, dict_size)
+        Tek bir kanalı (height x width uint8 dizi) sıkıştırır.
+        return: (byte_array, extra_pad, code_length alanı, code_length)
         """
-        dict_size = 256
-        dictionary = { (i,): i for i in range(dict_size) }
-
-        w = []
-        encoded = []
-        for val in channel_data:
-            w_plus = w + [val]
-            if tuple(w_plus) in dictionary:
-                w = w_plus
-            else:
-                encoded.append(dictionary[tuple(w)])
-                dictionary[tuple(w_plus)] = dict_size
-                dict_size += 1
-                w = [val]
-        if w:
-            encoded.append(dictionary[tuple(w)])
-
-        return encoded, dict_size
-
-    def int_list_to_bitstring(self, codes, code_length):
+        # Kanalı LZW ile sıkıştır
+        encoded, dict_size = self.encode_channel(plane.ravel().tolist())
+        # code_length hesapla
+        code_length = math.ceil(math.log2(dict_size))
+        # Kodları byte'lara paketle (padding miktarı ayrıca döner)
+        with measure(self.stats, 'pack'):
+            byte_array, extra_pad, info = pack_code_stream(
+                encoded, code_length, self.variable_width, self.policy,
+                entropy=self.entropy)
+        # Renk dönüşümünün numarası (bkz. COLOR_TRANSFORM_MASK)
+        info |= transform_field(transform_id(self.color_transform))
+        return byte_array, extra_pad, info, code_length
+
+    def encode_channel(self, channel_data, alphabet=256):
         """
-        Her integer kodu code_length bitlik string'e çevirip birleştirir.
+        channel_data: 0..255 aralığında int list (örneğin R kanalının piksel değerleri;
+        ortak sözlüklü modda 0..alphabet-1 aralığında palet numaraları).
+        return: (encoded_list, dict_size)
         """
-        bitstring = ""
-        for c in codes:
-            bitstring += format(c, f'0{code_length}b')
-        return bitstring
+        max_dict_size = None if self.max_code_length is None else 2 ** self.max_code_length
+        with measure(self.stats, 'lzw'):
+            encoded, dict_size = encode_symbols(channel_data, alphabet, max_dict_size,
+                                                self.policy, self.progress)
+        count(self.stats, len(channel_data), len(encoded), dict_size)
+        return encoded, dict_size
 
-    def pad_bitstring(self, bitstring):
+    def decompress(self, data):
         """
-        bitstring uzunluğu 8'in katı değilse padding ekler.
-        extra_padding'i 1 byte olarak döndürüyoruz.
+        Bellekte açma (dosya sistemine dokunulmaz).
+        data: .bin dosyasının byte'ları
+        return: h x w x 3 uint8 dizi
         """
-        extra_padding = (8 - len(bitstring) % 8) % 8
-        padded = bitstring + ('0' * extra_padding)
-        return padded, extra_padding
-
-    def bitstring_to_byte_array(self, bitstring):
-        if len(bitstring) % 8 != 0:
-            raise ValueError("Bitstring length is not multiple of 8.")
-        b_arr = bytearray()
-        for i in range(0, len(bitstring), 8):
-            chunk = bitstring[i:i+8]
-            b_arr.append(int(chunk, 2))
-        return b_arr
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        color_array = self.decompress_pixels(data)
+        self.stats.finish(len(data), color_array.size)
+        return color_array
 
-    def decompress_image_file(self):
+    def decompress_pixels(self, source):
         """
-        1) .bin dosyasını aç
+        1) Veriyi oku (source: .bin dosyasının yolu veya byte'ları)
         2) width, height oku
         3) Her kanalın meta bilgilerini ve verisini oku
         4) LZW decode ile R, G, B piksel dizilerini geri al
         5) R, G, B kanallarını birleştirerek renkli görüntü oluştur
+        """
+        if is_tiled_file(source):
+            # Döşemeli dosya: tüm döşemeleri aç, birleştir ve renk dönüşümünü geri al
+            reader = TiledImageReader(source)
+            planes = reader.decode_image(self, self.parallel)
+            with measure(self.stats, 'transform'):
+                return inverse_transform(planes, field_transform(reader.first_field()))
+        with measure(self.stats, 'read'):
+            data = read_data(source)
+        if is_palette_data(data):
+            # Ortak sözlüklü (interleaved) dosya
+            return self.decompress_interleaved(data)
+        # width, height
+        width, height = struct.unpack_from('>II', data)
+        # R, G, B meta: code_length (2 byte), padding (1 byte), uzunluk (4 byte), veri
+        # (kanal verileri kopyalanmaz, tampondan memoryview dilimleridir)
+        channel_args = split_channels(data, 8, 3)
+        self.code_length_R, self.code_length_G, self.code_length_B = \
+            (args[1] for args in channel_args)
+
+        # Her kanal için padding'i atlayarak kod listesine dön, decode et ve
+        # üç kanalı birleştirerek renkli görüntü oluştur (büyük görüntülerde
+        # kanallar paralel olarak açılır)
+        planes = decompress_planes(self, channel_args, height, width, self.parallel)
+        # Renk dönüşümü (varsa) geri alınarak R, G, B kanallarına dönülür
+        with measure(self.stats, 'transform'):
+            return inverse_transform(planes, field_transform(channel_args[0][1]))
+
+    def decompress_image_file(self, input_path=None, output_path=None):
+        """
+        1-5) .bin dosyasını aç (decompress_pixels)
         6) .png dosyasına kaydet
         """
+        # (input_path / output_path verilmemişse dosya adı gövdesinden oluşturulur)
         current_directory = os.path.dirname(os.path.realpath(__file__))
-        input_file = self.filename + '.bin'
-        input_path = os.path.join(current_directory, input_file)
-        output_file = self.filename + '_decompressed.png'
-        output_path = os.path.join(current_directory, output_file)
-
-        with open(input_path, 'rb') as f:
-            # width, height
-            width = struct.unpack('>I', f.read(4))[0]
-            height = struct.unpack('>I', f.read(4))[0]
-
-            # R meta
-            self.code_length_R = struct.unpack('>H', f.read(2))[0]
-            extra_pad_R = struct.unpack('>B', f.read(1))[0]
-            length_R = struct.unpack('>I', f.read(4))[0]
-            data_R = f.read(length_R)
-
-            # G meta
-            self.code_length_G = struct.unpack('>H', f.read(2))[0]
-            extra_pad_G = struct.unpack('>B', f.read(1))[0]
-            length_G = struct.unpack('>I', f.read(4))[0]
-            data_G = f.read(length_G)
-
-            # B meta
-            self.code_length_B = struct.unpack('>H', f.read(2))[0]
-            extra_pad_B = struct.unpack('>B', f.read(1))[0]
-            length_B = struct.unpack('>I', f.read(4))[0]
-            data_B = f.read(length_B)
-
-        # Her kanal için bitstring'e çevir, padding çıkar, kod listesine dön
-        R_channel = self.decompress_channel(data_R, self.code_length_R, extra_pad_R)
-        G_channel = self.decompress_channel(data_G, self.code_length_G, extra_pad_G)
-        B_channel = self.decompress_channel(data_B, self.code_length_B, extra_pad_B)
-
-        # Her kanaldaki piksel sayısı = width * height olmalı
-        if len(R_channel) != width * height or len(G_channel) != width * height or len(B_channel) != width * height:
-            raise ValueError("Decoded channel sizes do not match width*height.")
+        if input_path is None:
+            input_path = os.path.join(current_directory, self.filename + '.bin')
+        if output_path is None:
+            output_path = os.path.join(current_directory, self.filename + '_decompressed.png')
+        input_file = os.path.basename(input_path)
+        output_file = os.path.basename(output_path)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
 
-        # 2D matrislere dönüştür
-        R_arr = np.array(R_channel, dtype=np.uint8).reshape((height, width))
-        G_arr = np.array(G_channel, dtype=np.uint8).reshape((height, width))
-        B_arr = np.array(B_channel, dtype=np.uint8).reshape((height, width))
-
-        # Üç kanalı birleştirerek renkli görüntü oluştur
-        color_array = np.dstack((R_arr, G_arr, B_arr))
+        # Dosya belleğe eşlenir (mmap); sayfalar yalnızca okundukça diskten gelir
+        color_array = self.decompress_pixels(map_file(input_path))
 
         # Görüntüyü kaydet
-        img = Image.fromarray(color_array, 'RGB')
-        img.save(output_file)
+        with measure(self.stats, 'write'):
+            img = Image.fromarray(color_array, 'RGB')
+            img.save(output_path)
 
-        print(f"{input_file} is decompressed into {output_file}.")
+        if self.verbose:
+            print(f"{input_file} is decompressed into {output_file}.")
+        self.stats.finish(os.path.getsize(input_path), color_array.size)
+        return output_path
 
-    def decompress_channel(self, byte_data, code_length, extra_pad):
+    def read_channel(self, channel, source=None):
         """
-        1) byte_data -> bitstring
-        2) extra_pad kadar bit sonundan sil
-        3) bitstring'i code_length parçalarına ayırıp integer kod listesi oluştur
-        4) LZW decode
-        5) piksel dizisi (0..255) döndür
+        Yalnızca bir kanalı açar; diğer kanalların verisine dokunulmaz (dosya
+        belleğe eşlendiği için okunmazlar da). Örneğin yalnızca G düzlemi
+        gereken analizler için çözme işi ve G/Ç üçte birine iner.
+        channel: 0-2 veya 'R', 'G', 'B'; renk dönüşümlü dosyalarda saklanan
+        bir düzlemin adı da verilebilir (ör. 'Y': yalnızca parlaklık). Renk
+        dönüşümlü dosyalarda bir RGB kanalı için gereken düzlemler açılır
+        (ör. 'subtract_green' ile G için yalnızca bir, R için iki düzlem).
+        source: .bin dosyasının yolu veya byte'ları (None: filename + '.bin')
+        Not: hız için DATA bölümünün CRC32'si denetlenmez (bkz.
+        LZWContainer.verify_file).
+        return: h x w uint8 dizi
         """
-        bitstring = ""
-        for b in byte_data:
-            bitstring += format(b, '08b')
-
-        # Padding çıkar
-        if extra_pad > 0:
-            bitstring = bitstring[:-extra_pad]
+        if source is None:
+            current_directory = os.path.dirname(os.path.realpath(__file__))
+            source = os.path.join(current_directory, self.filename + '.bin')
+        input_size = os.path.getsize(source) if is_path(source) else len(source)
+        if is_path(source):
+            source = map_file(source)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        if is_tiled_file(source):
+            reader = TiledImageReader(source)
+            tid = field_transform(reader.first_field())
+            needed, rgb_index = select_channel(tid, channel)
+            # Döşemeli dosya: her döşemeden yalnızca gereken düzlemler açılır
+            planes = {index: reader.decode_image(self, self.parallel, index)
+                      for index in needed}
+        else:
+            with measure(self.stats, 'read'):
+                data = read_data(source, verify=False)
+            if is_palette_data(data):
+                # Ortak sözlüklü dosya: tek akış olduğu için tüm numaralar
+                # açılır, yalnızca istenen kanal paletten okunur
+                tid = 0
+                needed, rgb_index = select_channel(tid, channel)
+                planes = {needed[0]: self.decompress_interleaved(data, needed[0])}
+            else:
+                width, height = struct.unpack_from('>II', data)
+                tid = field_transform(split_channels(data, 8, 1)[0][1])
+                needed, rgb_index = select_channel(tid, channel)
+                # Yalnızca gereken son düzleme kadar olan başlıklar okunur
+                channel_args = split_channels(data, 8, max(needed) + 1)
+                planes = {index: self.decompress_plane(*channel_args[index], height, width)
+                          for index in needed}
+        if rgb_index is None:
+            plane = planes[needed[0]]
+        else:
+            with measure(self.stats, 'transform'):
+                plane = channel_from_planes(tid, rgb_index, planes)
+        self.stats.finish(input_size, plane.size)
+        return plane
+
+    def decode_region(self, x, y, w, h, source=None):
+        """
+        Döşemeli .bin dosyasından yalnızca (x, y, w, h) dikdörtgenini kapsayan
+        döşemeleri okuyup açar (görüntünün geri kalanı açılmaz).
+        source: .bin dosyasının yolu (belleğe eşlenir) veya byte'ları (None:
+        filename + '.bin'); hız için DATA bölümünün CRC32'si denetlenmez
+        return: h x w x 3 uint8 dizi
+        """
+        if source is None:
+            current_directory = os.path.dirname(os.path.realpath(__file__))
+            source = os.path.join(current_directory, self.filename + '.bin')
+        input_size = os.path.getsize(source) if is_path(source) else len(source)
+        if is_path(source):
+            source = map_file(source)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        reader = TiledImageReader(source)
+        region = reader.decode_region(self, x, y, w, h, self.parallel)
+        with measure(self.stats, 'transform'):
+            region = inverse_transform(region, field_transform(reader.first_field()))
+        self.stats.finish(input_size, region.size)
+        return region
+
+    def decompress_interleaved(self, data, channel=None):
+        """
+        Ortak sözlüklü moddaki DATA bölümünü açar: palet numaraları tek
+        akıştan çözülür ve paletten renklere çevrilir.
+        channel: verilirse yalnızca bu kanal (0-2) paletten okunur
+        return: h x w x 3 (channel verilirse h x w) uint8 dizi
+        """
+        _, width, height, palette_size = PALETTE_HEADER.unpack_from(data)
+        pos = PALETTE_HEADER.size
+        palette = np.frombuffer(data, dtype=np.uint8, count=3 * palette_size,
+                                offset=pos).reshape((palette_size, 3))
+        byte_data, code_length, extra_pad = split_channels(data, pos + palette.size, 1)[0]
+        alphabet = alphabet_size(palette_size)
+        with measure(self.stats, 'unpack'):
+            codes = unpack_code_stream(byte_data, code_length, extra_pad, alphabet).tolist()
+        bits, _, policy = parse_code_length_field(code_length)
+        # Numaralar (256'dan fazla renk varsa 16/32 bitlik) önceden ayrılmış
+        # bir tampona yazılır
+        out, index_type = index_buffer(width * height, alphabet)
+        with measure(self.stats, 'lzw'):
+            size = decode_into(codes, out, alphabet, 2 ** bits, policy, progress=self.progress)
+        if size != width * height:
+            raise ValueError("The decoded data is shorter than expected.")
+        count(self.stats, size, len(codes), peak_dict_size(codes, alphabet, 2 ** bits, policy))
+        indices = np.frombuffer(out, dtype=index_type)
+        with measure(self.stats, 'transform'):
+            colors = palette if channel is None else palette[:, channel]
+            return colors[indices].reshape((height, width) + colors.shape[1:])
+
+    def decompress_plane(self, byte_data, code_length, extra_pad, height, width):
+        """
+        Tek bir kanalı açar.
+        return: height x width uint8 dizi
+        """
+        # Kanaldaki piksel sayısı = width * height olmalı (decode bunu denetler)
+        channel = self.decompress_channel(byte_data, code_length, extra_pad, width * height)
+        # bytearray kopyalanmadan 2D matris olarak görülür
+        return np.frombuffer(channel, dtype=np.uint8).reshape((height, width))
 
-        # Kod listesi
-        codes = []
-        for i in range(0, len(bitstring), code_length):
-            chunk = bitstring[i:i+code_length]
-            if len(chunk) < code_length:
-                break
-            val = int(chunk, 2)
-            codes.append(val)
+    def decompress_channel(self, byte_data, code_length, extra_pad, size=None):
+        """
+        1) byte_data -> integer kod dizisi (code_length bitlik, extra_pad bit hariç)
+        2) LZW decode
+        3) piksel dizisi (0..255, bytearray) döndür (size: piksel sayısı, biliniyorsa)
+        """
+        # Kod listesi (code_length, header'daki alanın tamamıdır: bayraklar dahil)
+        with measure(self.stats, 'unpack'):
+            codes = unpack_code_stream(byte_data, code_length, extra_pad).tolist()
 
-        # LZW decode
-        channel_data = self.decode_channel(codes)
+        # LZW decode (sıkıştırmadaki sözlük sınırı ve politikası ile)
+        bits, _, policy = parse_code_length_field(code_length)
+        channel_data = self.decode_channel(codes, 2 ** bits, policy, size)
         return channel_data
 
-    def decode_channel(self, codes):
+    def decode_channel(self, codes, max_dict_size=None, policy=FREEZE, size=None):
         """
         LZW dekompresyon. codes: integer list
-        return: piksel list (0..255)
+        return: pikseller (0..255) bytearray olarak; size verilirse çıktı bir
+        kez ayrılır ve sözlük girdileri çıktıdaki (konum, uzunluk) ile tutulur
         """
-        dict_size = 256
-        dictionary = {i: [i] for i in range(dict_size)}
-
-        w = dictionary[codes[0]]
-        result = w[:]
-        for code in codes[1:]:
-            if code in dictionary:
-                entry = dictionary[code]
-            elif code == dict_size:
-                entry = w + [w[0]]
-            else:
-                raise ValueError(f"Bad compressed code: {code}")
-            result.extend(entry)
-            dictionary[dict_size] = w + [entry[0]]
-            dict_size += 1
-            w = entry
-        return result
+        with measure(self.stats, 'lzw'):
+            pixels = decode_bytes(codes, size, 256, max_dict_size, policy, self.progress)
+        count(self.stats, len(pixels), len(codes),
+              peak_dict_size(codes, 256, max_dict_size, policy))
+        return pixels
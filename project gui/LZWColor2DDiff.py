@@ -1,27 +1,106 @@
 #!/usr/bin/env python3
+import io
 import os
 import math
 import struct
 import numpy as np
 from PIL import Image
+from LZWCore import FREEZE, encode_symbols, decode_bytes, peak_dict_size
+from LZWBits import PREDICTOR_FLAG, pack_code_stream, parse_code_length_field, unpack_code_stream
+from LZWParallel import compress_planes, decompress_planes, split_channels
+from LZWTiles import TiledImageReader, is_tiled_file, write_tiled_file
+from LZWContainer import COLOR_2D_DIFF, ContainerWriter, feature_flags, is_path, map_file, \
+    read_data
+from LZWApi import load_pixels
+from LZWColorTransform import channel_from_planes, field_transform, forward_transform, \
+    inverse_transform, select_channel, transform_field, transform_id
+from LZWPredict import predict, reconstruct
+from LZWStats import RunStats, count, measure
+from LZWEntropy import entropy_id
 
 class LZWColor2DDiffCoding:
-    def __init__(self, filename, data_type):
+    def __init__(self, filename, data_type, variable_width=False,
+                 max_code_length=None, policy=FREEZE, tile_size=None,
+                 parallel=True, predictor=None, color_transform=None,
+                 entropy=None, progress=None, trace_memory=False, profile=False,
+                 verbose=False):
         """
-        Level 5: 2D fark (satır ve sütun farkı) tabanlı LZW sıkıştırma/açma.
-        Bu sürümde farklar, (current - neighbor) mod 256 şeklinde hesaplanır.
+        Level 5: 2D fark tabanlı LZW sıkıştırma/açma.
+        Varsayılan olarak ilk sütunda üst komşudan, diğer piksellerde sol
+        komşudan fark alınır: (current - neighbor) mod 256.
+        predictor: 'left', 'up', 'average', 'paeth', 'med' veya 'adaptive'
+        (satır başına en iyi tahminci) verilirse farklar LZWPredict ile
+        hesaplanır; None ise yukarıdaki varsayılan fark kullanılır.
         filename: dosya adının uzantısız kısmı (örneğin, 'lena_color')
         data_type: 'image'
+        parallel: True ise büyük görüntülerde kanallar ayrı süreçlerde işlenir
+        color_transform: 'ycocg' veya 'subtract_green' verilirse kanallar
+        sıkıştırmadan önce kayıpsız bir renk dönüşümüyle birbirinden
+        arındırılır (bkz. LZWColorTransform); None ise R, G, B saklanır
+        entropy: 'huffman' veya 'range' verilirse kodlar sabit genişlikte
+        yazılmak yerine entropi kodlanır (bkz. LZWEntropy); açarken dosyadan
+        okunur
+        progress: kodlama/açma sırasında progress(stage, done, total) olarak
+        çağrılan fonksiyon (ör. ilerleme çubuğu için)
+        trace_memory / profile: self.stats'a (son işlemin aşama süreleri ve
+        sayıları, bkz. LZWStats) aşama başına bellek tepe değerini / sıcak
+        döngülerin cProfile profilini ekler
+        verbose: True ise dosya metotları her dosyanın ayrıntılarını yazdırır
+        (False: hiçbir şey yazdırılmaz; ayrıntılar self.stats'tadır)
         """
         self.filename = filename
         self.data_type = data_type
         self.code_length_R = None
         self.code_length_G = None
         self.code_length_B = None
+        # True ise kodlar 9 bitten başlayıp büyüyen genişliklerle yazılır;
+        # dosyada code_length alanının en üst bitinde (0x80) işaretlenir
+        self.variable_width = variable_width
+        # Her kanalın sözlüğü en fazla 2**max_code_length girdi içerir
+        # (None: sınırsız); dolduğunda policy uygulanır ('freeze', 'reset', 'lru')
+        self.max_code_length = max_code_length
+        self.policy = policy
+        # Entropi kodlayıcısı (None: yok); değişken genişlik moduyla birlikte
+        # kullanılmaz
+        entropy_id(entropy, variable_width)
+        self.entropy = entropy
+        # Kanallar birbirinden bağımsız olduğu için her biri ayrı bir süreçte
+        # (ayrı bir çekirdekte) sıkıştırılıp açılabilir (bkz. LZWParallel)
+        self.parallel = parallel
+        # tile_size verilirse görüntü tile_size x tile_size'lık döşemelere
+        # bölünür; her döşemenin her kanalı kendi sözlüğüyle sıkıştırılır ve
+        # decode_region ile yalnızca istenen bölgenin döşemeleri açılabilir
+        self.tile_size = tile_size
+        # Tahminci (None: varsayılan 2D fark); seçilen satır tahmincileri her
+        # kanalın kod dizisinin önünde saklanır
+        self.predictor = predictor
+        # Renk dönüşümü (None: yok); dönüşümün numarası her kanalın code_length
+        # alanında saklanır, açarken oradan okunur (geçersiz bir ad ValueError
+        # verir)
+        transform_id(color_transform)
+        self.color_transform = color_transform
+        self.progress = progress
+        self.stats = None
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.verbose = verbose
 
-    def compress_image_file(self):
+    def compress(self, image):
+        """
+        Bellekte sıkıştırma (dosya sistemine dokunulmaz, bkz. LZWApi).
+        image: numpy dizisi, PIL görüntüsü, dosya nesnesi veya kodlanmış
+        görüntü (ör. PNG) byte'ları
+        return: .bin dosyasının byte'ları
+        """
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(image, 'RGB')
+        compressed_data = self.compress_pixels(pixel_array)
+        self.stats.finish(pixel_array.size, len(compressed_data))
+        return compressed_data
+
+    def compress_pixels(self, pixel_array):
         """
-        1) Renkli görüntüyü (RGB) oku.
         2) Her kanalda 2D fark matrisini hesapla (mod 256):
            - (0,0): ham piksel değeri,
            - (0,c>0): (pixel[0,c] - pixel[0,c-1]) mod 256,
@@ -30,80 +109,109 @@ class LZWColor2DDiffCoding:
         3) Her fark matrisini 1D listeye çevirip LZW sıkıştırması uygula.
         4) Her kanalın bit string’ini oluştur, padding ekle, byte array’e çevir.
         5) Meta bilgileri (width, height, her kanal için code_length, padding miktarı, veri uzunluğu) ile
-           tüm veriyi .bin dosyasına yaz.
+           tüm veriyi kapsayıcının byte'ları olarak döndür.
         """
-        current_dir = os.path.dirname(os.path.realpath(__file__))
-        input_path = os.path.join(current_dir, self.filename + '.png')
-        output_path = os.path.join(current_dir, self.filename + '.bin')
-
-        # 1) Görüntüyü oku ve RGB’ye çevir
-        img = Image.open(input_path).convert('RGB')
-        pixel_array = np.array(img, dtype=np.uint8)
         height, width, _ = pixel_array.shape
+        # Renk dönüşümü (seçildiyse) tüm görüntüye kanal işlemlerinden önce uygulanır
+        with measure(self.stats, 'transform'):
+            pixel_array = forward_transform(pixel_array, transform_id(self.color_transform))
+        out_buffer = io.BytesIO()
+        with ContainerWriter(out_buffer, COLOR_2D_DIFF, feature_flags(self)) as f:
+            if self.tile_size:
+                # Döşemeli mod: döşemeler (büyük görüntülerde paralel olarak)
+                # sıkıştırılır ve döşeme ofset tablosuyla birlikte yazılır
+                write_tiled_file(self, f, pixel_array, self.tile_size,
+                                 parallel=self.parallel)
+            else:
+                # 2-4) Her kanalın 2D fark matrisini oluştur, LZW ile sıkıştır ve
+                # paketle (büyük görüntülerde üç kanal paralel olarak işlenir)
+                results = compress_planes(self, pixel_array, self.parallel)
+                byte_array_R, extra_pad_R, info_R, self.code_length_R = results[0]
+                byte_array_G, extra_pad_G, info_G, self.code_length_G = results[1]
+                byte_array_B, extra_pad_B, info_B, self.code_length_B = results[2]
 
-        # 2) R, G, B kanallarını ayır ve 2D fark matrislerini oluştur
-        R = pixel_array[..., 0]
-        G = pixel_array[..., 1]
-        B = pixel_array[..., 2]
-
-        diff_R = self.create_2d_difference(R)
-        diff_G = self.create_2d_difference(G)
-        diff_B = self.create_2d_difference(B)
-
-        # 3) Fark matrislerini flatten edip LZW ile sıkıştır
-        diff_R_list = diff_R.flatten().tolist()
-        diff_G_list = diff_G.flatten().tolist()
-        diff_B_list = diff_B.flatten().tolist()
-
-        encoded_R, dict_size_R = self.encode_channel(diff_R_list)
-        encoded_G, dict_size_G = self.encode_channel(diff_G_list)
-        encoded_B, dict_size_B = self.encode_channel(diff_B_list)
-
-        self.code_length_R = max(1, math.ceil(math.log2(dict_size_R)))
-        self.code_length_G = max(1, math.ceil(math.log2(dict_size_G)))
-        self.code_length_B = max(1, math.ceil(math.log2(dict_size_B)))
-
-        # 4) Bit string’e çevir, padding ekle, byte array oluştur
-        bit_R = self.int_list_to_bitstring(encoded_R, self.code_length_R)
-        padded_R, extra_pad_R = self.pad_bitstring(bit_R)
-        byte_array_R = self.bitstring_to_byte_array(padded_R)
+                # 5) Meta bilgileri ve verileri yaz
+                # Görüntü boyutları: width (4B) ve height (4B)
+                f.write(struct.pack('>I', width))
+                f.write(struct.pack('>I', height))
+                # R kanalı: code_length (2B), padding (1B), veri uzunluğu (4B), veri
+                f.write(struct.pack('>H', info_R))
+                f.write(struct.pack('>B', extra_pad_R))
+                f.write(struct.pack('>I', len(byte_array_R)))
+                f.write(byte_array_R)
+                # G kanalı:
+                f.write(struct.pack('>H', info_G))
+                f.write(struct.pack('>B', extra_pad_G))
+                f.write(struct.pack('>I', len(byte_array_G)))
+                f.write(byte_array_G)
+                # B kanalı:
+                f.write(struct.pack('>H', info_B))
+                f.write(struct.pack('>B', extra_pad_B))
+                f.write(struct.pack('>I', len(byte_array_B)))
+                f.write(byte_array_B)
+        return out_buffer.getvalue()
 
-        bit_G = self.int_list_to_bitstring(encoded_G, self.code_length_G)
-        padded_G, extra_pad_G = self.pad_bitstring(bit_G)
-        byte_array_G = self.bitstring_to_byte_array(padded_G)
+    def compress_image_file(self, input_path=None, output_path=None):
+        """
+        1) Renkli görüntüyü (RGB) oku.
+        2-5) Bellekte sıkıştır (compress_pixels).
+        6) Sonucu .bin dosyasına yaz.
+        """
+        # (input_path / output_path verilmemişse dosya adı gövdesinden oluşturulur)
+        current_dir = os.path.dirname(os.path.realpath(__file__))
+        if input_path is None:
+            input_path = os.path.join(current_dir, self.filename + '.png')
+        if output_path is None:
+            output_path = os.path.join(current_dir, self.filename + '.bin')
 
-        bit_B = self.int_list_to_bitstring(encoded_B, self.code_length_B)
-        padded_B, extra_pad_B = self.pad_bitstring(bit_B)
-        byte_array_B = self.bitstring_to_byte_array(padded_B)
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
 
-        # 5) Dosyaya meta bilgileri ve verileri yaz
-        with open(output_path, 'wb') as f:
-            # Görüntü boyutları: width (4B) ve height (4B)
-            f.write(struct.pack('>I', width))
-            f.write(struct.pack('>I', height))
-            # R kanalı: code_length (2B), padding (1B), veri uzunluğu (4B), veri
-            f.write(struct.pack('>H', self.code_length_R))
-            f.write(struct.pack('>B', extra_pad_R))
-            f.write(struct.pack('>I', len(byte_array_R)))
-            f.write(byte_array_R)
-            # G kanalı:
-            f.write(struct.pack('>H', self.code_length_G))
-            f.write(struct.pack('>B', extra_pad_G))
-            f.write(struct.pack('>I', len(byte_array_G)))
-            f.write(byte_array_G)
-            # B kanalı:
-            f.write(struct.pack('>H', self.code_length_B))
-            f.write(struct.pack('>B', extra_pad_B))
-            f.write(struct.pack('>I', len(byte_array_B)))
-            f.write(byte_array_B)
+        # 1) Görüntüyü oku ve RGB’ye çevir
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(input_path, 'RGB')
+        height, width, _ = pixel_array.shape
+        compressed_data = self.compress_pixels(pixel_array)
+        # 6) Dosyaya yaz
+        with measure(self.stats, 'write'), open(output_path, 'wb') as f:
+            f.write(compressed_data)
 
         original_size = width * height * 3
-        compressed_size = os.path.getsize(output_path)
-        print(f"{self.filename}.png is compressed into {self.filename}.bin.")
-        print(f"Original pixel count: {original_size} bytes")
-        print(f"Compressed file size: {compressed_size} bytes")
-        if original_size:
-            print(f"Compression Ratio: {compressed_size/original_size:.3f}")
+        compressed_size = len(compressed_data)
+        if self.verbose:
+            print(f"{os.path.basename(input_path)} is compressed into "
+                  f"{os.path.basename(output_path)}.")
+            print(f"Original pixel count: {original_size} bytes")
+            print(f"Compressed file size: {compressed_size} bytes")
+            if original_size:
+                print(f"Compression Ratio: {compressed_size/original_size:.3f}")
+        self.stats.finish(original_size, compressed_size)
+        return output_path
+
+    def compress_plane(self, channel_array):
+        """
+        Tek bir kanalın (height x width uint8 dizi) 2D fark matrisini
+        oluşturur ve sıkıştırır.
+        return: (byte_array, extra_pad, code_length alanı, code_length)
+        """
+        with measure(self.stats, 'transform'):
+            if self.predictor:
+                # Her satır için tahminci numarası ve tahmin artıkları (mod 256)
+                predictor_ids, diff = predict(channel_array, self.predictor)
+            else:
+                predictor_ids, diff = None, self.create_2d_difference(channel_array)
+        encoded, dict_size = self.encode_channel(diff.flatten().tolist())
+        code_length = max(1, math.ceil(math.log2(dict_size)))
+        with measure(self.stats, 'pack'):
+            byte_array, extra_pad, info = pack_code_stream(
+                encoded, code_length, self.variable_width, self.policy,
+                entropy=self.entropy)
+        if predictor_ids is not None:
+            # Tahminci numaraları (satır başına 1 byte) kodların önüne yazılır
+            byte_array = predictor_ids.tobytes() + byte_array
+            info |= PREDICTOR_FLAG
+        # Renk dönüşümünün numarası (bkz. COLOR_TRANSFORM_MASK)
+        info |= transform_field(transform_id(self.color_transform))
+        return byte_array, extra_pad, info, code_length
 
     def create_2d_difference(self, channel_array):
         """
@@ -112,23 +220,15 @@ class LZWColor2DDiffCoding:
           - (0, c>0): diff = (pixel[0,c] - pixel[0,c-1]) mod 256
           - (r>0, 0): diff = (pixel[r,0] - pixel[r-1,0]) mod 256
           - (r>0, c>0): diff = (pixel[r,c] - pixel[r,c-1]) mod 256
+        Farklar uint8 dizilerle hesaplanır; taşma mod 256 sarmasını verir.
         """
-        h, w = channel_array.shape
-        diff_array = np.zeros((h, w), dtype=np.uint8)
-        for r in range(h):
-            for c in range(w):
-                val = int(channel_array[r, c])
-                if r == 0 and c == 0:
-                    diff_array[r, c] = val
-                elif r == 0:
-                    left = int(channel_array[r, c-1])
-                    diff_array[r, c] = (val - left) % 256
-                elif c == 0:
-                    up = int(channel_array[r-1, c])
-                    diff_array[r, c] = (val - up) % 256
-                else:
-                    left = int(channel_array[r, c-1])
-                    diff_array[r, c] = (val - left) % 256
+        channel_array = np.asarray(channel_array, dtype=np.uint8)
+        diff_array = np.empty_like(channel_array)
+        # İlk sütun: (0,0) ham değer, diğer satırlarda üst komşudan fark
+        diff_array[:1, :1] = channel_array[:1, :1]
+        diff_array[1:, 0] = np.diff(channel_array[:, 0])
+        # Diğer sütunlar: tüm satırlarda sol komşudan fark
+        diff_array[:, 1:] = np.diff(channel_array, axis=1)
         return diff_array
 
     def encode_channel(self, data_list):
@@ -136,115 +236,178 @@ class LZWColor2DDiffCoding:
         Klasik LZW sıkıştırması (verilen data_list üzerinde).
         data_list: 0..255 aralığındaki fark değerleri.
         """
-        dict_size = 256
-        dictionary = { (i,): i for i in range(dict_size) }
-        w = []
-        encoded = []
-        for val in data_list:
-            w_plus = w + [val]
-            if tuple(w_plus) in dictionary:
-                w = w_plus
-            else:
-                encoded.append(dictionary[tuple(w)])
-                dictionary[tuple(w_plus)] = dict_size
-                dict_size += 1
-                w = [val]
-        if w:
-            encoded.append(dictionary[tuple(w)])
+        max_dict_size = None if self.max_code_length is None else 2 ** self.max_code_length
+        with measure(self.stats, 'lzw'):
+            encoded, dict_size = encode_symbols(data_list, 256, max_dict_size, self.policy,
+                                                self.progress)
+        count(self.stats, len(data_list), len(encoded), dict_size)
         return encoded, dict_size
 
-    def int_list_to_bitstring(self, codes, code_length):
-        return "".join(format(c, f'0{code_length}b') for c in codes)
-
-    def pad_bitstring(self, bitstring):
-        extra_padding = (8 - len(bitstring) % 8) % 8
-        padded = bitstring + ('0' * extra_padding)
-        return padded, extra_padding
-
-    def bitstring_to_byte_array(self, bitstring):
-        if len(bitstring) % 8 != 0:
-            raise ValueError("Bitstring length not multiple of 8.")
-        return bytearray(int(bitstring[i:i+8], 2) for i in range(0, len(bitstring), 8))
+    def decompress(self, data):
+        """
+        Bellekte açma (dosya sistemine dokunulmaz).
+        data: .bin dosyasının byte'ları
+        return: h x w x 3 uint8 dizi
+        """
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        color_array = self.decompress_pixels(data)
+        self.stats.finish(len(data), color_array.size)
+        return color_array
 
-    def decompress_image_file(self):
+    def decompress_pixels(self, source):
         """
-        1) .bin dosyasını oku; width, height, her kanal için meta bilgileri al.
+        1) Veriyi oku (source: .bin dosyasının yolu veya byte'ları); width,
+           height, her kanal için meta bilgileri al.
         2) Her kanalın bit verisini LZW decode ile fark listesine çevir.
         3) Fark listesini 2D matris haline getir ve ters fark işlemiyle orijinal piksel değerlerini hesapla.
-        4) R, G, B kanallarını birleştirip .png olarak kaydet.
+        4) R, G, B kanallarını birleştir.
         """
-        current_dir = os.path.dirname(os.path.realpath(__file__))
-        input_path = os.path.join(current_dir, self.filename + '.bin')
-        output_path = os.path.join(current_dir, self.filename + '_decompressed.png')
-
-        with open(input_path, 'rb') as f:
-            width = struct.unpack('>I', f.read(4))[0]
-            height = struct.unpack('>I', f.read(4))[0]
+        if is_tiled_file(source):
+            # Döşemeli dosya: tüm döşemeleri aç, birleştir ve renk dönüşümünü geri al
+            reader = TiledImageReader(source)
+            planes = reader.decode_image(self, self.parallel)
+            with measure(self.stats, 'transform'):
+                return inverse_transform(planes, field_transform(reader.first_field()))
+        with measure(self.stats, 'read'):
+            data = read_data(source)
+        width, height = struct.unpack_from('>II', data)
+        # R, G, B: code_length (2B), padding (1B), veri uzunluğu (4B), veri
+        # (kanal verileri kopyalanmaz, tampondan memoryview dilimleridir)
+        channel_args = split_channels(data, 8, 3)
+        self.code_length_R, self.code_length_G, self.code_length_B = \
+            (args[1] for args in channel_args)
 
-            self.code_length_R = struct.unpack('>H', f.read(2))[0]
-            extra_pad_R = struct.unpack('>B', f.read(1))[0]
-            len_R = struct.unpack('>I', f.read(4))[0]
-            data_R = f.read(len_R)
+        # Her kanalı decode et ve ters fark işlemiyle piksel değerlerini hesapla
+        # (büyük görüntülerde kanallar paralel olarak açılır)
+        planes = decompress_planes(self, channel_args, height, width, self.parallel)
+        # Renk dönüşümü (varsa) geri alınarak R, G, B kanallarına dönülür
+        with measure(self.stats, 'transform'):
+            return inverse_transform(planes, field_transform(channel_args[0][1]))
 
-            self.code_length_G = struct.unpack('>H', f.read(2))[0]
-            extra_pad_G = struct.unpack('>B', f.read(1))[0]
-            len_G = struct.unpack('>I', f.read(4))[0]
-            data_G = f.read(len_G)
+    def decompress_image_file(self, input_path=None, output_path=None):
+        """
+        1-4) .bin dosyasını aç (decompress_pixels).
+        5) Sonucu .png olarak kaydet.
+        """
+        # (input_path / output_path verilmemişse dosya adı gövdesinden oluşturulur)
+        current_dir = os.path.dirname(os.path.realpath(__file__))
+        if input_path is None:
+            input_path = os.path.join(current_dir, self.filename + '.bin')
+        if output_path is None:
+            output_path = os.path.join(current_dir, self.filename + '_decompressed.png')
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
 
-            self.code_length_B = struct.unpack('>H', f.read(2))[0]
-            extra_pad_B = struct.unpack('>B', f.read(1))[0]
-            len_B = struct.unpack('>I', f.read(4))[0]
-            data_B = f.read(len_B)
+        # Dosya belleğe eşlenir (mmap); sayfalar yalnızca okundukça diskten gelir
+        color_array = self.decompress_pixels(map_file(input_path))
 
-        diff_R = self.decompress_channel(data_R, self.code_length_R, extra_pad_R, height, width)
-        diff_G = self.decompress_channel(data_G, self.code_length_G, extra_pad_G, height, width)
-        diff_B = self.decompress_channel(data_B, self.code_length_B, extra_pad_B, height, width)
+        with measure(self.stats, 'write'):
+            Image.fromarray(color_array, 'RGB').save(output_path)
+        if self.verbose:
+            print(f"{os.path.basename(input_path)} is decompressed into "
+                  f"{os.path.basename(output_path)}.")
+        self.stats.finish(os.path.getsize(input_path), color_array.size)
+        return output_path
 
-        R_arr = self.reconstruct_2d_diff(diff_R)
-        G_arr = self.reconstruct_2d_diff(diff_G)
-        B_arr = self.reconstruct_2d_diff(diff_B)
+    def read_channel(self, channel, source=None):
+        """
+        Yalnızca bir kanalı açar; diğer kanalların verisine dokunulmaz (dosya
+        belleğe eşlendiği için okunmazlar da). Örneğin yalnızca G düzlemi
+        gereken analizler için çözme işi ve G/Ç üçte birine iner.
+        channel: 0-2 veya 'R', 'G', 'B'; renk dönüşümlü dosyalarda saklanan
+        bir düzlemin adı da verilebilir (ör. 'Y': yalnızca parlaklık). Renk
+        dönüşümlü dosyalarda bir RGB kanalı için gereken düzlemler açılır
+        (ör. 'subtract_green' ile G için yalnızca bir, R için iki düzlem).
+        source: .bin dosyasının yolu veya byte'ları (None: filename + '.bin')
+        Not: hız için DATA bölümünün CRC32'si denetlenmez (bkz.
+        LZWContainer.verify_file).
+        return: h x w uint8 dizi
+        """
+        if source is None:
+            current_directory = os.path.dirname(os.path.realpath(__file__))
+            source = os.path.join(current_directory, self.filename + '.bin')
+        input_size = os.path.getsize(source) if is_path(source) else len(source)
+        if is_path(source):
+            source = map_file(source)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        if is_tiled_file(source):
+            reader = TiledImageReader(source)
+            tid = field_transform(reader.first_field())
+            needed, rgb_index = select_channel(tid, channel)
+            # Döşemeli dosya: her döşemeden yalnızca gereken düzlemler açılır
+            planes = {index: reader.decode_image(self, self.parallel, index)
+                      for index in needed}
+        else:
+            with measure(self.stats, 'read'):
+                data = read_data(source, verify=False)
+            width, height = struct.unpack_from('>II', data)
+            tid = field_transform(split_channels(data, 8, 1)[0][1])
+            needed, rgb_index = select_channel(tid, channel)
+            # Yalnızca gereken son düzleme kadar olan başlıklar okunur
+            channel_args = split_channels(data, 8, max(needed) + 1)
+            planes = {index: self.decompress_plane(*channel_args[index], height, width)
+                      for index in needed}
+        if rgb_index is None:
+            plane = planes[needed[0]]
+        else:
+            with measure(self.stats, 'transform'):
+                plane = channel_from_planes(tid, rgb_index, planes)
+        self.stats.finish(input_size, plane.size)
+        return plane
 
-        R_arr = np.clip(R_arr, 0, 255).astype(np.uint8)
-        G_arr = np.clip(G_arr, 0, 255).astype(np.uint8)
-        B_arr = np.clip(B_arr, 0, 255).astype(np.uint8)
+    def decode_region(self, x, y, w, h, source=None):
+        """
+        Döşemeli .bin dosyasından yalnızca (x, y, w, h) dikdörtgenini kapsayan
+        döşemeleri okuyup açar (görüntünün geri kalanı açılmaz).
+        source: .bin dosyasının yolu (belleğe eşlenir) veya byte'ları (None:
+        filename + '.bin'); hız için DATA bölümünün CRC32'si denetlenmez
+        return: h x w x 3 uint8 dizi
+        """
+        if source is None:
+            current_directory = os.path.dirname(os.path.realpath(__file__))
+            source = os.path.join(current_directory, self.filename + '.bin')
+        input_size = os.path.getsize(source) if is_path(source) else len(source)
+        if is_path(source):
+            source = map_file(source)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        reader = TiledImageReader(source)
+        region = reader.decode_region(self, x, y, w, h, self.parallel)
+        with measure(self.stats, 'transform'):
+            region = inverse_transform(region, field_transform(reader.first_field()))
+        self.stats.finish(input_size, region.size)
+        return region
 
-        color_array = np.dstack((R_arr, G_arr, B_arr))
-        Image.fromarray(color_array, 'RGB').save(output_path)
-        print(f"{self.filename}.bin is decompressed into {self.filename}_decompressed.png.")
+    def decompress_plane(self, byte_data, code_length, extra_pad, height, width):
+        """
+        Tek bir kanalı açar ve ters fark işlemini uygular.
+        return: height x width uint8 dizi
+        """
+        if code_length & PREDICTOR_FLAG:
+            # İlk height byte: satırların tahminci numaraları
+            predictor_ids = np.frombuffer(byte_data[:height], dtype=np.uint8)
+            diff_array = self.decompress_channel(byte_data[height:], code_length,
+                                                 extra_pad, height, width)
+            with measure(self.stats, 'transform'):
+                return reconstruct(diff_array, predictor_ids)
+        diff_array = self.decompress_channel(byte_data, code_length, extra_pad, height, width)
+        with measure(self.stats, 'transform'):
+            return self.reconstruct_2d_diff(diff_array)
 
     def decompress_channel(self, byte_data, code_length, extra_pad, height, width):
-        bitstring = "".join(format(b, '08b') for b in byte_data)
-        if extra_pad > 0:
-            bitstring = bitstring[:-extra_pad]
-        codes = []
-        for i in range(0, len(bitstring), code_length):
-            chunk = bitstring[i:i+code_length]
-            if len(chunk) < code_length:
-                break
-            codes.append(int(chunk, 2))
-        diff_list = self.decode_channel(codes)
-        if len(diff_list) != width * height:
-            raise ValueError("Decoded data size mismatch for channel.")
-        diff_array = np.array(diff_list, dtype=np.uint8).reshape((height, width))
+        with measure(self.stats, 'unpack'):
+            codes = unpack_code_stream(byte_data, code_length, extra_pad).tolist()
+        bits, _, policy = parse_code_length_field(code_length)
+        # Farklar, width * height byte'lık önceden ayrılmış tampona yazılır
+        # (boyut tutmazsa decode hata verir)
+        diff_data = self.decode_channel(codes, 2 ** bits, policy, width * height)
+        diff_array = np.frombuffer(diff_data, dtype=np.uint8).reshape((height, width))
         return diff_array
 
-    def decode_channel(self, codes):
-        dict_size = 256
-        dictionary = { i: [i] for i in range(dict_size) }
-        w = dictionary[codes[0]][:]
-        result = w[:]
-        for code in codes[1:]:
-            if code in dictionary:
-                entry = dictionary[code][:]
-            elif code == dict_size:
-                entry = w + [w[0]]
-            else:
-                raise ValueError(f"Bad compressed code: {code}")
-            result.extend(entry)
-            dictionary[dict_size] = w + [entry[0]]
-            dict_size += 1
-            w = entry
-        return result
+    def decode_channel(self, codes, max_dict_size=None, policy=FREEZE, size=None):
+        with measure(self.stats, 'lzw'):
+            diffs = decode_bytes(codes, size, 256, max_dict_size, policy, self.progress)
+        count(self.stats, len(diffs), len(codes),
+              peak_dict_size(codes, 256, max_dict_size, policy))
+        return diffs
 
     def reconstruct_2d_diff(self, diff_array):
         """
@@ -254,17 +417,10 @@ class LZWColor2DDiffCoding:
           - (0,c>0): pixel[0,c] = (pixel[0,c-1] + diff[0,c]) mod 256
           - (r>0,0): pixel[r,0] = (pixel[r-1,0] + diff[r,0]) mod 256
           - (r>0,c>0): pixel[r,c] = (pixel[r,c-1] + diff[r,c]) mod 256
+        The first column is the cumulative sum of its differences and every
+        row is then the cumulative sum starting from its first pixel (uint8
+        sums wrap modulo 256).
         """
-        h, w = diff_array.shape
-        pixel_array = np.zeros((h, w), dtype=np.int16)
-        for r in range(h):
-            for c in range(w):
-                if r == 0 and c == 0:
-                    pixel_array[r, c] = diff_array[r, c]
-                elif r == 0:
-                    pixel_array[r, c] = (pixel_array[r, c-1] + diff_array[r, c]) % 256
-                elif c == 0:
-                    pixel_array[r, c] = (pixel_array[r-1, c] + diff_array[r, c]) % 256
-                else:
-                    pixel_array[r, c] = (pixel_array[r, c-1] + diff_array[r, c]) % 256
-        return pixel_array
+        steps = np.array(diff_array, dtype=np.uint8)
+        steps[:, 0] = np.cumsum(steps[:, 0], dtype=np.uint8)
+        return np.cumsum(steps, axis=1, dtype=np.uint8)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# The reversible color transforms of the color coding classes (Level 4 and 5).
+# ------------------------------------------------------------------------------
+# The R, G and B channels of a natural image are strongly correlated, so the
+# same structure is otherwise paid for three times (in the dictionaries and in
+# the output bits). A transform turns them into one plane that carries the
+# structure and two planes that are mostly close to zero:
+#   'ycocg'          : YCoCg-R, a lifting scheme of integer steps
+#                        Co = R - B,  t = B + (Co >> 1),
+#                        Cg = G - t,  Y = t + (Cg >> 1)
+#   'subtract_green' : G, R - G, B - G
+# Every step is computed modulo 256 (the differences are read as signed bytes
+# for the shifts), so the planes stay 8-bit (the alphabet of the dictionaries)
+# and every step can be undone exactly by subtracting what was added.
+#
+# The transform is applied to the whole image before the per-channel
+# predictor / difference and its id is stored in the code length field of
+# every channel (see COLOR_TRANSFORM_MASK in LZWBits), so the stored planes are
+# Y, Co, Cg or G, R - G, B - G instead of R, G, B.
+import numpy as np
+from LZWBits import COLOR_TRANSFORM_MASK, COLOR_TRANSFORM_SHIFT
+
+# the transforms (the index of a name + 1 is its id in the compressed file;
+# 0: no transform)
+TRANSFORMS = ('ycocg', 'subtract_green')
+YCOCG = 1
+SUBTRACT_GREEN = 2
+# the names of the stored planes for each transform id
+PLANE_NAMES = {0: ('R', 'G', 'B'), YCOCG: ('Y', 'Co', 'Cg'),
+               SUBTRACT_GREEN: ('G', 'R-G', 'B-G')}
+# the names of the channels of the decoded image
+CHANNEL_NAMES = 'RGB'
+# the stored planes needed to rebuild each channel (R, G, B) for each id
+NEEDED_PLANES = {0: ((0,), (1,), (2,)),
+                 YCOCG: ((0, 1, 2), (0, 2), (0, 1, 2)),
+                 SUBTRACT_GREEN: ((0, 1), (0,), (0, 2))}
+
+
+# A function that returns the id of the given transform (a name in TRANSFORMS
+# or None).
+# ------------------------------------------------------------------------------
+def transform_id(transform):
+    if transform is None:
+        return 0
+    if transform not in TRANSFORMS:
+        raise ValueError(f"Unknown color transform: {transform}")
+    return TRANSFORMS.index(transform) + 1
+
+
+# A function that returns the bits of the code length field for the given
+# transform id and the transform id stored in the given code length field.
+# ------------------------------------------------------------------------------
+def transform_field(tid):
+    return tid << COLOR_TRANSFORM_SHIFT
+
+
+def field_transform(field):
+    tid = (field & COLOR_TRANSFORM_MASK) >> COLOR_TRANSFORM_SHIFT
+    if tid not in PLANE_NAMES:
+        raise ValueError(f"Unknown color transform id: {tid}")
+    return tid
+
+
+# A function that returns the given uint8 values (as int16) as signed bytes.
+# ------------------------------------------------------------------------------
+def signed(values):
+    return values - ((values & 0x80) << 1)
+
+
+# A function that transforms the given height x width x 3 RGB array with the
+# given transform id and returns the stored planes (height x width x 3 uint8).
+# ------------------------------------------------------------------------------
+def forward_transform(pixel_array, tid):
+    if tid == 0:
+        return pixel_array
+    r, g, b = (pixel_array[..., c].astype(np.int16) for c in range(3))
+    if tid == YCOCG:
+        co = (r - b) & 0xFF
+        t = (b + (signed(co) >> 1)) & 0xFF
+        cg = (g - t) & 0xFF
+        planes = ((t + (signed(cg) >> 1)) & 0xFF, co, cg)
+    else:
+        planes = (g, (r - g) & 0xFF, (b - g) & 0xFF)
+    return np.stack(planes, axis=-1).astype(np.uint8)
+
+
+# A function that rebuilds the RGB array from the stored planes (the inverse
+# of forward_transform).
+# ------------------------------------------------------------------------------
+def inverse_transform(planes, tid):
+    if tid == 0:
+        return planes
+    p0, p1, p2 = (planes[..., c].astype(np.int16) for c in range(3))
+    if tid == YCOCG:
+        y, co, cg = p0, p1, p2
+        t = (y - (signed(cg) >> 1)) & 0xFF
+        g = (cg + t) & 0xFF
+        b = (t - (signed(co) >> 1)) & 0xFF
+        channels = ((b + co) & 0xFF, g, b)
+    else:
+        g = p0
+        channels = ((p1 + g) & 0xFF, g, (p2 + g) & 0xFF)
+    return np.stack(channels, axis=-1).astype(np.uint8)
+
+
+# A function that resolves the given channel for the given transform id: an
+# index or a name in CHANNEL_NAMES selects a channel of the decoded image and a
+# name in PLANE_NAMES[tid] (e.g., 'Y') a stored plane. It returns the indices of
+# the stored planes that have to be decoded and the index of the RGB channel
+# (None for a stored plane, which is returned as it is).
+# ------------------------------------------------------------------------------
+def select_channel(tid, channel):
+    if isinstance(channel, str):
+        if len(channel) == 1 and channel.upper() in CHANNEL_NAMES:
+            channel = CHANNEL_NAMES.index(channel.upper())
+        else:
+            names = [name.upper() for name in PLANE_NAMES[tid]]
+            if channel.upper() not in names:
+                raise ValueError(f"Invalid channel: {channel!r} (stored planes: "
+                                 f"{', '.join(PLANE_NAMES[tid])})")
+            plane = names.index(channel.upper())
+            return (plane,), None
+    if not 0 <= channel < len(CHANNEL_NAMES):
+        raise ValueError(f"Invalid channel: {channel!r}")
+    return NEEDED_PLANES[tid][channel], channel
+
+
+# A function that rebuilds the given RGB channel from the given stored planes
+# (a dictionary of plane index -> height x width array with the planes that
+# select_channel returned).
+# ------------------------------------------------------------------------------
+def channel_from_planes(tid, channel, planes):
+    if tid == 0:
+        return planes[channel]
+    shape = next(iter(planes.values())).shape
+    stacked = np.zeros(shape + (3,), dtype=np.uint8)
+    for index, plane in planes.items():
+        stacked[..., index] = plane
+    # the planes that are not needed for the channel do not change it
+    return np.ascontiguousarray(inverse_transform(stacked, tid)[..., channel])
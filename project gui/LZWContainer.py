@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# The container format of the compressed (.bin) files of all levels (Level 1-5).
+# ------------------------------------------------------------------------------
+# A container file describes itself, so a file can be decompressed without
+# knowing which level produced it and its integrity can be checked without
+# decompressing it. The layout is:
+#   magic 'LZWC' (4 bytes), format version (1 byte), codec id (1 byte),
+#   feature flags (2 bytes), number of sections (2 bytes),
+#   section table (for each section: tag (4 bytes), offset from the start of
+#   the file (8 bytes), length (8 bytes), CRC32 (4 bytes)),
+#   header CRC32 (4 bytes, the CRC32 of everything before it; since version 2),
+#   sections
+# so a damaged codec id, flag or section table is detected as well as damaged
+# section data.
+# The 'DATA' section holds the compressed data in the layout of the codec (the
+# layout that the levels used before the container was introduced), so the
+# files written without the container (and the output of LZW.compress_stream,
+# which cannot seek back to fill in the section table) are still read.
+#
+# The functions that read a container take a source, which is either the path
+# of a file or the compressed data itself (a bytes-like object, e.g., a file
+# mapped into memory with map_file), so the same code serves the file methods
+# and the in-memory API (see LZWApi).
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+MAGIC = b'LZWC'
+VERSION = 2
+HEADER = struct.Struct('>4sBBHH')
+SECTION = struct.Struct('>4sQQI')
+HEADER_CRC = struct.Struct('>I')
+# the first version with the header CRC32
+HEADER_CRC_VERSION = 2
+# the tag that verify_file reports for a damaged header or section table
+HEAD = b'HEAD'
+# the tag of the section with the compressed data
+DATA = b'DATA'
+
+# the codec ids (the level of the coding class)
+TEXT = 1
+IMAGE = 2
+IMAGE_DIFF = 3
+COLOR = 4
+COLOR_2D_DIFF = 5
+CODEC_NAMES = {TEXT: 'text (Level 1)', IMAGE: 'gray level image (Level 2)',
+               IMAGE_DIFF: 'gray level difference (Level 3)',
+               COLOR: 'color image (Level 4)',
+               COLOR_2D_DIFF: 'color differences (Level 5)'}
+
+# the feature flags (informative: the codec data describes itself)
+FLAG_BINARY = 0x01           # Level 1 file compressed in the binary mode
+FLAG_VARIABLE_WIDTH = 0x02   # variable-width codes
+FLAG_DICT_POLICY = 0x04      # bounded dictionary with the 'reset' or 'lru' policy
+FLAG_TILED = 0x08            # tiled image (see LZWTiles)
+FLAG_PREDICTOR = 0x10        # residuals of the pixel predictors (see LZWPredict)
+FLAG_COLOR_TRANSFORM = 0x20  # color transform of the channels (see LZWColorTransform)
+FLAG_INTERLEAVED = 0x40      # palette indices with a shared dictionary (see LZWPalette)
+FLAG_ENTROPY = 0x80          # entropy coded code streams (see LZWEntropy)
+FLAG_BLOCKED = 0x100         # text in independent blocks with an index (see LZWBlocks)
+
+# the size of the blocks read while the checksums are verified
+VERIFY_CHUNK_SIZE = 1 << 20
+
+
+# A function that returns True if the given source is the path of a file (and
+# not a bytes-like object with the data).
+# ------------------------------------------------------------------------------
+def is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+# A function that returns the given number of bytes of the source starting at
+# the given offset (all the remaining bytes if length is None). A bytes-like
+# source is sliced without copying.
+# ------------------------------------------------------------------------------
+def read_at(source, offset=0, length=None):
+    if is_path(source):
+        with open(source, 'rb') as f:
+            f.seek(offset)
+            return f.read(-1 if length is None else length)
+    view = memoryview(source).cast('B')
+    return view[offset:] if length is None else view[offset:offset + length]
+
+
+# A function that maps the given file into memory (read-only) and returns the
+# mapping, a bytes-like object whose pages are only read from the disk when
+# they are accessed (an empty file, which cannot be mapped, gives b''). The
+# mapping is closed when the last reference to it (or to a slice of it) is
+# released.
+# ------------------------------------------------------------------------------
+def map_file(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# A function that returns a name for the given source in the error messages.
+# ------------------------------------------------------------------------------
+def source_name(source):
+    return os.fspath(source) if is_path(source) else '<memory>'
+
+
+# A function that returns the feature flags for the options of the given
+# coding object.
+# ------------------------------------------------------------------------------
+def feature_flags(codec):
+    flags = 0
+    if getattr(codec, 'data_type', None) == 'binary':
+        flags |= FLAG_BINARY
+    if getattr(codec, 'variable_width', False):
+        flags |= FLAG_VARIABLE_WIDTH
+    if getattr(codec, 'policy', 'freeze') != 'freeze':
+        flags |= FLAG_DICT_POLICY
+    if getattr(codec, 'tile_size', None):
+        flags |= FLAG_TILED
+    if getattr(codec, 'predictor', None):
+        flags |= FLAG_PREDICTOR
+    if getattr(codec, 'color_transform', None):
+        flags |= FLAG_COLOR_TRANSFORM
+    if getattr(codec, 'interleaved', False):
+        flags |= FLAG_INTERLEAVED
+    if getattr(codec, 'entropy', None):
+        flags |= FLAG_ENTROPY
+    if getattr(codec, 'block_size', None):
+        flags |= FLAG_BLOCKED
+    return flags
+
+
+# A class that writes a container file. The data written with write goes to
+# the current section (the first one at the beginning) and the section table is
+# filled in when the file is closed. It can be used in a with statement.
+# The target is a path or a seekable binary file object (e.g., io.BytesIO for
+# the in-memory API), which is left open; the offsets are relative to the
+# position of the file object when the writer was created.
+# ------------------------------------------------------------------------------
+class ContainerWriter:
+    def __init__(self, target, codec_id, flags=0, tags=(DATA,)):
+        self.owns_file = is_path(target)
+        self.file = open(target, 'wb') if self.owns_file else target
+        self.start = self.file.tell()
+        self.tags = tags
+        self.sections = []   # [tag, offset, length, crc] for each section
+        self.header = HEADER.pack(MAGIC, VERSION, codec_id, flags, len(tags))
+        self.file.write(self.header)
+        self.file.write(bytes(SECTION.size * len(tags) + HEADER_CRC.size))
+        self.next_section()
+
+    # A method that starts the next section.
+    # --------------------------------------------------------------------------
+    def next_section(self):
+        if len(self.sections) == len(self.tags):
+            raise ValueError("All the sections have already been written.")
+        self.sections.append([self.tags[len(self.sections)],
+                              self.file.tell() - self.start, 0, 0])
+
+    # A method that writes the given bytes to the current section.
+    # --------------------------------------------------------------------------
+    def write(self, data):
+        section = self.sections[-1]
+        section[2] += len(data)
+        section[3] = zlib.crc32(data, section[3])
+        return self.file.write(data)
+
+    # A method that writes the section table and closes the file (a file
+    # object given by the caller is only moved back to the end of the data).
+    # --------------------------------------------------------------------------
+    def close(self):
+        if self.file is None:
+            return
+        try:
+            while len(self.sections) < len(self.tags):
+                self.next_section()   # the remaining sections are empty
+            end = self.file.tell()
+            table = b''.join(SECTION.pack(tag, offset, length, crc)
+                             for tag, offset, length, crc in self.sections)
+            self.file.seek(self.start + HEADER.size)
+            self.file.write(table)
+            self.file.write(HEADER_CRC.pack(zlib.crc32(self.header + table)))
+            self.file.seek(end)
+        finally:
+            if self.owns_file:
+                self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# A class that keeps the header and the section table of a container file.
+# ------------------------------------------------------------------------------
+class ContainerInfo:
+    def __init__(self, path, version, codec_id, flags, sections, header_ok=True):
+        self.path = path
+        self.version = version
+        self.codec_id = codec_id
+        self.flags = flags
+        self.sections = sections   # (tag, offset, length, crc) for each section
+        # False if the header CRC32 does not match (version 2 and later)
+        self.header_ok = header_ok
+
+    # A method that returns (tag, offset, length, crc) for the given tag.
+    # --------------------------------------------------------------------------
+    def section(self, tag):
+        for section in self.sections:
+            if section[0] == tag:
+                return section
+        raise ValueError(f"{self.path} has no {tag.decode()} section.")
+
+
+# A function that reads the header of the given source (a path or the data)
+# and returns a ContainerInfo object (or None if it is not a container). A
+# truncated header raises a ValueError and a header whose CRC32 does not match
+# raises a ValueError unless verify is False (then header_ok of the result is
+# False).
+# ------------------------------------------------------------------------------
+def read_info(source, verify=True):
+    header = read_at(source, 0, HEADER.size)
+    if bytes(header[:len(MAGIC)]) != MAGIC:
+        return None
+    if len(header) < HEADER.size:
+        raise ValueError(f"{source_name(source)} is truncated.")
+    _, version, codec_id, flags, count = HEADER.unpack(header)
+    if version > VERSION:
+        raise ValueError(f"Unsupported container version: {version}")
+    table_size = SECTION.size * count
+    if version >= HEADER_CRC_VERSION:
+        table_size += HEADER_CRC.size
+    table = read_at(source, HEADER.size, table_size)
+    if len(table) < table_size:
+        raise ValueError(f"{source_name(source)} is truncated.")
+    header_ok = True
+    if version >= HEADER_CRC_VERSION:
+        crc = HEADER_CRC.unpack_from(table, table_size - HEADER_CRC.size)[0]
+        header_ok = zlib.crc32(table[:table_size - HEADER_CRC.size],
+                               zlib.crc32(header)) == crc
+        if verify and not header_ok:
+            raise ValueError(f"{source_name(source)} is corrupted (CRC32 mismatch in "
+                             "the header).")
+    sections = [SECTION.unpack_from(table, i * SECTION.size) for i in range(count)]
+    return ContainerInfo(source_name(source), version, codec_id, flags, sections,
+                         header_ok)
+
+
+# A function that returns the codec id of the given source (None for data that
+# was written without the container).
+# ------------------------------------------------------------------------------
+def detect_codec(source):
+    info = read_info(source)
+    return None if info is None else info.codec_id
+
+
+# A function that returns the offset of the compressed data in the given
+# source (0 for data that was written without the container).
+# ------------------------------------------------------------------------------
+def data_offset(source):
+    info = read_info(source)
+    return 0 if info is None else info.section(DATA)[1]
+
+
+# A function that returns the compressed data of the given source: the checked
+# contents of the DATA section of a container or all the data when it was
+# written without the container (a slice of a bytes-like source, not a copy).
+# When verify is False the checksum is not computed, so only the parts of the
+# data that are used are read (e.g., a single channel of a mapped file).
+# ------------------------------------------------------------------------------
+def read_data(source, verify=True):
+    info = read_info(source)
+    if info is None:
+        return read_at(source)
+    _, offset, length, crc = info.section(DATA)
+    data = read_at(source, offset, length)
+    if len(data) != length or verify and zlib.crc32(data) != crc:
+        raise ValueError(f"{source_name(source)} is corrupted (CRC32 mismatch in "
+                         "the DATA section).")
+    return data
+
+
+# A function that checks the CRC32 of the header and of every section of the
+# given container file by reading it in blocks (nothing is decompressed) and
+# returns a list of the tags of the damaged sections (HEAD for a damaged header
+# or section table; an empty list for an intact file).
+# ------------------------------------------------------------------------------
+def verify_file(path, chunk_size=VERIFY_CHUNK_SIZE):
+    info = read_info(path, verify=False)
+    if info is None:
+        raise ValueError(f"{path} is not a container file.")
+    damaged = [] if info.header_ok else [HEAD]
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        for tag, offset, length, crc in info.sections:
+            # (a damaged section table may point past the end of the file)
+            if offset + length > size:
+                damaged.append(tag)
+                continue
+            f.seek(offset)
+            remaining, value = length, 0
+            while remaining > 0:
+                block = f.read(min(chunk_size, remaining))
+                if not block:
+                    break
+                value = zlib.crc32(block, value)
+                remaining -= len(block)
+            if remaining or value != crc:
+                damaged.append(tag)
+    return damaged
+
+
+# A function that returns the coding class for the given codec id.
+# ------------------------------------------------------------------------------
+def codec_class(codec_id):
+    if codec_id == TEXT:
+        from LZW import LZWCoding
+        return LZWCoding
+    if codec_id == IMAGE:
+        from LZWImage import LZWImageCoding
+        return LZWImageCoding
+    if codec_id == IMAGE_DIFF:
+        from LZWImageDiff import LZWImageDiffCoding
+        return LZWImageDiffCoding
+    if codec_id == COLOR:
+        from LZWColor import LZWColorCoding
+        return LZWColorCoding
+    if codec_id == COLOR_2D_DIFF:
+        from LZWColor2DDiff import LZWColor2DDiffCoding
+        return LZWColor2DDiffCoding
+    raise ValueError(f"Unknown codec id: {codec_id}")
+
+
+# A function that creates the coding object that can decompress the given
+# container file (filename is the name without the extension, as for the
+# coding classes, and input_path is the path of the file if it is not
+# filename + '.bin' next to this program) or returns None if the file was
+# written without the container.
+# ------------------------------------------------------------------------------
+def open_codec(filename, input_path=None):
+    if input_path is None:
+        current_directory = os.path.dirname(os.path.realpath(__file__))
+        input_path = os.path.join(current_directory, filename + '.bin')
+    info = read_info(input_path)
+    if info is None:
+        return None
+    if info.codec_id == TEXT:
+        data_type = 'binary' if info.flags & FLAG_BINARY else 'text'
+    else:
+        data_type = 'image'
+    return codec_class(info.codec_id)(filename, data_type)
+
+
+# A function that decompresses the given container file with the coding class
+# recorded in it and returns the path of the output file.
+# ------------------------------------------------------------------------------
+def decompress_file(filename, input_path=None, output_path=None):
+    codec = open_codec(filename, input_path)
+    if codec is None:
+        raise ValueError(f"{input_path or filename + '.bin'} was written without "
+                         "the container; the level has to be chosen.")
+    if isinstance(codec, codec_class(TEXT)):
+        return codec.decompress_text_file(input_path, output_path)
+    return codec.decompress_image_file(input_path, output_path)
+
+
+# Print the header of the given files and verify their checksums when this file
+# is run as a program (e.g., python LZWContainer.py compressed/*.bin). The exit
+# status is 1 if any file is damaged.
+# ------------------------------------------------------------------------------
+if __name__ == '__main__':
+    status = 0
+    for path in sys.argv[1:]:
+        info = read_info(path, verify=False)
+        if info is None:
+            print(f"{path}: not a container file")
+            status = 1
+            continue
+        damaged = verify_file(path)
+        codec = CODEC_NAMES.get(info.codec_id, f"codec {info.codec_id}")
+        result = 'OK' if not damaged else \
+            'DAMAGED (' + ', '.join(tag.decode() for tag in damaged) + ')'
+        print(f"{path}: {codec}, version {info.version}, flags {info.flags:#06x}, "
+              f"{len(info.sections)} section(s): {result}")
+        if damaged:
+            status = 1
+    sys.exit(status)
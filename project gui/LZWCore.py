@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# The LZW dictionary engine shared by all the coding classes (Level 1-5).
+# ------------------------------------------------------------------------------
+# Every dictionary entry is identified by the pair (prefix_code, next_symbol)
+# instead of the full sequence it represents. A sequence is extended by one
+# symbol with a single dictionary lookup, so the cost of each input symbol is
+# O(1) regardless of the length of the current match and the memory used by
+# the dictionary grows with the number of entries (not with the total length
+# of the stored sequences).
+#
+# The dictionary can be limited to a maximum size. What happens when it is full
+# is decided by one of the following policies (the decoder mirrors the same
+# steps, so the policy only needs to be recorded in the compressed file):
+#   'freeze' : no new entries are added (the default)
+#   'reset'  : a CLEAR code is written and the dictionary is reset to its
+#              initial state (the CLEAR code is alphabet_size, so the new
+#              entries start from alphabet_size + 1)
+#   'lru'    : the least recently used entry that is not a prefix of another
+#              entry is replaced by the new entry
+#
+# encode_symbols and decode_into can report their progress to a callback
+# progress(stage, done, total) (e.g., to show a progress bar). The callback can
+# stop a running job by raising Cancelled (or any other exception).
+from collections import OrderedDict
+
+# the names of the dictionary policies
+FREEZE = 'freeze'
+RESET = 'reset'
+LRU = 'lru'
+POLICIES = (FREEZE, RESET, LRU)
+
+# the number of symbols (or codes) processed between two progress reports
+PROGRESS_STEP = 1 << 16
+
+
+# An exception that a progress callback raises to cancel the running job.
+# ------------------------------------------------------------------------------
+class Cancelled(Exception):
+    pass
+
+
+# A function that returns the first code used for the new dictionary entries.
+# ------------------------------------------------------------------------------
+def first_free_code(alphabet_size=256, policy=FREEZE):
+    # the 'reset' policy reserves the code alphabet_size for the CLEAR code
+    return alphabet_size + 1 if policy == RESET else alphabet_size
+
+
+# A function that checks the dictionary parameters and returns the limit of the
+# dictionary size (-1 for an unlimited dictionary).
+# ------------------------------------------------------------------------------
+def dictionary_limit(alphabet_size, max_dict_size, policy):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown dictionary policy: {policy}")
+    if max_dict_size is None:
+        if policy != FREEZE:
+            raise ValueError(f"The '{policy}' policy requires a maximum dictionary size.")
+        return -1
+    # the 'reset' policy needs at least one entry between two CLEAR codes
+    if max_dict_size < first_free_code(alphabet_size, policy) + (policy == RESET):
+        raise ValueError(f"The maximum dictionary size is too small: {max_dict_size}")
+    return max_dict_size
+
+
+# A class that keeps the order in which the dictionary entries are used, for the
+# 'lru' policy. Only the entries that are not a prefix of another entry (the
+# leaves) can be replaced, so a replaced entry never breaks a longer sequence.
+# ------------------------------------------------------------------------------
+class LRUTracker:
+    def __init__(self, first_code):
+        self.first_code = first_code
+        self.leaves = OrderedDict()   # the leaf codes (least recently used first)
+        self.parent = {}   # the prefix code of each entry
+        self.children = {}   # the number of entries that extend each entry
+
+    # A method that marks the given code as the most recently used one.
+    # --------------------------------------------------------------------------
+    def use(self, code):
+        if code in self.leaves:
+            self.leaves.move_to_end(code)
+
+    # A method that returns the code to replace with a new entry extending the
+    # given prefix code (the prefix itself cannot be replaced) or -1 if there
+    # is no such code (e.g., when all entries form a single chain).
+    # --------------------------------------------------------------------------
+    def victim(self, prefix):
+        for code in self.leaves:
+            if code != prefix:
+                return code
+        return -1
+
+    # A method that records that the given code (a new or a replaced entry) now
+    # stands for the sequence of the prefix code followed by one symbol.
+    # --------------------------------------------------------------------------
+    def assign(self, code, prefix):
+        old_prefix = self.parent.get(code)
+        if old_prefix is not None:   # the entry is replaced
+            del self.leaves[code]
+            self.remove_child(old_prefix)
+        self.parent[code] = prefix
+        if prefix >= self.first_code:
+            self.leaves.pop(prefix, None)
+            self.children[prefix] = self.children.get(prefix, 0) + 1
+        self.leaves[code] = None
+
+    # A method that removes a child from the given code (the code becomes a
+    # leaf again when it has no children left).
+    # --------------------------------------------------------------------------
+    def remove_child(self, code):
+        if code >= self.first_code:
+            self.children[code] -= 1
+            if self.children[code] == 0:
+                self.leaves[code] = None
+
+
+# A class that keeps the state of the LZW compression algorithm between calls,
+# so that the input can be encoded chunk by chunk (e.g., while it is read).
+# ------------------------------------------------------------------------------
+class LZWEncoder:
+    # A constructor with three input parameters (max_dict_size=None means that
+    # the dictionary grows without a limit, otherwise the policy decides what
+    # happens once the dictionary contains max_dict_size entries)
+    # --------------------------------------------------------------------------
+    def __init__(self, alphabet_size=256, max_dict_size=None, policy=FREEZE):
+        self.alphabet_size = alphabet_size
+        self.max_dict_size = max_dict_size
+        self.policy = policy
+        self.limit = dictionary_limit(alphabet_size, max_dict_size, policy)
+        # the pair (prefix_code, next_symbol) is packed into one integer key
+        self.shift = max(1, (alphabet_size - 1).bit_length())
+        # codes 0..alphabet_size-1 are the single symbols, so only the longer
+        # sequences are stored in the dictionary
+        self.dictionary = {}
+        self.first_code = first_free_code(alphabet_size, policy)
+        self.dict_size = self.first_code
+        # the largest dictionary size reached (used to set the code length)
+        self.peak_dict_size = self.dict_size
+        self.w = -1   # the code of the current sequence (-1: no sequence yet)
+        # the key of each entry and the usage order (only for the 'lru' policy)
+        self.keys = {}
+        self.lru = LRUTracker(self.first_code) if policy == LRU else None
+
+    # A method that encodes the given symbols and returns the list of codes that
+    # are final (the code of the current sequence is kept for the next call).
+    # --------------------------------------------------------------------------
+    def encode(self, symbols):
+        shift = self.shift
+        dictionary = self.dictionary
+        dict_size = self.dict_size
+        limit = self.limit
+        policy = self.policy
+        lru = self.lru
+
+        codes = []
+        emit = codes.append   # bound method (avoids an attribute lookup per code)
+        lookup = dictionary.get
+        w = self.w
+        for k in symbols:
+            if w < 0:   # the first symbol
+                w = k
+                continue
+            key = (w << shift) | k
+            code = lookup(key)
+            if code is not None:   # w + k exists in the dictionary
+                w = code
+                continue
+            # output the code for w and add w + k to the dictionary
+            emit(w)
+            if lru is not None:
+                lru.use(w)
+            if dict_size != limit:
+                dictionary[key] = dict_size
+                if lru is not None:
+                    self.keys[dict_size] = key
+                    lru.assign(dict_size, w)
+                dict_size += 1
+            elif policy == RESET:
+                # output the CLEAR code and start over with an empty dictionary
+                emit(self.alphabet_size)
+                dictionary.clear()
+                self.peak_dict_size = dict_size
+                dict_size = self.first_code
+            elif policy == LRU:
+                # replace the least recently used entry with w + k (if any)
+                code = lru.victim(w)
+                if code >= 0:
+                    del dictionary[self.keys[code]]
+                    dictionary[key] = code
+                    self.keys[code] = key
+                    lru.assign(code, w)
+            w = k
+
+        self.dict_size = dict_size
+        self.peak_dict_size = max(self.peak_dict_size, dict_size)
+        self.w = w
+        return codes
+
+    # A method that returns the code for the remaining sequence (if it exists)
+    # as a list and ends the encoding.
+    # --------------------------------------------------------------------------
+    def finish(self):
+        codes = [self.w] if self.w >= 0 else []
+        self.w = -1
+        return codes
+
+
+# A function that calls progress(stage, done, total) every PROGRESS_STEP items
+# while the items of the given sequence are iterated.
+# ------------------------------------------------------------------------------
+def reported(items, progress, stage):
+    total = len(items)
+    progress(stage, 0, total)
+    for start in range(0, total, PROGRESS_STEP):
+        yield from items[start:start + PROGRESS_STEP]
+        progress(stage, min(start + PROGRESS_STEP, total), total)
+
+
+# A function that encodes a sequence of integer symbols (in the range
+# 0..alphabet_size-1) by using the LZW compression algorithm and returns the
+# list of integer codes and the largest size of the dictionary. When progress
+# is given, the symbols are encoded in blocks and the progress is reported
+# after each block.
+# ------------------------------------------------------------------------------
+def encode_symbols(symbols, alphabet_size=256, max_dict_size=None, policy=FREEZE,
+                   progress=None):
+    encoder = LZWEncoder(alphabet_size, max_dict_size, policy)
+    if progress is None:
+        codes = encoder.encode(symbols)
+    else:
+        total = len(symbols)
+        progress('encoding', 0, total)
+        codes = []
+        for start in range(0, total, PROGRESS_STEP):
+            codes.extend(encoder.encode(symbols[start:start + PROGRESS_STEP]))
+            progress('encoding', min(start + PROGRESS_STEP, total), total)
+    codes.extend(encoder.finish())
+    return codes, encoder.peak_dict_size
+
+
+# A function that returns the largest dictionary size reached while the given
+# codes were produced by encode_symbols (the same value that encode_symbols
+# returns). One entry is added for every code after the first one until the
+# dictionary is full, and the 'reset' policy only writes a CLEAR code when the
+# dictionary is full.
+# ------------------------------------------------------------------------------
+def peak_dict_size(codes, alphabet_size=256, max_dict_size=None, policy=FREEZE):
+    limit = dictionary_limit(alphabet_size, max_dict_size, policy)
+    if policy == RESET and alphabet_size in codes:
+        return limit
+    size = first_free_code(alphabet_size, policy) + max(len(codes) - 1, 0)
+    return size if limit < 0 else min(size, limit)
+
+
+# A function that decodes a sequence of integer codes produced by
+# encode_symbols (with the same dictionary parameters) and returns the list of
+# the decoded symbols.
+# ------------------------------------------------------------------------------
+def decode_symbols(codes, alphabet_size=256, max_dict_size=None, policy=FREEZE):
+    limit = dictionary_limit(alphabet_size, max_dict_size, policy)
+    first_code = first_free_code(alphabet_size, policy)
+    clear_code = alphabet_size if policy == RESET else -1
+    lru = LRUTracker(first_code) if policy == LRU else None
+
+    dictionary = [[i] for i in range(alphabet_size)]
+    dictionary.extend([None] * (first_code - alphabet_size))
+    dict_size = first_code
+    result = []
+    w = None   # the previous entry (None: no previous entry)
+    w_code = -1
+    for code in codes:
+        if code == clear_code:
+            # the encoder has reset its dictionary
+            dict_size = first_code
+            w = None
+            continue
+        if w is None:
+            entry = dictionary[code]
+        else:
+            # the code that the encoder assigned to the entry w + entry[0]
+            if dict_size != limit:
+                new_code = dict_size
+            elif lru is not None:
+                new_code = lru.victim(w_code)
+            else:
+                new_code = -1
+            if code == new_code:
+                entry = w + [w[0]]   # a special case where the entry is formed
+            elif code < dict_size:
+                entry = dictionary[code]
+            else:
+                raise ValueError(f"Bad compressed code: {code}")
+            # w + the first symbol of the entry is added to the dictionary
+            if new_code >= 0:
+                if new_code == dict_size:
+                    if new_code == len(dictionary):
+                        dictionary.append(None)
+                    dict_size += 1
+                dictionary[new_code] = w + [entry[0]]
+                if lru is not None:
+                    lru.assign(new_code, w_code)
+        result.extend(entry)
+        if lru is not None:
+            lru.use(code)
+        w = entry
+        w_code = code
+    return result
+
+
+# A function that decodes a sequence of integer codes produced by
+# encode_symbols (with alphabet_size <= 256) directly into the given bytearray
+# (or any writable buffer of bytes; an array.array with wider items for a larger
+# alphabet) and returns the number of symbols written.
+# Every dictionary entry is stored as the (offset, length) of its first
+# occurrence in the output instead of a list of symbols, so the dictionary takes
+# O(1) memory per entry and no intermediate lists are built. A bytearray output
+# is extended when grow is True, otherwise the decoded data must fit in it.
+# When progress is given, the number of the decoded codes is reported to it.
+# ------------------------------------------------------------------------------
+def decode_into(codes, out, alphabet_size=256, max_dict_size=None, policy=FREEZE,
+                grow=False, progress=None):
+    if progress is not None:
+        codes = reported(codes, progress, 'decoding')
+    limit = dictionary_limit(alphabet_size, max_dict_size, policy)
+    first_code = first_free_code(alphabet_size, policy)
+    clear_code = alphabet_size if policy == RESET else -1
+    lru = LRUTracker(first_code) if policy == LRU else None
+
+    # the offset and the length of each entry (the single symbols are not
+    # stored in the output, so their entries are not used)
+    offsets = [0] * first_code
+    lengths = [1] * first_code
+    dict_size = first_code
+    size = len(out)
+    pos = 0   # the number of bytes written so far
+    w_code = -1   # the previous code (-1: no previous entry)
+    w_pos = w_length = 0   # the offset and the length of the previous entry
+    for code in codes:
+        if code == clear_code:
+            # the encoder has reset its dictionary
+            dict_size = first_code
+            w_code = -1
+            continue
+        # the code that the encoder assigned to the entry w + entry[0]
+        if w_code < 0:
+            new_code = -1
+        elif dict_size != limit:
+            new_code = dict_size
+        elif lru is not None:
+            new_code = lru.victim(w_code)
+        else:
+            new_code = -1
+        # the length of the entry
+        if code < alphabet_size:
+            length = 1
+        elif code == new_code:
+            length = w_length + 1   # a special case where the entry is formed
+        elif first_code <= code < dict_size:
+            length = lengths[code]
+        else:
+            raise ValueError(f"Bad compressed code: {code}")
+        if pos + length > size:
+            if not grow:
+                raise ValueError("The decoded data is longer than expected.")
+            out.extend(bytes(max(size, pos + length - size)))
+            size = len(out)
+        # copy the entry to the output
+        if code < alphabet_size:
+            out[pos] = code
+        elif code == new_code:
+            # w followed by the first symbol of w
+            out[pos:pos + w_length] = out[w_pos:w_pos + w_length]
+            out[pos + w_length] = out[w_pos]
+        else:
+            offset = offsets[code]
+            out[pos:pos + length] = out[offset:offset + length]
+        # w + the first symbol of the entry is added to the dictionary (it
+        # starts where w was written and continues with the entry)
+        if new_code >= 0:
+            if new_code == dict_size:
+                if new_code == len(offsets):
+                    offsets.append(0)
+                    lengths.append(0)
+                dict_size += 1
+            offsets[new_code] = w_pos
+            lengths[new_code] = w_length + 1
+            if lru is not None:
+                lru.assign(new_code, w_code)
+        if lru is not None:
+            lru.use(code)
+        w_code, w_pos, w_length = code, pos, length
+        pos += length
+    if grow:
+        del out[pos:]
+    return pos
+
+
+# A function that decodes a sequence of integer codes produced by
+# encode_symbols into a new bytearray. When the size of the decoded data is
+# known (e.g., from a header), the output is allocated once and the decoded data
+# must have exactly that size.
+# ------------------------------------------------------------------------------
+def decode_bytes(codes, size=None, alphabet_size=256, max_dict_size=None,
+                 policy=FREEZE, progress=None):
+    if size is None:
+        out = bytearray()
+        decode_into(codes, out, alphabet_size, max_dict_size, policy, grow=True,
+                    progress=progress)
+        return out
+    out = bytearray(size)
+    if decode_into(codes, out, alphabet_size, max_dict_size, policy,
+                   progress=progress) != size:
+        raise ValueError("The decoded data is shorter than expected.")
+    return out
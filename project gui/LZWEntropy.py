@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+# The entropy coders of the LZW code stream shared by all the coding classes
+# (Level 1-5).
+# ------------------------------------------------------------------------------
+# Writing every code with the same number of bits ignores that the codes are
+# far from equally likely: the single symbols and the entries that were added
+# recently are used much more often than the rest of the dictionary. An entropy
+# coder can be used instead of the fixed-width (or variable-width) packing:
+#   'huffman' : a static canonical Huffman code (two passes: the code lengths
+#               are stored in front of the data)
+#   'range'   : an adaptive range coder (rANS; no table is stored, the
+#               frequencies are learned from the tokens coded before, which is
+#               slower but compresses better)
+# Both see a code as a token: a single symbol (a code below the first
+# dictionary entry, including the CLEAR code of the 'reset' policy) or the
+# distance back from the newest dictionary entry (0: the entry added last).
+# The newest entry at each position follows from the position itself (one entry
+# is added for every code until the dictionary is full or cleared), so the
+# decoder can undo the mapping. A distance is coded as its bit length (the
+# bucket) and the bits below the leading one (extra bits).
+#
+# Both coders take a single Python step for each code (the tables, the tokens
+# and the bits written as they are, are handled with NumPy), so their time grows
+# linearly with the number of the codes. The range coder encodes at about half
+# the speed of the Huffman coder (its frequencies are rebuilt for every block
+# of tokens) and decodes at about the same speed; the 'lzw-huffman' and
+# 'lzw-range' runs of LZWBench measure both and their scaling.
+#
+# The coder is stored in bits 4-5 of the padding byte of the code stream (see
+# ENTROPY_MASK in LZWBits) and the data starts with the number of the codes.
+import bisect
+import heapq
+import struct
+import numpy as np
+from LZWCore import FREEZE, RESET, first_free_code
+from LZWBits import BitPacker, read_bit_fields
+
+# the entropy coders (the index of a name + 1 is its id in the compressed file;
+# 0: no entropy coder)
+ENTROPY_CODERS = ('huffman', 'range')
+HUFFMAN = 1
+RANGE = 2
+# the number of the codes (in front of the coded data)
+CODE_COUNT = struct.Struct('>I')
+# the longest Huffman code (the table stores the code lengths in 4 bits)
+MAX_HUFFMAN_LENGTH = 15
+# the longest run of unused symbols stored with one entry of the table
+MAX_ZERO_RUN = 256
+# the number of the highest bits of a single symbol that are entropy coded
+# (the remaining low bits are written as they are)
+SYMBOL_HIGH_BITS = 12
+# the range coder: the number of the highest extra bits of a distance coded
+# together with its bucket (the remaining extra bits are written as they are)
+DISTANCE_BITS = 3
+# the range coder: the precision of the frequencies and the lowest state (the
+# state is kept below 2**32 and written in 16-bit words)
+SCALE_BITS = 16
+STATE_LOW = 1 << 16
+SCALE_MASK = (1 << SCALE_BITS) - 1
+# the range coder: the frequencies are rebuilt for each block of ADAPT_BLOCK
+# tokens from the counts of the tokens before it (a token adds COUNT_WEIGHT
+# and the counts lose 1/2**DECAY_BITS of their weight with each block)
+ADAPT_BLOCK = 128
+COUNT_WEIGHT = 64
+DECAY_BITS = 4
+
+
+# A function that returns the id of the given entropy coder (a name in
+# ENTROPY_CODERS or None). The variable-width mode is a different way of
+# writing the codes, so it cannot be combined with an entropy coder.
+# ------------------------------------------------------------------------------
+def entropy_id(coder, variable_width=False):
+    if coder is None:
+        return 0
+    if coder not in ENTROPY_CODERS:
+        raise ValueError(f"Unknown entropy coder: {coder}")
+    if variable_width:
+        raise ValueError("An entropy coder cannot be combined with the "
+                         "variable-width mode.")
+    return ENTROPY_CODERS.index(coder) + 1
+
+
+# A function that returns the newest dictionary entry (the largest code that can
+# appear) at each position of a code stream, where is_clear marks the CLEAR
+# codes (after a CLEAR code the dictionary starts over).
+# ------------------------------------------------------------------------------
+def newest_codes(is_clear, first_code, max_size):
+    index = np.arange(is_clear.size, dtype=np.int64)
+    starts = np.maximum.accumulate(np.where(is_clear, index + 1, 0))
+    # a CLEAR code affects the codes after it
+    starts = np.concatenate((np.zeros(1, dtype=np.int64), starts[:-1]))
+    return np.minimum(first_code + index - starts, max_size) - 1
+
+
+# A function that returns the number of the low bits of a single symbol that
+# are not entropy coded (the highest SYMBOL_HIGH_BITS bits are), so a large
+# alphabet (e.g., a palette, see LZWPalette) does not need a large table.
+# ------------------------------------------------------------------------------
+def symbol_low_bits(first_code):
+    return max(0, (first_code - 1).bit_length() - SYMBOL_HIGH_BITS)
+
+
+# A function that returns the bit lengths of the given non-negative integers.
+# ------------------------------------------------------------------------------
+def bit_lengths(values):
+    return np.frexp(values.astype(np.float64))[1].astype(np.int64)
+
+
+# A function that splits the given codes into tokens and returns the symbol of
+# each token (the code of a single symbol or first_code + the bucket of a
+# distance), the extra bits of the distances and their number.
+# ------------------------------------------------------------------------------
+def code_tokens(codes, first_code, clear_code, max_size):
+    codes = np.asarray(codes, dtype=np.int64)
+    literal = codes < first_code
+    distances = np.where(literal, 0, newest_codes(codes == clear_code, first_code,
+                                                  max_size) - codes)
+    if (distances < 0).any():
+        raise ValueError("Invalid code stream: a code is above the dictionary size.")
+    buckets = bit_lengths(distances)
+    extra_lengths = np.maximum(buckets - 1, 0)
+    extras = np.where(buckets > 1, distances - (1 << extra_lengths), 0)
+    symbols = np.where(literal, codes, first_code + buckets)
+    return symbols, np.where(literal, 0, extras), np.where(literal, 0, extra_lengths)
+
+
+# A function that rebuilds the codes from the symbols and the extra bits of
+# their tokens (the reverse of code_tokens).
+# ------------------------------------------------------------------------------
+def token_codes(symbols, extras, first_code, clear_code, max_size):
+    symbols = np.asarray(symbols, dtype=np.int64)
+    extras = np.asarray(extras, dtype=np.int64)
+    literal = symbols < first_code
+    buckets = np.where(literal, 0, symbols - first_code)
+    distances = np.where(buckets > 0, (1 << np.maximum(buckets - 1, 0)) + extras, 0)
+    newest = newest_codes(symbols == clear_code, first_code, max_size)
+    return np.where(literal, symbols, newest - distances)
+
+
+# A function that returns the Huffman code lengths (at most max_length bits) of
+# the symbols with the given frequencies (0 for an unused symbol).
+# ------------------------------------------------------------------------------
+def huffman_lengths(frequencies, max_length=MAX_HUFFMAN_LENGTH):
+    frequencies = np.asarray(frequencies, dtype=np.int64)
+    used = np.flatnonzero(frequencies).tolist()
+    lengths = np.zeros(frequencies.size, dtype=np.int64)
+    if len(used) == 1:
+        lengths[used] = 1
+        return lengths
+    while used:
+        # merge the two least frequent nodes until one tree is left (nodes
+        # 0..len(used)-1 are the symbols, the merged nodes follow them)
+        heap = [(int(frequencies[symbol]), node) for node, symbol in enumerate(used)]
+        heapq.heapify(heap)
+        parents = [0] * (2 * len(used) - 1)
+        node = len(used)
+        while len(heap) > 1:
+            weight_a, node_a = heapq.heappop(heap)
+            weight_b, node_b = heapq.heappop(heap)
+            parents[node_a] = parents[node_b] = node
+            heapq.heappush(heap, (weight_a + weight_b, node))
+            node += 1
+        # the depth of a node is one more than the depth of its parent (the
+        # parents are created after their children, so the root is the last)
+        depths = [0] * len(parents)
+        for child in range(len(parents) - 2, -1, -1):
+            depths[child] = depths[parents[child]] + 1
+        if max(depths[:len(used)]) <= max_length:
+            lengths[used] = depths[:len(used)]
+            return lengths
+        # flatten the distribution and try again (the codes get shorter)
+        frequencies = np.where(frequencies > 0, (frequencies + 1) // 2, 0)
+    return lengths
+
+
+# A function that returns the canonical Huffman codes for the given code
+# lengths (the codes of each length are consecutive in the symbol order).
+# ------------------------------------------------------------------------------
+def canonical_codes(lengths):
+    codes = np.zeros(lengths.size, dtype=np.int64)
+    code = previous_length = 0
+    for symbol in np.lexsort((np.arange(lengths.size), lengths)):
+        length = int(lengths[symbol])
+        if length == 0:
+            continue
+        code <<= length - previous_length
+        codes[symbol] = code
+        code += 1
+        previous_length = length
+    return codes
+
+
+# A function that returns the table of the given code lengths: a 4-bit length
+# for each symbol, where a run of unused symbols is written as a zero followed
+# by the length of the run - 1 (8 bits).
+# ------------------------------------------------------------------------------
+def write_lengths(lengths):
+    nibbles = []
+    symbol = 0
+    while symbol < lengths.size:
+        if lengths[symbol]:
+            nibbles.append(int(lengths[symbol]))
+            symbol += 1
+            continue
+        run = 1
+        while run < MAX_ZERO_RUN and symbol + run < lengths.size and not lengths[symbol + run]:
+            run += 1
+        nibbles.extend((0, (run - 1) >> 4, (run - 1) & 15))
+        symbol += run
+    if len(nibbles) % 2:
+        nibbles.append(0)
+    pairs = np.array(nibbles, dtype=np.uint8).reshape(-1, 2)
+    return ((pairs[:, 0] << 4) | pairs[:, 1]).tobytes()
+
+
+# A function that reads the table of the code lengths of num_symbols symbols
+# from the given position and returns the lengths and the position after it.
+# ------------------------------------------------------------------------------
+def read_lengths(data, pos, num_symbols):
+    lengths = np.zeros(num_symbols, dtype=np.int64)
+    symbol = 0
+    nibble = 2 * pos
+
+    def next_nibble():
+        nonlocal nibble
+        value = data[nibble >> 1]
+        value = value >> 4 if nibble % 2 == 0 else value & 15
+        nibble += 1
+        return value
+
+    while symbol < num_symbols:
+        length = next_nibble()
+        if length:
+            lengths[symbol] = length
+            symbol += 1
+        else:
+            symbol += ((next_nibble() << 4) | next_nibble()) + 1
+    if symbol > num_symbols:
+        raise ValueError("Invalid Huffman table.")
+    return lengths, (nibble + 1) >> 1
+
+
+# A function that codes the given tokens with a canonical Huffman code and
+# returns the table followed by the coded bits and the number of the zero bits
+# added to the end. The Huffman symbols are the highest bits of the single
+# symbols followed by the buckets of the distances (the low bits of the single
+# symbols are written as extra bits).
+# ------------------------------------------------------------------------------
+def huffman_encode(symbols, extras, extra_lengths, first_code, code_length):
+    low_bits = symbol_low_bits(first_code)
+    num_literals = ((first_code - 1) >> low_bits) + 1
+    literal = symbols < first_code
+    huffman_symbols = np.where(literal, symbols >> low_bits,
+                               num_literals + symbols - first_code)
+    extras = np.where(literal, symbols & ((1 << low_bits) - 1), extras)
+    extra_lengths = np.where(literal, low_bits, extra_lengths)
+    # the buckets of the distances below 2**code_length are 0..code_length
+    lengths = huffman_lengths(np.bincount(huffman_symbols,
+                                          minlength=num_literals + code_length + 1))
+    codes = canonical_codes(lengths)
+    # each token is its Huffman code followed by its extra bits
+    values = np.stack((codes[huffman_symbols], extras), axis=-1)
+    widths = np.stack((lengths[huffman_symbols], extra_lengths), axis=-1)
+    packer = BitPacker()
+    packed = packer.pack(values, widths)
+    last_byte, extra_padding = packer.flush()
+    return write_lengths(lengths) + packed + last_byte, extra_padding
+
+
+# A function that decodes num_codes tokens coded by huffman_encode and returns
+# their symbols and extra bits.
+# ------------------------------------------------------------------------------
+def huffman_decode(data, num_codes, first_code, code_length):
+    low_bits = symbol_low_bits(first_code)
+    num_literals = ((first_code - 1) >> low_bits) + 1
+    lengths, pos = read_lengths(data, 0, num_literals + code_length + 1)
+    max_length = max(int(lengths.max(initial=0)), 1)
+    # a lookup table indexed by the next max_length bits
+    table_symbols = np.zeros(1 << max_length, dtype=np.int64)
+    table_lengths = np.zeros(1 << max_length, dtype=np.int64)
+    for symbol, code in enumerate(canonical_codes(lengths).tolist()):
+        length = int(lengths[symbol])
+        if length:
+            start = code << (max_length - length)
+            table_symbols[start:start + (1 << (max_length - length))] = symbol
+            table_lengths[start:start + (1 << (max_length - length))] = length
+    table_symbols, table_lengths = table_symbols.tolist(), table_lengths.tolist()
+
+    data = bytes(data[pos:]) + bytes(8)
+    symbols = [0] * num_codes
+    extras = [0] * num_codes
+    window_shift = 64 - max_length
+    bit = 0
+    for i in range(num_codes):
+        # the next 57 or more bits (enough for a code and its extra bits)
+        window = (int.from_bytes(data[bit >> 3:(bit >> 3) + 8], 'big') << (bit & 7)) \
+            & 0xFFFFFFFFFFFFFFFF
+        index = window >> window_shift
+        length = table_lengths[index]
+        if not length:
+            raise ValueError("Invalid Huffman code.")
+        symbol = table_symbols[index]
+        bit += length
+        if symbol < num_literals:
+            extra_length = low_bits
+            symbol <<= low_bits
+        else:
+            symbol += first_code - num_literals
+            extra_length = max(symbol - first_code - 1, 0)
+        if extra_length:
+            extra = ((window << length) & 0xFFFFFFFFFFFFFFFF) >> (64 - extra_length)
+            bit += extra_length
+            if symbol < first_code:
+                symbol |= extra
+            else:
+                extras[i] = extra
+        symbols[i] = symbol
+    if bit > 8 * (len(data) - 8):
+        raise ValueError("The Huffman coded data is truncated.")
+    return symbols, extras
+
+
+# A function that splits the given tokens into the tokens of the range coder
+# and the bits written as they are (the raw bits). A token of the range coder
+# is the highest bits of a single symbol, the CLEAR code (a token of its own,
+# so the decoder knows where the dictionary starts over) or the bucket of a
+# distance together with its highest extra bits. The function returns the
+# tokens, the raw bits and their number.
+# ------------------------------------------------------------------------------
+def range_tokens(symbols, extras, first_code, clear_code):
+    low_bits = symbol_low_bits(first_code)
+    num_literals = ((first_code - 1) >> low_bits) + 1
+    literal = symbols < first_code
+    is_clear = symbols == clear_code
+    buckets = np.where(literal, 0, symbols - first_code)
+    extra_lengths = np.maximum(buckets - 1, 0)
+    raw_lengths = np.where(literal, low_bits,
+                           extra_lengths - np.minimum(extra_lengths, DISTANCE_BITS))
+    raw_lengths[is_clear] = 0
+    tokens = np.where(literal, symbols >> low_bits,
+                      num_literals + 1 + (buckets << DISTANCE_BITS) + (extras >> raw_lengths))
+    tokens[is_clear] = num_literals
+    raw = np.where(literal, symbols, extras) & ((1 << raw_lengths) - 1)
+    return tokens, raw, raw_lengths
+
+
+# A function that returns the number of the range coder tokens and of their
+# contexts for the given first dictionary entry and code length.
+# ------------------------------------------------------------------------------
+def range_alphabet(first_code, code_length):
+    num_literals = ((first_code - 1) >> symbol_low_bits(first_code)) + 1
+    # the buckets of the distances below 2**code_length are 0..code_length
+    return num_literals + 1 + ((code_length + 1) << DISTANCE_BITS), 2 * (code_length + 1)
+
+
+# A function that returns the context of each token: the bit length of the
+# number of the dictionary entries (the longest distance that can appear) and
+# whether the token before it was a single symbol.
+# ------------------------------------------------------------------------------
+def token_contexts(symbols, first_code, clear_code, max_size):
+    entries = newest_codes(symbols == clear_code, first_code, max_size) - first_code + 1
+    literal = (symbols < first_code).astype(np.int64)
+    previous = np.concatenate((np.ones(1, dtype=np.int64), literal[:-1]))
+    return 2 * bit_lengths(entries) + previous
+
+
+# A function that returns the frequencies of the tokens for the given counts
+# (a row for each context; the frequencies of a row add up to 2**SCALE_BITS
+# and each token has at least 1) and the start of each token in the
+# cumulative frequencies.
+# ------------------------------------------------------------------------------
+def frequency_tables(counts):
+    num_tokens = counts.shape[1]
+    freqs = 1 + counts * ((1 << SCALE_BITS) - num_tokens) \
+        // counts.sum(axis=1, keepdims=True)
+    # the rounding error goes to the most frequent token
+    rows = np.arange(counts.shape[0])
+    freqs[rows, np.argmax(counts, axis=1)] += (1 << SCALE_BITS) - freqs.sum(axis=1)
+    return freqs, np.cumsum(freqs, axis=1) - freqs
+
+
+# A function that returns the initial counts of the tokens in each context (all
+# the tokens are equally likely at first; a count of 1 does not decay, so no
+# token is left without a count).
+# ------------------------------------------------------------------------------
+def new_counts(num_contexts, num_tokens):
+    return np.ones((num_contexts, num_tokens), dtype=np.int64)
+
+
+# A function that adds the tokens of a block to the counts of their contexts,
+# where used are the contexts that appear in the block and index is the index
+# of the context of each token among them (the older counts of a context lose
+# 1/2**DECAY_BITS of their weight, so the frequencies follow the data).
+# ------------------------------------------------------------------------------
+def update_counts(counts, used, index, tokens):
+    num_tokens = counts.shape[1]
+    block = np.bincount(index * num_tokens + tokens, minlength=used.size * num_tokens)
+    counts[used] += COUNT_WEIGHT * block.reshape(used.size, num_tokens) \
+        - (counts[used] >> DECAY_BITS)
+
+
+# A function that codes the given tokens with the adaptive range coder and
+# returns the coded bytes and the number of the zero bits added to the end.
+# The frequencies of each block of ADAPT_BLOCK tokens are built (with NumPy)
+# from the tokens before it, so no table is stored, and the coder itself takes
+# a single step for each token. The rANS coder works backwards: the tokens are
+# coded from the last one, so the decoder reads them from the first one.
+# ------------------------------------------------------------------------------
+def range_encode(symbols, extras, first_code, clear_code, code_length):
+    tokens, raw, raw_lengths = range_tokens(symbols, extras, first_code, clear_code)
+    contexts = token_contexts(symbols, first_code, clear_code, 1 << code_length)
+    num_tokens, num_contexts = range_alphabet(first_code, code_length)
+    counts = new_counts(num_contexts, num_tokens)
+    freqs = np.empty(tokens.size, dtype=np.int64)
+    starts = np.empty(tokens.size, dtype=np.int64)
+    for start in range(0, tokens.size, ADAPT_BLOCK):
+        block = slice(start, start + ADAPT_BLOCK)
+        used, index = np.unique(contexts[block], return_inverse=True)
+        table_freqs, table_starts = frequency_tables(counts[used])
+        freqs[block] = table_freqs[index, tokens[block]]
+        starts[block] = table_starts[index, tokens[block]]
+        update_counts(counts, used, index, tokens[block])
+
+    # the state stays in [STATE_LOW, 2**32): the low 16 bits are written out
+    # before a token would take it above that
+    state = STATE_LOW
+    words = []
+    for freq, start in zip(reversed(freqs.tolist()), reversed(starts.tolist())):
+        if state >> 16 >= freq:
+            words.append(state & 0xFFFF)
+            state >>= 16
+        state = ((state // freq) << SCALE_BITS) + state % freq + start
+    words.extend((state & 0xFFFF, state >> 16))
+    coded = np.array(words[::-1], dtype='>u2').tobytes()
+
+    packer = BitPacker()
+    packed = packer.pack(raw, raw_lengths)
+    last_byte, extra_padding = packer.flush()
+    return coded + packed + last_byte, extra_padding
+
+
+# A function that decodes num_codes tokens coded by range_encode and returns
+# their symbols and extra bits.
+# ------------------------------------------------------------------------------
+def range_decode(data, num_codes, first_code, clear_code, code_length):
+    low_bits = symbol_low_bits(first_code)
+    num_literals = ((first_code - 1) >> low_bits) + 1
+    num_tokens, num_contexts = range_alphabet(first_code, code_length)
+    counts = new_counts(num_contexts, num_tokens)
+    words = np.frombuffer(data, dtype='>u2', count=len(data) // 2).tolist()
+    tokens = [0] * num_codes
+    contexts = [0] * num_codes
+    # the number of the dictionary entries (at most max_entries) and whether
+    # the token before was a single symbol
+    max_entries = (1 << code_length) - first_code
+    entries = 0
+    previous = 1
+    try:
+        state = (words[0] << 16) | words[1]
+        pos = 2
+        for block_start in range(0, num_codes, ADAPT_BLOCK):
+            if block_start:
+                block = slice(block_start - ADAPT_BLOCK, block_start)
+                used, index = np.unique(contexts[block], return_inverse=True)
+                update_counts(counts, used, index, np.array(tokens[block]))
+            # the tables are converted to lists for the contexts that appear
+            tables = [None] * num_contexts
+            for i in range(block_start, min(block_start + ADAPT_BLOCK, num_codes)):
+                context = 2 * entries.bit_length() + previous
+                table = tables[context]
+                if table is None:
+                    table_freqs, table_starts = frequency_tables(counts[context:context + 1])
+                    table = tables[context] = (table_freqs[0].tolist(),
+                                               table_starts[0].tolist())
+                freqs, starts = table
+                slot = state & SCALE_MASK
+                token = bisect.bisect_right(starts, slot) - 1
+                state = freqs[token] * (state >> SCALE_BITS) + slot - starts[token]
+                if state < STATE_LOW:
+                    state = (state << 16) | words[pos]
+                    pos += 1
+                tokens[i] = token
+                contexts[i] = context
+                previous = token <= num_literals
+                if token == num_literals:
+                    entries = -1
+                if entries < max_entries:
+                    entries += 1
+    except IndexError:
+        raise ValueError("The range coded data is truncated.") from None
+    # the decoder ends in the state the encoder started from
+    if state != STATE_LOW:
+        raise ValueError("Invalid range coded data.")
+
+    tokens = np.array(tokens, dtype=np.int64)
+    literal = tokens < num_literals
+    is_clear = tokens == num_literals
+    distances = tokens - num_literals - 1
+    buckets = np.where(literal | is_clear, 0, distances >> DISTANCE_BITS)
+    extra_lengths = np.maximum(buckets - 1, 0)
+    high_bits = np.minimum(extra_lengths, DISTANCE_BITS)
+    raw_lengths = np.where(literal, low_bits, extra_lengths - high_bits)
+    high = np.where(literal | is_clear, 0, distances & ((1 << DISTANCE_BITS) - 1))
+    raw = read_bit_fields(data[2 * pos:], raw_lengths).astype(np.int64)
+    symbols = np.where(literal, (tokens << low_bits) | raw, first_code + buckets)
+    symbols[is_clear] = clear_code
+    if (symbols[literal] >= first_code).any() or (high >> high_bits).any() or \
+            (clear_code < 0 and is_clear.any()):
+        raise ValueError("Invalid range coded data.")
+    extras = np.where(literal, 0, (high << raw_lengths) | raw)
+    return symbols, extras
+
+
+# A function that codes the given LZW codes with the given entropy coder (id)
+# and returns the coded bytes and the number of the zero bits added to the end.
+# The codes were produced with a dictionary of at most 2**code_length entries
+# that starts with alphabet_size single symbols and uses the given policy.
+# ------------------------------------------------------------------------------
+def entropy_encode(codes, coder, code_length, policy=FREEZE, alphabet_size=256):
+    first_code = first_free_code(alphabet_size, policy)
+    clear_code = alphabet_size if policy == RESET else -1
+    symbols, extras, extra_lengths = code_tokens(codes, first_code, clear_code,
+                                                 1 << code_length)
+    header = CODE_COUNT.pack(symbols.size)
+    if coder == HUFFMAN:
+        coded, extra_padding = huffman_encode(symbols, extras, extra_lengths, first_code,
+                                              code_length)
+    else:
+        coded, extra_padding = range_encode(symbols, extras, first_code, clear_code,
+                                            code_length)
+    return header + coded, extra_padding
+
+
+# A function that decodes the LZW codes coded by entropy_encode (with the same
+# parameters) and returns them as a NumPy array.
+# ------------------------------------------------------------------------------
+def entropy_decode(data, coder, code_length, policy=FREEZE, alphabet_size=256):
+    first_code = first_free_code(alphabet_size, policy)
+    clear_code = alphabet_size if policy == RESET else -1
+    num_codes = CODE_COUNT.unpack_from(data)[0]
+    data = data[CODE_COUNT.size:]
+    if coder == HUFFMAN:
+        symbols, extras = huffman_decode(data, num_codes, first_code, code_length)
+    elif coder == RANGE:
+        symbols, extras = range_decode(data, num_codes, first_code, clear_code,
+                                       code_length)
+    else:
+        raise ValueError(f"Unknown entropy coder id: {coder}")
+    return token_codes(symbols, extras, first_code, clear_code, 1 << code_length)
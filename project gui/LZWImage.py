@@ -1,165 +1,234 @@
 #!/usr/bin/env python3
+import io
 import os
 import math
 import struct
 import numpy as np
 from PIL import Image
+from LZWCore import FREEZE, encode_symbols, decode_bytes, peak_dict_size
+from LZWBits import pack_code_stream, parse_code_length_field, unpack_code_stream
+from LZWTiles import TiledImageReader, is_tiled_file, write_tiled_file
+from LZWContainer import IMAGE, ContainerWriter, feature_flags, is_path, map_file, \
+    read_data
+from LZWApi import load_pixels
+from LZWStats import RunStats, count, measure
+from LZWEntropy import entropy_id
 
 class LZWImageCoding:
-    def __init__(self, filename, data_type):
+    def __init__(self, filename, data_type, variable_width=False,
+                 max_code_length=None, policy=FREEZE, tile_size=None, parallel=True,
+                 entropy=None, progress=None, trace_memory=False, profile=False,
+                 verbose=False):
         self.filename = filename      # Örneğin: 'lena_grayscale'
         self.data_type = data_type    # 'image'
         self.codelength = None
-
-    def compress_image_file(self):
+        # True ise kodlar 9 bitten başlayıp sözlükle birlikte büyüyen
+        # genişliklerle yazılır (değişken genişlik modu)
+        self.variable_width = variable_width
+        # Sözlük en fazla 2**max_code_length girdi içerir (None: sınırsız);
+        # sözlük dolduğunda policy uygulanır ('freeze', 'reset' veya 'lru')
+        self.max_code_length = max_code_length
+        self.policy = policy
+        # entropy: 'huffman' veya 'range' verilirse kodlar sabit genişlikte
+        # yazılmak yerine entropi kodlanır (bkz. LZWEntropy; değişken genişlik
+        # moduyla birlikte kullanılmaz); açarken dosyadan okunur
+        entropy_id(entropy, variable_width)
+        self.entropy = entropy
+        # tile_size verilirse görüntü tile_size x tile_size'lık döşemelere
+        # bölünür ve her döşeme kendi sözlüğüyle sıkıştırılır (bkz. LZWTiles);
+        # parallel True ise döşemeler ayrı süreçlerde işlenir
+        self.tile_size = tile_size
+        self.parallel = parallel
+        # progress(stage, done, total): kodlama/açma sırasında ilerlemeyi
+        # bildiren fonksiyon (ör. ilerleme çubuğu için; None: bildirilmez)
+        self.progress = progress
+        # Son sıkıştırma/açma işleminin istatistikleri (aşama süreleri, kod
+        # sayıları, sözlük boyutu; bkz. LZWStats). trace_memory her aşamanın
+        # en yüksek bellek kullanımını, profile ise sıcak döngülerin cProfile
+        # profilini ekler
+        self.stats = None
+        self.trace_memory = trace_memory
+        self.profile = profile
+        # verbose True ise dosya metotları her dosyanın ayrıntılarını yazdırır
+        # (False: hiçbir şey yazdırılmaz; ayrıntılar self.stats'tadır)
+        self.verbose = verbose
+
+    def compress(self, image):
+        # Bellekte sıkıştırma: image bir numpy dizisi, PIL görüntüsü, dosya
+        # nesnesi veya kodlanmış görüntü (ör. PNG) byte'larıdır; .bin
+        # dosyasının byte'ları döner (dosya sistemine dokunulmaz, bkz. LZWApi)
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(image, 'L')
+        compressed_data = self.compress_pixels(pixel_array)
+        self.stats.finish(pixel_array.size, len(compressed_data))
+        return compressed_data
+
+    def compress_pixels(self, pixel_array):
+        # Gri seviye piksel dizisini sıkıştırır ve kapsayıcı (.bin) dosyasının
+        # byte'larını döndürür (compress ve compress_image_file tarafından
+        # kullanılır; istatistikleri çağıran başlatır)
+        height, width = pixel_array.shape
+        out_buffer = io.BytesIO()
+        with ContainerWriter(out_buffer, IMAGE, feature_flags(self)) as f:
+            if self.tile_size:
+                # Döşemeli mod: her döşeme ayrı sıkıştırılır ve döşeme ofset
+                # tablosuyla birlikte yazılır
+                write_tiled_file(self, f, pixel_array, self.tile_size,
+                                 parallel=self.parallel)
+            else:
+                # Kodları codelength bitlik (veya değişken genişlikli) değerler olarak
+                # byte'lara paketle; son byte sıfırlarla 8'in katına tamamlanır ve
+                # ilk byte, eklenen sıfır sayısını saklar.
+                packed_codes, extra_padding, codelength_info, _ = self.compress_plane(pixel_array)
+
+                # Meta bilgiler: width (4 byte), height (4 byte), codelength (2 byte)
+                f.write(struct.pack('>I', width))    # 4 byte: genişlik
+                f.write(struct.pack('>I', height))   # 4 byte: yükseklik
+                f.write(struct.pack('>H', codelength_info))  # 2 byte: code length (+ mod bayrağı)
+                f.write(bytes([extra_padding]))
+                f.write(packed_codes)
+        return out_buffer.getvalue()
+
+    def compress_image_file(self, input_path=None, output_path=None):
         # Çalışma dizinini al
         current_directory = os.path.dirname(os.path.realpath(__file__))
-        # Giriş dosyasının yolunu oluştur (örneğin .png uzantılı)
-        input_file = self.filename + '.png'
-        input_path = os.path.join(current_directory, input_file)
+        # Giriş dosyasının yolunu oluştur (verilmemişse .png uzantılı)
+        if input_path is None:
+            input_path = os.path.join(current_directory, self.filename + '.png')
+        input_file = os.path.basename(input_path)
         # Çıkış dosyası: .bin uzantılı sıkıştırılmış dosya
-        output_file = self.filename + '.bin'
-        output_path = os.path.join(current_directory, output_file)
-
-        # Görüntüyü gri seviye olarak oku
-        img = Image.open(input_path).convert('L')
-        pixel_array = np.array(img)
+        if output_path is None:
+            output_path = os.path.join(current_directory, self.filename + '.bin')
+        output_file = os.path.basename(output_path)
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
+
+        # Görüntüyü gri seviye olarak oku, bellekte sıkıştır ve dosyaya yaz
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(input_path, 'L')
         height, width = pixel_array.shape
+        compressed_data = self.compress_pixels(pixel_array)
+        with measure(self.stats, 'write'), open(output_path, 'wb') as f:
+            f.write(compressed_data)
+
+        original_size = width * height  # Ham piksel verisi boyutu (byte cinsinden)
+        compressed_size = len(compressed_data)
+        if self.verbose:
+            print(f"{input_file} is compressed into {output_file}.")
+            print(f"Image Dimensions: {width} x {height}")
+            print(f"Uncompressed Size (raw pixels): {original_size} bytes")
+            print(f"Compressed Size: {compressed_size} bytes")
+            print(f"Compression Ratio: {compressed_size / original_size:.3f}")
+        self.stats.finish(original_size, compressed_size)
+        return output_path
 
+    def compress_plane(self, pixel_array):
         # 2D piksel matrisini 1D listeye dönüştür (satır satır)
         pixel_list = pixel_array.flatten().tolist()
 
         # LZW sıkıştırma: piksel listesi üzerinde uygulayın
+        # (encode metodunda self.codelength ayarlanır)
         encoded_codes = self.encode(pixel_list)
 
-        # Sıkıştırma işlemi sırasında sözlük genişledikçe codelength belirlenir
-        # (encode metodunda self.codelength ayarlanır)
-
-        # Kod listesini binary string'e dönüştür
-        bit_string = self.int_list_to_binary_string(encoded_codes)
-        # Padding ekle: bit string'in uzunluğunu 8'in katına tamamla;
-        # ilk 8 bit, eklenen sıfır sayısını saklar.
-        padded_bit_string = self.pad_encoded_data(bit_string)
-        # Bit string'i byte array'e çevir
-        byte_array = self.get_byte_array(padded_bit_string)
-
-        # Dosyaya meta bilgileri yaz: width (4 byte), height (4 byte), codelength (2 byte)
-        with open(output_path, 'wb') as f:
-            f.write(struct.pack('>I', width))    # 4 byte: genişlik
-            f.write(struct.pack('>I', height))   # 4 byte: yükseklik
-            f.write(struct.pack('>H', self.codelength))  # 2 byte: code length
-            f.write(byte_array)
-
-        print(f"{input_file} is compressed into {output_file}.")
-        print(f"Image Dimensions: {width} x {height}")
-        original_size = width * height  # Ham piksel verisi boyutu (byte cinsinden)
-        compressed_size = os.path.getsize(output_path)
-        print(f"Uncompressed Size (raw pixels): {original_size} bytes")
-        print(f"Compressed Size: {compressed_size} bytes")
-        print(f"Compression Ratio: {compressed_size / original_size:.3f}")
-        return output_path
+        # Kodları paketle: (paketlenmiş byte'lar, padding, code length alanı, codelength)
+        with measure(self.stats, 'pack'):
+            packed_codes, extra_padding, codelength_info = pack_code_stream(
+                encoded_codes, self.codelength, self.variable_width, self.policy,
+                entropy=self.entropy)
+        return packed_codes, extra_padding, codelength_info, self.codelength
 
     def encode(self, pixel_list):
-        # Başlangıç sözlüğü: her piksel değeri (0-255) tek elemanlı tuple olarak
-        dict_size = 256
-        dictionary = { (i,): i for i in range(dict_size) }
-        w = []
-        result = []
-        for pixel in pixel_list:
-            w_plus = w + [pixel]
-            key = tuple(w_plus)
-            if key in dictionary:
-                w = w_plus
-            else:
-                result.append(dictionary[tuple(w)])
-                dictionary[key] = dict_size
-                dict_size += 1
-                w = [pixel]
-        if w:
-            result.append(dictionary[tuple(w)])
-        # codelength, sözlüğün genişliğine göre ayarlanır
+        # Başlangıç sözlüğü: her piksel değeri (0-255) kendi kodu ile temsil edilir;
+        # yeni girdiler (önek kodu, piksel) çifti ile saklanır
+        max_dict_size = None if self.max_code_length is None else 2 ** self.max_code_length
+        with measure(self.stats, 'lzw'):
+            result, dict_size = encode_symbols(pixel_list, 256, max_dict_size, self.policy,
+                                               self.progress)
+        count(self.stats, len(pixel_list), len(result), dict_size)
+        # codelength, sözlüğün ulaştığı en büyük genişliğe göre ayarlanır
         self.codelength = math.ceil(math.log2(dict_size))
         return result
 
-    def int_list_to_binary_string(self, int_list):
-        bitstring = ""
-        for num in int_list:
-            bitstring += format(num, '0{}b'.format(self.codelength))
-        return bitstring
-
-    def pad_encoded_data(self, bitstring):
-        extra_padding = 8 - (len(bitstring) % 8)
-        if extra_padding == 8:
-            extra_padding = 0
-        header = format(extra_padding, '08b')
-        padded = header + bitstring + ("0" * extra_padding)
-        return padded
-
-    def get_byte_array(self, padded_bitstring):
-        if len(padded_bitstring) % 8 != 0:
-            raise ValueError("Padded bitstring length is not a multiple of 8.")
-        b_array = bytearray()
-        for i in range(0, len(padded_bitstring), 8):
-            byte = padded_bitstring[i:i+8]
-            b_array.append(int(byte, 2))
-        return b_array
-
-    def decompress_image_file(self):
+    def decompress(self, data):
+        # Bellekte açma: data .bin dosyasının byte'larıdır; h x w piksel
+        # dizisi döner (dosya sistemine dokunulmaz)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        pixel_array = self.decompress_pixels(data)
+        self.stats.finish(len(data), pixel_array.size)
+        return pixel_array
+
+    def decompress_pixels(self, source):
+        # source: .bin dosyasının yolu veya byte'ları; piksel dizisi döner
+        if is_tiled_file(source):
+            # Döşemeli dosya: tüm döşemeleri aç ve birleştir
+            return TiledImageReader(source).decode_image(self, self.parallel)
+        with measure(self.stats, 'read'):
+            data = read_data(source)
+        width, height, code_length = struct.unpack_from('>IIH', data)
+        # İlk byte: padding bilgisi
+        extra_padding = data[10]
+        return self.decompress_plane(data[11:], code_length, extra_padding, height, width)
+
+    def decompress_image_file(self, input_path=None, output_path=None):
+        # Yollar verilmemişse dosya adı gövdesinden oluşturulur
         current_directory = os.path.dirname(os.path.realpath(__file__))
-        input_file = self.filename + '.bin'
-        input_path = os.path.join(current_directory, input_file)
-        output_file = self.filename + '_decompressed.png'
-        output_path = os.path.join(current_directory, output_file)
-
-        with open(input_path, 'rb') as f:
-            width = struct.unpack('>I', f.read(4))[0]
-            height = struct.unpack('>I', f.read(4))[0]
-            code_length = struct.unpack('>H', f.read(2))[0]
-            compressed_bytes = f.read()
-
-        # Byte array'den bit string oluştur
-        bitstring = ""
-        for byte in compressed_bytes:
-            bitstring += format(byte, '08b')
-        # İlk 8 bit: padding bilgisi
-        extra_padding = int(bitstring[:8], 2)
-        bitstring = bitstring[8:]
-        if extra_padding > 0:
-            bitstring = bitstring[:-extra_padding]
-
-        # Bit string'i code_length'lık parçalara ayırarak integer kodlar listesi oluştur
-        codes = []
-        for i in range(0, len(bitstring), code_length):
-            chunk = bitstring[i:i+code_length]
-            if len(chunk) < code_length:
-                break
-            codes.append(int(chunk, 2))
-
-        # LZW dekompresyon algoritması
-        decompressed_pixels = self.decode(codes)
-        # Listeyi 2D numpy array'e (yükseklik x genişlik) dönüştür
-        pixel_array = np.array(decompressed_pixels, dtype=np.uint8).reshape((height, width))
+        if input_path is None:
+            input_path = os.path.join(current_directory, self.filename + '.bin')
+        if output_path is None:
+            output_path = os.path.join(current_directory, self.filename + '_decompressed.png')
+        input_file = os.path.basename(input_path)
+        output_file = os.path.basename(output_path)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+
+        # Dosya belleğe eşlenir (mmap); sayfalar yalnızca okundukça diskten gelir
+        pixel_array = self.decompress_pixels(map_file(input_path))
         # Geri yüklenmiş görüntüyü kaydet
-        img = Image.fromarray(pixel_array, 'L')
-        img.save(output_path)
+        with measure(self.stats, 'write'):
+            img = Image.fromarray(pixel_array, 'L')
+            img.save(output_path)
 
-        print(f"{input_file} is decompressed into {output_file}.")
+        if self.verbose:
+            print(f"{input_file} is decompressed into {output_file}.")
+        self.stats.finish(os.path.getsize(input_path), pixel_array.size)
         return output_path
 
-    def decode(self, codes):
-        dict_size = 256
-        dictionary = { i: [i] for i in range(dict_size) }
-        w = dictionary[codes[0]]
-        result = w[:]
-        for code in codes[1:]:
-            if code in dictionary:
-                entry = dictionary[code]
-            elif code == dict_size:
-                entry = w + [w[0]]
-            else:
-                raise ValueError("Bad compressed code: %s" % code)
-            result.extend(entry)
-            dictionary[dict_size] = w + [entry[0]]
-            dict_size += 1
-            w = entry
-        return result
+    def decompress_plane(self, compressed_bytes, code_length, extra_padding, height, width):
+        # code_length'lık (veya değişken genişlikli) kodlar doğrudan integer
+        # dizisine açılır
+        with measure(self.stats, 'unpack'):
+            codes = unpack_code_stream(compressed_bytes, code_length, extra_padding).tolist()
+        # Sözlük sınırı ve politikası da code length alanında saklanır
+        self.codelength, self.variable_width, self.policy = parse_code_length_field(code_length)
+
+        # LZW dekompresyon algoritması
+        # (pikseller width * height byte'lık önceden ayrılmış tampona yazılır)
+        decompressed_pixels = self.decode(codes, width * height)
+        # Tamponu kopyalamadan 2D numpy array (yükseklik x genişlik) olarak gör
+        return np.frombuffer(decompressed_pixels, dtype=np.uint8).reshape((height, width))
+
+    def decode_region(self, x, y, w, h, source=None):
+        # Döşemeli .bin dosyasından yalnızca (x, y, w, h) dikdörtgenini kapsayan
+        # döşemeler okunup açılır; h x w piksel dizisi döner. source: .bin
+        # dosyasının yolu (belleğe eşlenir) veya byte'ları (None: filename +
+        # '.bin'); hız için DATA bölümünün CRC32'si denetlenmez
+        if source is None:
+            current_directory = os.path.dirname(os.path.realpath(__file__))
+            source = os.path.join(current_directory, self.filename + '.bin')
+        input_size = os.path.getsize(source) if is_path(source) else len(source)
+        if is_path(source):
+            source = map_file(source)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        region = TiledImageReader(source).decode_region(self, x, y, w, h, self.parallel)
+        self.stats.finish(input_size, region.size)
+        return region
+
+    def decode(self, codes, size=None):
+        # Sözlük, sıkıştırmadaki ile aynı sınır ve politika ile yeniden kurulur;
+        # girdiler çıktıdaki (konum, uzunluk) çiftleri olarak tutulur ve
+        # pikseller doğrudan bir bytearray'e yazılır (size: piksel sayısı)
+        with measure(self.stats, 'lzw'):
+            pixels = decode_bytes(codes, size, 256, 2 ** self.codelength, self.policy,
+                                  self.progress)
+        count(self.stats, len(pixels), len(codes),
+              peak_dict_size(codes, 256, 2 ** self.codelength, self.policy))
+        return pixels
@@ -1,230 +1,334 @@
 #!/usr/bin/env python3
+import io
 import os
 import math
 import struct
 import numpy as np
 from PIL import Image
+from LZWCore import FREEZE, encode_symbols, decode_bytes, peak_dict_size
+from LZWBits import PREDICTOR_FLAG, pack_code_stream, parse_code_length_field, unpack_code_stream
+from LZWTiles import TiledImageReader, is_tiled_file, write_tiled_file
+from LZWContainer import IMAGE_DIFF, ContainerWriter, feature_flags, is_path, map_file, \
+    read_data
+from LZWApi import load_pixels
+from LZWPredict import predict, reconstruct
+from LZWStats import RunStats, count, measure
+from LZWEntropy import entropy_id
 
 class LZWImageDiffCoding:
-    def __init__(self, filename, data_type):
+    def __init__(self, filename, data_type, variable_width=False,
+                 max_code_length=None, policy=FREEZE, tile_size=None, parallel=True,
+                 predictor=None, entropy=None, progress=None, trace_memory=False,
+                 profile=False, verbose=False):
         self.filename = filename      # Örn: 'lena_diff'
         self.data_type = data_type    # 'image'
         self.codelength = None
         self.offset = 128            # Farkları 0..255 aralığına çekmek için
+        self.variable_width = variable_width  # değişken genişlikli kodlar
+        # Sözlük sınırı (2**max_code_length girdi) ve dolunca uygulanacak politika
+        self.max_code_length = max_code_length
+        self.policy = policy
+        # entropy: 'huffman' veya 'range' verilirse kodlar sabit genişlikte
+        # yazılmak yerine entropi kodlanır (bkz. LZWEntropy; değişken genişlik
+        # moduyla birlikte kullanılmaz); açarken dosyadan okunur
+        entropy_id(entropy, variable_width)
+        self.entropy = entropy
+        # Döşemeli mod: tile_size x tile_size'lık döşemeler ayrı sözlüklerle
+        # sıkıştırılır (None: tek parça); parallel ise döşemeleri süreçlere dağıtır
+        self.tile_size = tile_size
+        self.parallel = parallel
+        # Tahminci: None ise satır içi fark (+ offset); 'left', 'up', 'average',
+        # 'paeth', 'med' veya 'adaptive' (satır başına en iyi tahminci) ise
+        # artıklar LZWPredict ile hesaplanır ve offset kullanılmaz
+        self.predictor = predictor
+        # progress(stage, done, total): kodlama/açma sırasında ilerlemeyi
+        # bildiren fonksiyon (ör. ilerleme çubuğu için; None: bildirilmez)
+        self.progress = progress
+        # Son işlemin istatistikleri (bkz. LZWStats); trace_memory aşama başına
+        # bellek tepe değerini, profile sıcak döngülerin profilini ekler
+        self.stats = None
+        self.trace_memory = trace_memory
+        self.profile = profile
+        # verbose True ise dosya metotları her dosyanın ayrıntılarını yazdırır
+        # (False: hiçbir şey yazdırılmaz; ayrıntılar self.stats'tadır)
+        self.verbose = verbose
 
-    def compress_image_file(self):
+    def compress(self, image):
+        """
+        Bellekte sıkıştırma (dosya sistemine dokunulmaz, bkz. LZWApi).
+        image: numpy dizisi, PIL görüntüsü, dosya nesnesi veya kodlanmış
+        görüntü (ör. PNG) byte'ları
+        return: .bin dosyasının byte'ları
+        """
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(image, 'L')
+        compressed_data = self.compress_pixels(pixel_array)
+        self.stats.finish(pixel_array.size, len(compressed_data))
+        return compressed_data
+
+    def compress_pixels(self, pixel_array):
         """
-        1) .png dosyasını gri seviye olarak oku
         2) Piksel farklarını (difference image) hesapla
         3) LZW sıkıştırma
-        4) Sonucu .bin dosyasına yaz (meta bilgiler + sıkıştırılmış veriler)
+        4) Sonucu kapsayıcının byte'ları olarak döndür (meta bilgiler +
+           sıkıştırılmış veriler)
+        """
+        height, width = pixel_array.shape
+        out_buffer = io.BytesIO()
+        with ContainerWriter(out_buffer, IMAGE_DIFF, feature_flags(self)) as f:
+            if self.tile_size:
+                # Döşemeli mod: 2) ve 3) her döşeme için ayrı yapılır; offset
+                # döşemeli dosyanın başlığında saklanır
+                write_tiled_file(self, f, pixel_array, self.tile_size,
+                                 struct.pack('>H', self.offset), self.parallel)
+            else:
+                # 2-3) Fark matrisi + LZW sıkıştırma; kodlar byte'lara paketlenir
+                # ve ilk byte padding miktarını saklar
+                packed_codes, extra_padding, codelength_info, _ = self.compress_plane(pixel_array)
+
+                # 4) Meta bilgiler: width, height, codelength, offset
+                f.write(struct.pack('>I', width))    # 4 byte
+                f.write(struct.pack('>I', height))   # 4 byte
+                f.write(struct.pack('>H', codelength_info))  # 2 byte (+ mod bayrağı)
+                f.write(struct.pack('>H', self.offset))      # 2 byte (offset)
+                f.write(bytes([extra_padding]))
+                f.write(packed_codes)
+        return out_buffer.getvalue()
+
+    def compress_image_file(self, input_path=None, output_path=None):
         """
+        1) .png dosyasını gri seviye olarak oku
+        2-4) Bellekte sıkıştır (compress_pixels)
+        5) Sonucu .bin dosyasına yaz
+        """
+        # (input_path / output_path verilmemişse dosya adı gövdesinden oluşturulur)
         current_directory = os.path.dirname(os.path.realpath(__file__))
-        input_file = self.filename + '.png'
-        input_path = os.path.join(current_directory, input_file)
-        output_file = self.filename + '.bin'
-        output_path = os.path.join(current_directory, output_file)
+        if input_path is None:
+            input_path = os.path.join(current_directory, self.filename + '.png')
+        if output_path is None:
+            output_path = os.path.join(current_directory, self.filename + '.bin')
+        input_file = os.path.basename(input_path)
+        output_file = os.path.basename(output_path)
+        self.stats = RunStats(type(self).__name__, 'compress', self.trace_memory, self.profile)
 
         # 1) Görüntüyü gri seviye oku
-        img = Image.open(input_path).convert('L')
-        pixel_array = np.array(img)
+        with measure(self.stats, 'read'):
+            pixel_array = load_pixels(input_path, 'L')
         height, width = pixel_array.shape
+        compressed_data = self.compress_pixels(pixel_array)
+        # 5) Dosyaya yaz
+        with measure(self.stats, 'write'), open(output_path, 'wb') as f:
+            f.write(compressed_data)
+
+        original_size = width * height  # ham piksel boyutu (byte)
+        compressed_size = len(compressed_data)
+        if self.verbose:
+            print(f"{input_file} is compressed into {output_file}.")
+            print(f"Original pixel count: {original_size} bytes")
+            print(f"Compressed file size: {compressed_size} bytes")
+            if original_size != 0:
+                print(f"Compression Ratio: {compressed_size/original_size:.3f}")
+        self.stats.finish(original_size, compressed_size)
+        return output_path
 
-        # 2) Fark matrisi oluştur (satır içi fark)
-        diff_array = self.create_difference_image(pixel_array)
+    def compress_plane(self, pixel_array):
+        """
+        Tek bir piksel matrisini (görüntü veya döşeme) sıkıştırır.
+        return: (paketlenmiş byte'lar, padding, code length alanı, codelength)
+        """
+        with measure(self.stats, 'transform'):
+            if self.predictor:
+                # Satır başına tahminci numaraları ve tahmin artıkları (mod 256)
+                predictor_ids, diff_array = predict(pixel_array, self.predictor)
+            else:
+                # Fark matrisi oluştur (satır içi fark)
+                predictor_ids, diff_array = None, self.create_difference_image(pixel_array)
 
         # 2D -> 1D liste
         diff_list = diff_array.flatten().tolist()
 
-        # 3) LZW sıkıştırma (difference listesi)
+        # LZW sıkıştırma (difference listesi)
         encoded_codes = self.encode(diff_list)
 
-        # Kodlar bit string'e dönüştürülüp padding eklenir
-        bitstring = self.int_list_to_binary_string(encoded_codes)
-        padded_bitstring = self.pad_encoded_data(bitstring)
-        byte_array = self.get_byte_array(padded_bitstring)
-
-        # 4) Meta bilgileri (width, height, codelength, offset) + veriyi dosyaya yaz
-        with open(output_path, 'wb') as f:
-            # width, height, codelength, offset
-            f.write(struct.pack('>I', width))    # 4 byte
-            f.write(struct.pack('>I', height))   # 4 byte
-            f.write(struct.pack('>H', self.codelength))  # 2 byte
-            f.write(struct.pack('>H', self.offset))      # 2 byte (offset)
-            f.write(byte_array)
-
-        print(f"{input_file} is compressed into {output_file}.")
-        original_size = width * height  # ham piksel boyutu (byte)
-        compressed_size = os.path.getsize(output_path)
-        print(f"Original pixel count: {original_size} bytes")
-        print(f"Compressed file size: {compressed_size} bytes")
-        if original_size != 0:
-            print(f"Compression Ratio: {compressed_size/original_size:.3f}")
-        return output_path
+        with measure(self.stats, 'pack'):
+            packed_codes, extra_padding, codelength_info = pack_code_stream(
+                encoded_codes, self.codelength, self.variable_width, self.policy,
+                entropy=self.entropy)
+        if predictor_ids is not None:
+            # Tahminci numaraları (satır başına 1 byte) kodların önüne yazılır
+            packed_codes = predictor_ids.tobytes() + packed_codes
+            codelength_info |= PREDICTOR_FLAG
+        return packed_codes, extra_padding, codelength_info, self.codelength
 
     def create_difference_image(self, pixel_array):
         """
         Basit fark yaklaşımı: 
         - Her satırın ilk pikselini ham sakla
-        - Diğer pikselleri: diff = current - left + offset
+        - Diğer pikselleri: diff = (current - left + offset) mod 256
+
+        Farklar uint8 ile hesaplandığı için -255..255 aralığındaki fark mod 256
+        ile 0..255 aralığına sarılır (wraparound); bu işlem tersinirdir.
         """
-        height, width = pixel_array.shape
-        diff_array = np.zeros((height, width), dtype=np.uint8)
-
-        for r in range(height):
-            for c in range(width):
-                if c == 0:
-                    # İlk pikseli aynen sakla (fark yok)
-                    diff_array[r, c] = pixel_array[r, c]
-                else:
-                    # fark = current - left + offset
-                    val = (pixel_array[r, c] - pixel_array[r, c-1]) + self.offset
-                    # 0..255 aralığına sığdığını varsayıyoruz
-                    diff_array[r, c] = val
+        pixel_array = np.asarray(pixel_array, dtype=np.uint8)
+        diff_array = np.empty_like(pixel_array)
+        # İlk sütunu aynen sakla (fark yok)
+        diff_array[:, :1] = pixel_array[:, :1]
+        # fark = current - left + offset (tüm satırlar için tek seferde, mod 256)
+        np.add(np.diff(pixel_array, axis=1), np.uint8(self.offset % 256),
+               out=diff_array[:, 1:])
         return diff_array
 
     def encode(self, diff_list):
         """
         LZW sıkıştırma (piksel fark dizisi üzerinde).
+        Sözlük (önek kodu, sembol) çiftleri ile tutulur (bkz. LZWCore).
         """
-        dict_size = 256
-        dictionary = { (i,): i for i in range(dict_size) }
-        w = []
-        result = []
-
-        for val in diff_list:
-            w_plus = w + [val]
-            key = tuple(w_plus)
-            if key in dictionary:
-                w = w_plus
-            else:
-                result.append(dictionary[tuple(w)])
-                dictionary[key] = dict_size
-                dict_size += 1
-                w = [val]
-        if w:
-            result.append(dictionary[tuple(w)])
+        max_dict_size = None if self.max_code_length is None else 2 ** self.max_code_length
+        with measure(self.stats, 'lzw'):
+            result, dict_size = encode_symbols(diff_list, 256, max_dict_size, self.policy,
+                                               self.progress)
+        count(self.stats, len(diff_list), len(result), dict_size)
 
         # Sözlük büyüklüğüne göre code length hesapla
         self.codelength = math.ceil(math.log2(dict_size))
         return result
 
-    def int_list_to_binary_string(self, int_list):
-        bitstring = ""
-        for num in int_list:
-            bitstring += format(num, '0{}b'.format(self.codelength))
-        return bitstring
-
-    def pad_encoded_data(self, bitstring):
-        extra_padding = 8 - (len(bitstring) % 8)
-        if extra_padding == 8:
-            extra_padding = 0
-        # ilk 8 bit'e extra_padding bilgisini koy
-        header = format(extra_padding, '08b')
-        padded = header + bitstring + ("0" * extra_padding)
-        return padded
-
-    def get_byte_array(self, padded_bitstring):
-        if len(padded_bitstring) % 8 != 0:
-            raise ValueError("Bit string length is not a multiple of 8.")
-        b_array = bytearray()
-        for i in range(0, len(padded_bitstring), 8):
-            chunk = padded_bitstring[i:i+8]
-            b_array.append(int(chunk, 2))
-        return b_array
-
-    def decompress_image_file(self):
-        """
-        1) .bin dosyasını oku (width, height, code_length, offset + sıkıştırılmış veri)
+    def decompress(self, data):
+        """
+        Bellekte açma (dosya sistemine dokunulmaz).
+        data: .bin dosyasının byte'ları
+        return: h x w piksel dizisi
+        """
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        pixel_array = self.decompress_pixels(data)
+        self.stats.finish(len(data), pixel_array.size)
+        return pixel_array
+
+    def decompress_pixels(self, source):
+        """
+        1) Veriyi oku (width, height, code_length, offset + sıkıştırılmış veri)
         2) LZW dekompresyon -> fark dizisi
         3) Fark dizisinden orijinal piksel değerlerini hesapla
+        source: .bin dosyasının yolu veya byte'ları
+        """
+        if is_tiled_file(source):
+            # Döşemeli dosya: tüm döşemeleri aç ve birleştir
+            return self.read_tiled_file(source).decode_image(self, self.parallel)
+        with measure(self.stats, 'read'):
+            data = read_data(source)
+        width, height, codelength_info, self.offset = struct.unpack_from('>IIHH', data)
+        # İlk byte: padding bilgisi
+        extra_padding = data[12]
+        return self.decompress_plane(data[13:], codelength_info, extra_padding, height, width)
+
+    def decompress_image_file(self, input_path=None, output_path=None):
+        """
+        1-3) .bin dosyasını aç (decompress_pixels)
         4) Kaydet (.png)
         """
+        # (input_path / output_path verilmemişse dosya adı gövdesinden oluşturulur)
         current_directory = os.path.dirname(os.path.realpath(__file__))
-        input_file = self.filename + '.bin'
-        input_path = os.path.join(current_directory, input_file)
-        output_file = self.filename + '_decompressed.png'
-        output_path = os.path.join(current_directory, output_file)
-
-        with open(input_path, 'rb') as f:
-            width = struct.unpack('>I', f.read(4))[0]
-            height = struct.unpack('>I', f.read(4))[0]
-            self.codelength = struct.unpack('>H', f.read(2))[0]
-            self.offset = struct.unpack('>H', f.read(2))[0]
-            compressed_bytes = f.read()
-
-        # Byte array -> bit string
-        bitstring = ""
-        for byte in compressed_bytes:
-            bitstring += format(byte, '08b')
-
-        # ilk 8 bit = extra_padding
-        extra_padding = int(bitstring[:8], 2)
-        bitstring = bitstring[8:]
-        if extra_padding > 0:
-            bitstring = bitstring[:-extra_padding]
-
-        # bit string -> integer kodlar
-        codes = []
-        for i in range(0, len(bitstring), self.codelength):
-            chunk = bitstring[i:i+self.codelength]
-            if len(chunk) < self.codelength:
-                break
-            val = int(chunk, 2)
-            codes.append(val)
+        if input_path is None:
+            input_path = os.path.join(current_directory, self.filename + '.bin')
+        if output_path is None:
+            output_path = os.path.join(current_directory, self.filename + '_decompressed.png')
+        input_file = os.path.basename(input_path)
+        output_file = os.path.basename(output_path)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+
+        # Dosya belleğe eşlenir (mmap); sayfalar yalnızca okundukça diskten gelir
+        pixel_array = self.decompress_pixels(map_file(input_path))
+
+        # 4) Kaydet
+        with measure(self.stats, 'write'):
+            img = Image.fromarray(pixel_array, 'L')
+            img.save(output_path)
+
+        if self.verbose:
+            print(f"{input_file} is decompressed into {output_file}.")
+        self.stats.finish(os.path.getsize(input_path), pixel_array.size)
+        return output_path
+
+    def decompress_plane(self, compressed_bytes, codelength_info, extra_padding, height, width):
+        """
+        Tek bir piksel matrisini (görüntü veya döşeme) açar.
+        """
+        predictor_ids = None
+        if codelength_info & PREDICTOR_FLAG:
+            # İlk height byte: satırların tahminci numaraları
+            predictor_ids = np.frombuffer(compressed_bytes[:height], dtype=np.uint8)
+            compressed_bytes = compressed_bytes[height:]
+
+        # codelength'lık (veya değişken genişlikli) kodlar doğrudan integer
+        # dizisine açılır
+        with measure(self.stats, 'unpack'):
+            codes = unpack_code_stream(compressed_bytes, codelength_info, extra_padding).tolist()
+        # Sözlük sınırı ve politikası da code length alanında saklanır
+        self.codelength, self.variable_width, self.policy = parse_code_length_field(codelength_info)
 
         # LZW dekompresyon -> fark listesi
-        diff_list = self.decode(codes)
+        # (farklar width * height byte'lık önceden ayrılmış tampona yazılır)
+        diff_data = self.decode(codes, width * height)
 
-        # Fark listesi -> fark matrisi
-        diff_array = np.array(diff_list, dtype=np.uint8).reshape((height, width))
+        # Fark tamponu -> fark matrisi (kopyalamadan)
+        diff_array = np.frombuffer(diff_data, dtype=np.uint8).reshape((height, width))
 
         # Fark matrisinden orijinal piksel değerlerini geri al
-        pixel_array = self.reconstruct_original(diff_array)
+        with measure(self.stats, 'transform'):
+            if predictor_ids is not None:
+                return reconstruct(diff_array, predictor_ids)
+            return self.reconstruct_original(diff_array)
 
-        # Kaydet
-        img = Image.fromarray(pixel_array, 'L')
-        img.save(output_path)
+    def read_tiled_file(self, source):
+        """
+        Döşemeli dosyanın (yol veya byte'lar) başlığını okur ve offset
+        değerini başlıktan alır.
+        """
+        reader = TiledImageReader(source)
+        self.offset = struct.unpack('>H', reader.params)[0]
+        return reader
 
-        print(f"{input_file} is decompressed into {output_file}.")
-        return output_path
+    def decode_region(self, x, y, w, h, source=None):
+        """
+        Döşemeli .bin dosyasından yalnızca (x, y, w, h) dikdörtgenini kapsayan
+        döşemeleri açar ve h x w piksel dizisini döndürür.
+        source: .bin dosyasının yolu (belleğe eşlenir) veya byte'ları (None:
+        filename + '.bin'); hız için DATA bölümünün CRC32'si denetlenmez
+        """
+        if source is None:
+            current_directory = os.path.dirname(os.path.realpath(__file__))
+            source = os.path.join(current_directory, self.filename + '.bin')
+        input_size = os.path.getsize(source) if is_path(source) else len(source)
+        if is_path(source):
+            source = map_file(source)
+        self.stats = RunStats(type(self).__name__, 'decompress', self.trace_memory, self.profile)
+        region = self.read_tiled_file(source).decode_region(self, x, y, w, h, self.parallel)
+        self.stats.finish(input_size, region.size)
+        return region
 
-    def decode(self, codes):
-        dict_size = 256
-        dictionary = {i: [i] for i in range(dict_size)}
-        w = dictionary[codes[0]]
-        result = w[:]
-        for code in codes[1:]:
-            if code in dictionary:
-                entry = dictionary[code]
-            elif code == dict_size:
-                entry = w + [w[0]]
-            else:
-                raise ValueError(f"Bad compressed code: {code}")
-            result.extend(entry)
-            dictionary[dict_size] = w + [entry[0]]
-            dict_size += 1
-            w = entry
-        return result
+    def decode(self, codes, size=None):
+        # Sözlük, sıkıştırmadaki ile aynı sınır ve politika ile yeniden kurulur;
+        # farklar doğrudan bir bytearray'e yazılır (size: piksel sayısı)
+        with measure(self.stats, 'lzw'):
+            diffs = decode_bytes(codes, size, 256, 2 ** self.codelength, self.policy,
+                                 self.progress)
+        count(self.stats, len(diffs), len(codes),
+              peak_dict_size(codes, 256, 2 ** self.codelength, self.policy))
+        return diffs
 
     def reconstruct_original(self, diff_array):
         """
         diff_array[r, 0] = orijinal piksel (ilk piksel)
-        diff_array[r, c] = (pixel[r, c] - pixel[r, c-1]) + offset
+        diff_array[r, c] = (pixel[r, c] - pixel[r, c-1] + offset) mod 256
 
         Orijinali geri almak için:
-        pixel[r, c] = diff_array[r, c] - offset + pixel[r, c-1]
-        """
-        height, width = diff_array.shape
-        pixel_array = np.zeros((height, width), dtype=np.uint8)
-
-        for r in range(height):
-            for c in range(width):
-                if c == 0:
-                    # İlk pikseli fark dizisinde olduğu gibi al
-                    pixel_array[r, c] = diff_array[r, c]
-                else:
-                    val = (diff_array[r, c] - self.offset) + pixel_array[r, c-1]
-                    # 0..255 aralığına düşmesi beklenir
-                    pixel_array[r, c] = val
-        return pixel_array
+        pixel[r, c] = (diff_array[r, c] - offset + pixel[r, c-1]) mod 256
+        yani her satırda (diff - offset) değerlerinin mod 256 kümülatif toplamı.
+        """
+        diff_array = np.asarray(diff_array, dtype=np.uint8)
+        steps = diff_array.copy()
+        # İlk sütun dışındaki farklardan offset çıkarılır (mod 256)
+        steps[:, 1:] -= np.uint8(self.offset % 256)
+        # uint8 kümülatif toplam her adımda mod 256 ile sarılır
+        return np.cumsum(steps, axis=1, dtype=np.uint8)
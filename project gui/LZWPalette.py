@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# The pixel-interleaved mode of the color coding class (Level 4).
+# ------------------------------------------------------------------------------
+# In the default mode the R, G and B channels are compressed separately, so a
+# run of pixels of the same colors has to be learned three times (once in each
+# dictionary) and costs three codes. In the interleaved mode the distinct colors
+# of the image form a palette and the image is coded as one stream of palette
+# indices with one shared dictionary: the alphabet of the dictionary is the
+# palette (its size is stored in the header) and every dictionary entry stands
+# for a sequence of whole pixels. Images with few colors (graphics, synthetic
+# images, screenshots) need about a third of the codes; photos have too many
+# distinct colors for the mode to pay off. The layout of the DATA section is:
+#   magic 'LZWI' (4 bytes), width (4 bytes), height (4 bytes),
+#   palette size (4 bytes), palette (palette size x 3 bytes, R, G, B),
+#   code length field (2 bytes), padding (1 byte), data length (4 bytes), data
+# (the code stream is stored as a channel of the Level 4 files).
+from array import array
+import struct
+import numpy as np
+from LZWContainer import data_offset, read_at
+
+PALETTE_MAGIC = b'LZWI'
+PALETTE_HEADER = struct.Struct('>4sIII')
+
+
+# A function that returns True if the given source (a path or the data) is an
+# interleaved image.
+# ------------------------------------------------------------------------------
+def is_palette_data(source):
+    return bytes(read_at(source, data_offset(source), len(PALETTE_MAGIC))) == PALETTE_MAGIC
+
+
+# A function that returns the size of the alphabet of a palette with the given
+# number of colors (an empty image still has a one-symbol alphabet).
+# ------------------------------------------------------------------------------
+def alphabet_size(palette_size):
+    return max(palette_size, 1)
+
+
+# A function that returns the palette of the given height x width x 3 RGB array
+# (palette size x 3 uint8, sorted by color) and the palette index of each pixel
+# (a flat array in row-major order).
+# ------------------------------------------------------------------------------
+def build_palette(pixel_array):
+    pixels = pixel_array.reshape(-1, 3).astype(np.uint32)
+    colors = (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+    palette_colors, indices = np.unique(colors, return_inverse=True)
+    palette = np.stack(((palette_colors >> 16) & 0xFF, (palette_colors >> 8) & 0xFF,
+                        palette_colors & 0xFF), axis=-1).astype(np.uint8)
+    return palette, indices.ravel()
+
+
+# A function that returns a buffer for the given number of palette indices that
+# decode_into can write to (a bytearray for up to 256 colors, otherwise an
+# array of 16-bit or 32-bit items) and the NumPy type of its items.
+# ------------------------------------------------------------------------------
+def index_buffer(size, alphabet):
+    if alphabet <= 1 << 8:
+        return bytearray(size), np.uint8
+    if alphabet <= 1 << 16:
+        return array('H', bytes(2 * size)), np.uint16
+    return array('I', bytes(4 * size)), np.uint32
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# Running the channels of a color image in parallel (Level 4 and Level 5).
+# ------------------------------------------------------------------------------
+# The R, G and B streams of a compressed color image are independent (each one
+# has its own code length, padding and length fields), so each channel can be
+# compressed or decompressed in a separate process. The pixel data is shared
+# with the worker processes through shared memory (one contiguous plane per
+# channel) instead of being pickled; only the compressed bytes are passed.
+#
+# The codec object (e.g., an LZWColorCoding instance) is sent to the workers,
+# which call its compress_plane / decompress_plane methods. The progress
+# callback and the statistics of the codec (if any) stay in this process, which
+# records the time of the workers as the 'parallel' stage (see LZWStats); the
+# workers only return their symbol and code counts. The workers of a
+# WorkerPool (which the tiles of LZWTiles and the blocks of LZWBlocks use as
+# well) add the progress of their LZW runs to a shared counter and stop when a
+# shared cancel event is set, so this process can report the progress while
+# the workers run and a Cancelled raised by the callback stops them at once.
+import copy
+import multiprocessing
+import os
+import struct
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+import numpy as np
+from LZWCore import Cancelled
+from LZWStats import RunStats, measure
+
+# the smallest image (in pixels) for which starting the worker processes pays
+# off
+PARALLEL_MIN_PIXELS = 1 << 16
+# the header of each channel in the Level 4 and Level 5 files (and in the tiles,
+# see LZWTiles): code length field (2 bytes), padding (1 byte), data length
+# (4 bytes), followed by the data
+CHANNEL_HEADER = struct.Struct('>HBI')
+# the progress of one LZW run of a worker in the shared progress counter
+RUN_UNITS = 1000
+# the time between two progress reports while the workers run (in seconds)
+POLL_SECONDS = 0.05
+
+# the cancel event, the progress counter and the progress of the current LZW
+# run of a worker process (set by init_worker)
+worker_cancel = None
+worker_done = None
+worker_run = 0
+
+
+# A function that splits the given number of channels stored from the given
+# position of the data and returns (data, code length field, padding) for each
+# channel (the arguments of decompress_plane before the image size). The data
+# of each channel is a slice of the given buffer, not a copy, so the channels
+# that are not decoded are never read (e.g., from a memory-mapped file).
+# ------------------------------------------------------------------------------
+def split_channels(data, pos, channels):
+    view = memoryview(data).cast('B')
+    result = []
+    for _ in range(channels):
+        code_length, extra_pad, length = CHANNEL_HEADER.unpack_from(view, pos)
+        pos += CHANNEL_HEADER.size
+        if pos + length > len(view):
+            raise ValueError("The channel data is truncated.")
+        result.append((view[pos:pos + length], code_length, extra_pad))
+        pos += length
+    return result
+
+
+# A function that decides how many worker processes are used for an image with
+# the given size (0: the channels are processed in this process, e.g., on a
+# machine with a single CPU, where the workers would only add their start-up
+# time). A process that is itself a worker of another pool (e.g., of LZWBatch
+# with several jobs) does not start its own workers, so the CPUs are not
+# oversubscribed.
+# ------------------------------------------------------------------------------
+def channel_workers(parallel, height, width, channels):
+    cpus = os.cpu_count() or 1
+    if not parallel or cpus < 2 or channels < 2 or height * width < PARALLEL_MIN_PIXELS or \
+            multiprocessing.parent_process() is not None:
+        return 0
+    return min(channels, cpus)
+
+
+# A function that returns a copy of the codec to send to the worker processes:
+# with worker_progress instead of the progress callback (which may not be
+# picklable) and with empty statistics that only collect the counts of the
+# worker (see add_counts).
+# ------------------------------------------------------------------------------
+def worker_codec(codec):
+    progress, stats = getattr(codec, 'progress', None), getattr(codec, 'stats', None)
+    if progress is None and stats is None:
+        return codec
+    codec = copy.copy(codec)
+    codec.progress = None if progress is None else worker_progress
+    if stats is not None:
+        codec.stats = RunStats(stats.codec, stats.operation)
+    return codec
+
+
+# A function that keeps the cancel event and the progress counter of a
+# WorkerPool in a worker process (the initializer of the pool).
+# ------------------------------------------------------------------------------
+def init_worker(cancel, done):
+    global worker_cancel, worker_done
+    worker_cancel, worker_done = cancel, done
+
+
+# The progress callback of the codec in a worker process: it stops the LZW run
+# by raising Cancelled when the job is cancelled and adds the progress of the
+# run (RUN_UNITS for a whole run) to the shared counter.
+# ------------------------------------------------------------------------------
+def worker_progress(stage, done, total):
+    global worker_run
+    if worker_cancel.is_set():
+        raise Cancelled()
+    if done == 0:
+        worker_run = 0   # a new run starts
+    units = RUN_UNITS * done // total if total else RUN_UNITS
+    with worker_done.get_lock():
+        worker_done.value += units - worker_run
+    worker_run = units
+
+
+# A class that runs the tasks of a parallel job in worker processes. The tasks
+# get the worker copy of the codec as their first argument and the given
+# number of LZW runs of all the tasks sets the total of the progress reports.
+# It is used in a with statement: when the job fails or is cancelled, the
+# workers are told to stop and the waiting tasks are dropped, so the
+# exception is raised without waiting for the running ones.
+# ------------------------------------------------------------------------------
+class WorkerPool:
+    def __init__(self, codec, workers, runs):
+        self.codec = codec
+        self.progress = getattr(codec, 'progress', None)
+        self.total = runs * RUN_UNITS
+        self.cancel = multiprocessing.Event()
+        self.done = multiprocessing.Value('q', 0)
+        self.task_codec = worker_codec(codec)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                        initargs=(self.cancel, self.done))
+
+    # A method that submits a task (called as fn(task codec, *args)).
+    # --------------------------------------------------------------------------
+    def submit(self, fn, *args):
+        return self.pool.submit(fn, self.task_codec, *args)
+
+    # A method that waits for the given futures and reports the progress of the
+    # workers to the progress callback of the codec under the given stage (the
+    # callback can cancel the job by raising Cancelled).
+    # --------------------------------------------------------------------------
+    def wait(self, futures, stage):
+        pending = futures
+        while pending:
+            finished, pending = wait(pending, POLL_SECONDS, FIRST_EXCEPTION)
+            for future in finished:
+                future.result()   # raises the exception of a failed task
+            if self.progress is not None:
+                self.progress(stage, min(self.done.value, self.total), self.total)
+        if self.progress is not None:
+            self.progress(stage, self.total, self.total)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.pool.shutdown(wait=True)
+        else:
+            self.cancel.set()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# A function that adds the counts collected by a worker process to the
+# statistics of the codec (if any).
+# ------------------------------------------------------------------------------
+def add_counts(codec, worker_stats):
+    stats = getattr(codec, 'stats', None)
+    if stats is not None and worker_stats is not None:
+        stats.count(worker_stats.symbols, worker_stats.codes, worker_stats.dict_size)
+
+
+# A function that compresses each channel of the given (height, width, channels)
+# pixel array by using codec.compress_plane and returns the list of results.
+# ------------------------------------------------------------------------------
+def compress_planes(codec, pixel_array, parallel=True):
+    height, width, channels = pixel_array.shape
+    workers = channel_workers(parallel, height, width, channels)
+    if not workers:
+        return [codec.compress_plane(pixel_array[..., c]) for c in range(channels)]
+
+    shape = (channels, height, width)
+    shm = shared_memory.SharedMemory(create=True, size=pixel_array.nbytes)
+    try:
+        # copy the channels into contiguous planes in the shared memory
+        planes = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        planes[...] = np.moveaxis(pixel_array, -1, 0)
+        del planes
+        with measure(getattr(codec, 'stats', None), 'parallel'), \
+                WorkerPool(codec, workers, channels) as pool:
+            futures = [pool.submit(compress_plane_task, shm.name, shape, c)
+                       for c in range(channels)]
+            pool.wait(futures, 'channels')
+            results = []
+            for future in futures:
+                result, worker_stats = future.result()
+                add_counts(codec, worker_stats)
+                results.append(result)
+            return results
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# A function that decompresses each channel by using codec.decompress_plane
+# (channel_args contains the arguments for each channel before the image size)
+# and returns the resulting (height, width, channels) pixel array.
+# ------------------------------------------------------------------------------
+def decompress_planes(codec, channel_args, height, width, parallel=True):
+    channels = len(channel_args)
+    workers = channel_workers(parallel, height, width, channels)
+    if not workers:
+        planes = [codec.decompress_plane(*args, height, width) for args in channel_args]
+        return np.dstack(planes)
+
+    shape = (channels, height, width)
+    # the data of the channels is sent to the workers as bytes (a memoryview,
+    # e.g., a slice of a memory-mapped file, cannot be pickled)
+    channel_args = [(bytes(args[0]),) + tuple(args[1:]) for args in channel_args]
+    shm = shared_memory.SharedMemory(create=True, size=channels * height * width)
+    try:
+        with measure(getattr(codec, 'stats', None), 'parallel'), \
+                WorkerPool(codec, workers, channels) as pool:
+            futures = [pool.submit(decompress_plane_task, shm.name, shape, c, args)
+                       for c, args in enumerate(channel_args)]
+            pool.wait(futures, 'channels')
+            for future in futures:
+                add_counts(codec, future.result())
+        planes = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        # interleave the planes into a new (height, width, channels) array
+        pixel_array = np.ascontiguousarray(np.moveaxis(planes, 0, -1))
+        del planes
+        return pixel_array
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# The task run by a worker process to compress one channel (returns the result
+# and the statistics of the worker codec, if any).
+# ------------------------------------------------------------------------------
+def compress_plane_task(codec, shm_name, shape, channel):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        planes = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        result = codec.compress_plane(planes[channel])
+        del planes
+        return result, getattr(codec, 'stats', None)
+    finally:
+        shm.close()
+
+
+# The task run by a worker process to decompress one channel into its plane in
+# the shared memory (returns the statistics of the worker codec, if any).
+# ------------------------------------------------------------------------------
+def decompress_plane_task(codec, shm_name, shape, channel, args):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        planes = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        planes[channel] = codec.decompress_plane(*args, shape[1], shape[2])
+        del planes
+        return getattr(codec, 'stats', None)
+    finally:
+        shm.close()
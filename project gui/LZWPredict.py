@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# The pixel predictors used by the difference coding classes (Level 3 and 5).
+# ------------------------------------------------------------------------------
+# Every pixel x is predicted from its already coded neighbours
+#     c b
+#     a x      (a: left, b: up, c: up-left)
+# and only the residual (x - prediction) mod 256 is compressed. A neighbour
+# outside the image is replaced by the other neighbour that exists (a by b in
+# the first column, b and c by a in the first row, 0 for the first pixel), so
+# 'left' is exactly the predictor of the Level 5 difference image.
+#
+# The predictor can be chosen for each row (as the filter types of PNG): in the
+# 'adaptive' mode every row uses the predictor with the smallest sum of the
+# absolute (signed) residuals. The predictor id of every row is stored in the
+# compressed file, in front of the code stream of the channel, and the code
+# length field of the channel is marked with PREDICTOR_FLAG (see LZWBits).
+import numpy as np
+
+# the predictors (the index of a name is its id in the compressed file)
+PREDICTORS = ('left', 'up', 'average', 'paeth', 'med')
+# the mode that selects the best predictor for each row
+ADAPTIVE = 'adaptive'
+
+
+# A function that returns the neighbours (a, b, c) of the pixels at the given
+# rows and columns (int16 arrays of the same shape) of the given pixel array.
+# ------------------------------------------------------------------------------
+def neighbours(pixels, rows, cols):
+    left = pixels[rows, np.maximum(cols - 1, 0)]
+    up = pixels[np.maximum(rows - 1, 0), cols]
+    up_left = pixels[np.maximum(rows - 1, 0), np.maximum(cols - 1, 0)]
+    first_row, first_col = rows == 0, cols == 0
+    a = np.where(first_col, np.where(first_row, 0, up), left)
+    b = np.where(first_row, a, up)
+    c = np.where(first_row, a, np.where(first_col, b, up_left))
+    return a, b, c
+
+
+# A function that returns the predictions of all the predictors (in the order
+# of PREDICTORS) for the given neighbours.
+# ------------------------------------------------------------------------------
+def predictions(a, b, c):
+    # average
+    average = (a + b) >> 1
+    # Paeth (PNG): the neighbour closest to a + b - c
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+    # MED (LOCO-I / JPEG-LS): the median of a, b and a + b - c
+    low, high = np.minimum(a, b), np.maximum(a, b)
+    med = np.where(c >= high, low, np.where(c <= low, high, p))
+    return a, b, average, paeth, med
+
+
+# A function that computes the residuals of the given (height x width uint8)
+# pixel array with the given predictor (a name in PREDICTORS or ADAPTIVE) and
+# returns the predictor id of each row and the residual array (uint8).
+# ------------------------------------------------------------------------------
+def predict(pixel_array, predictor=ADAPTIVE):
+    pixels = np.asarray(pixel_array, dtype=np.int16)
+    height, width = pixels.shape
+    rows, cols = np.indices((height, width))
+    residuals = [(pixels - prediction).astype(np.uint8)
+                 for prediction in predictions(*neighbours(pixels, rows, cols))]
+
+    if predictor == ADAPTIVE:
+        # the cost of a row is the sum of its residuals as signed values
+        costs = np.stack([np.abs(r.view(np.int8).astype(np.int32)).sum(axis=1)
+                          for r in residuals])
+        ids = np.argmin(costs, axis=0).astype(np.uint8)
+    elif predictor in PREDICTORS:
+        ids = np.full(height, PREDICTORS.index(predictor), dtype=np.uint8)
+    else:
+        raise ValueError(f"Unknown predictor: {predictor}")
+
+    residual = np.choose(ids[:, np.newaxis].astype(np.intp), residuals)
+    return ids, residual
+
+
+# A function that rebuilds the pixel array from the residuals and the predictor
+# id of each row. The pixels on each anti-diagonal (row + column = constant)
+# only depend on the previous diagonals, so they are computed together.
+# ------------------------------------------------------------------------------
+def reconstruct(residual, ids):
+    residual = np.asarray(residual, dtype=np.uint8)
+    ids = np.asarray(ids, dtype=np.intp)
+    height, width = residual.shape
+    if ids.shape != (height,) or (ids >= len(PREDICTORS)).any():
+        raise ValueError("Invalid predictor ids.")
+
+    pixels = np.zeros((height, width), dtype=np.int16)
+    for d in range(height + width - 1):
+        rows = np.arange(max(0, d - width + 1), min(height - 1, d) + 1)
+        cols = d - rows
+        prediction = np.choose(ids[rows], predictions(*neighbours(pixels, rows, cols)))
+        pixels[rows, cols] = (prediction + residual[rows, cols]) & 0xFF
+    return pixels.astype(np.uint8)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# The statistics of a compression or decompression run of a coding class.
+# ------------------------------------------------------------------------------
+# Every file method of the coding classes (Level 1-5) records a RunStats object
+# in codec.stats: the wall time of each stage of the run, the number of the
+# symbols and the codes, the largest dictionary size and the input and output
+# sizes. The stages are
+#   'read'      : reading the input file (and decoding the PNG image)
+#   'transform' : the difference image / the pixel predictors (Level 3 and 5)
+#                 and the color transform or the palette (Level 4 and 5)
+#   'lzw'       : the LZW encoding or decoding
+#   'pack'      : packing (or entropy coding) the codes into bytes ('unpack'
+#                 when decompressing)
+#   'parallel'  : the channels or the tiles processed in worker processes (the
+#                 stages inside the workers are not recorded separately, only
+#                 their counts are added)
+#   'write'     : writing the output file (and encoding the PNG image)
+# A stage that runs several times (e.g., once for each channel) is added up.
+#
+# Two optional measurements can be enabled on the coding object:
+#   trace_memory : the peak memory allocated during each stage (tracemalloc;
+#                  slows the run down noticeably)
+#   profile      : a cProfile profile of the hot stages (lzw, pack, unpack),
+#                  e.g. print(codec.stats.profile_report())
+import contextlib
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+# the stages that are profiled when profiling is enabled
+PROFILED_STAGES = ('lzw', 'pack', 'unpack')
+
+
+# A class that keeps the time and the peak memory of a stage.
+# ------------------------------------------------------------------------------
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        # the largest memory allocated during the stage on top of the memory in
+        # use when it started (None: not traced)
+        self.peak_bytes = None
+
+    def as_dict(self):
+        return {'name': self.name, 'seconds': round(self.seconds, 6),
+                'calls': self.calls, 'peak_bytes': self.peak_bytes}
+
+
+# A class that collects the statistics of a run (see the top of the file).
+# ------------------------------------------------------------------------------
+class RunStats:
+    def __init__(self, codec, operation, trace_memory=False, profile=False):
+        self.codec = codec   # the name of the coding class
+        self.operation = operation   # 'compress' or 'decompress'
+        self.stages = {}   # the StageStats of each stage (in the order of the run)
+        self.symbols = 0   # the number of the symbols (bytes or pixels) coded
+        self.codes = 0   # the number of the LZW codes
+        self.dict_size = 0   # the largest dictionary size
+        self.input_bytes = None
+        self.output_bytes = None
+        self.seconds = None   # the wall time of the whole run
+        self.trace_memory = trace_memory
+        self.peak_bytes = None   # the peak memory of the whole run
+        self.profiler = cProfile.Profile() if profile else None
+        self.started_tracing = False
+        self.start_time = time.perf_counter()
+        if trace_memory:
+            self.started_tracing = not tracemalloc.is_tracing()
+            if self.started_tracing:
+                tracemalloc.start()
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+            self.run_peak = 0
+
+    # A method that returns a context manager that measures the given stage.
+    # --------------------------------------------------------------------------
+    @contextlib.contextmanager
+    def stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats(name)
+        profiler = self.profiler if name in PROFILED_STAGES else None
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.run_peak = max(self.run_peak, peak)
+            tracemalloc.reset_peak()
+        if profiler is not None:
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds += time.perf_counter() - start
+            stage.calls += 1
+            if profiler is not None:
+                profiler.disable()
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.run_peak = max(self.run_peak, peak)
+                stage.peak_bytes = max(stage.peak_bytes or 0, peak - current)
+
+    # A method that adds the counts of a coded plane (or text).
+    # --------------------------------------------------------------------------
+    def count(self, symbols, codes, dict_size):
+        self.symbols += symbols
+        self.codes += codes
+        self.dict_size = max(self.dict_size, dict_size)
+
+    # A method that ends the run with the given input and output sizes.
+    # --------------------------------------------------------------------------
+    def finish(self, input_bytes, output_bytes):
+        self.seconds = time.perf_counter() - self.start_time
+        self.input_bytes = input_bytes
+        self.output_bytes = output_bytes
+        if self.trace_memory:
+            self.run_peak = max(self.run_peak, tracemalloc.get_traced_memory()[1])
+            self.peak_bytes = self.run_peak - self.start_memory
+            if self.started_tracing:
+                tracemalloc.stop()
+                self.started_tracing = False
+        return self
+
+    # A method that returns the profile of the hot stages as text (the given
+    # number of functions sorted by the given key).
+    # --------------------------------------------------------------------------
+    def profile_report(self, limit=20, sort='cumulative'):
+        if self.profiler is None:
+            return ''
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    # A method that returns the statistics as a dictionary (e.g., for JSON).
+    # --------------------------------------------------------------------------
+    def as_dict(self):
+        return {'codec': self.codec, 'operation': self.operation,
+                'seconds': None if self.seconds is None else round(self.seconds, 6),
+                'input_bytes': self.input_bytes, 'output_bytes': self.output_bytes,
+                'symbols': self.symbols, 'codes': self.codes,
+                'dict_size': self.dict_size, 'peak_bytes': self.peak_bytes,
+                'stages': [stage.as_dict() for stage in self.stages.values()]}
+
+    # A method that returns the statistics as a readable table.
+    # --------------------------------------------------------------------------
+    def __str__(self):
+        lines = [f"{self.codec} {self.operation}: {self.seconds or 0:.3f} s, "
+                 f"{self.input_bytes or 0:,d} -> {self.output_bytes or 0:,d} bytes, "
+                 f"{self.symbols:,d} symbols, {self.codes:,d} codes, "
+                 f"dictionary size {self.dict_size:,d}"]
+        for stage in self.stages.values():
+            memory = '' if stage.peak_bytes is None else \
+                f"  peak {stage.peak_bytes / 2 ** 20:8.2f} MiB"
+            lines.append(f"  {stage.name:10s} {stage.seconds:9.4f} s  x{stage.calls}{memory}")
+        return '\n'.join(lines)
+
+
+# A function that returns a context manager that measures the given stage of
+# the given run (nothing is measured when stats is None, e.g., in a worker
+# process).
+# ------------------------------------------------------------------------------
+def measure(stats, name):
+    return contextlib.nullcontext() if stats is None else stats.stage(name)
+
+
+# A function that adds the counts of a coded plane to the given run (if any).
+# ------------------------------------------------------------------------------
+def count(stats, symbols, codes, dict_size):
+    if stats is not None:
+        stats.count(symbols, codes, dict_size)
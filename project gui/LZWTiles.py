@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# The tiled image mode shared by the image coding classes (Level 2-5).
+# ------------------------------------------------------------------------------
+# The image is split into tiles (e.g., 256 x 256 pixels) and every channel of
+# every tile is compressed with its own dictionary, so the tiles can be encoded
+# on different cores and any rectangle of the image can be decoded by reading
+# only the tiles that cover it. The file layout is:
+#   magic 'LZWT' (4 bytes), width (4 bytes), height (4 bytes),
+#   channels (1 byte), tile size (2 bytes),
+#   length of the codec parameters (1 byte), codec parameters,
+#   tile offset table ((number of tiles + 1) x 8 bytes, relative to the start
+#   of the tile data; tile i is stored between offsets i and i + 1),
+#   tile data (the tiles in row-major order)
+# and each tile stores, for every channel, the code length field (2 bytes),
+# the padding (1 byte), the data length (4 bytes) and the data (as the
+# channels of the Level 4 and Level 5 files).
+#
+# The codec object provides compress_plane and decompress_plane for a single
+# channel (see LZWParallel), which are applied to the tiles instead of the
+# whole image. In a container file (see LZWContainer) this layout is the DATA
+# section and the offsets are relative to the start of the section. The tiled
+# data can be read from a file or from memory (a path or a bytes-like source).
+import multiprocessing
+import os
+import struct
+from multiprocessing import shared_memory
+import numpy as np
+from LZWParallel import CHANNEL_HEADER, PARALLEL_MIN_PIXELS, add_counts, \
+    split_channels, WorkerPool
+from LZWContainer import data_offset, is_path, read_at, source_name
+from LZWStats import measure
+
+TILE_MAGIC = b'LZWT'
+TILE_HEADER = struct.Struct('>4sIIBHB')
+TILE_OFFSET = struct.Struct('>Q')
+# the default tile size (in pixels)
+DEFAULT_TILE_SIZE = 256
+
+
+# A function that returns True if the given source (a path or the data) is a
+# tiled image.
+# ------------------------------------------------------------------------------
+def is_tiled_file(source):
+    return bytes(read_at(source, data_offset(source), len(TILE_MAGIC))) == TILE_MAGIC
+
+
+# A function that returns the rectangles (y, x, height, width) of the tiles of
+# an image in row-major order.
+# ------------------------------------------------------------------------------
+def tile_grid(height, width, tile_size):
+    return [(y, x, min(tile_size, height - y), min(tile_size, width - x))
+            for y in range(0, height, tile_size)
+            for x in range(0, width, tile_size)]
+
+
+# A function that decides how many worker processes are used for the given
+# number of pixels and tiles (0: the tiles are processed in this process). A
+# process that is itself a worker of another pool (e.g., of LZWBatch with
+# several jobs) does not start its own workers, so the CPUs are not
+# oversubscribed.
+# ------------------------------------------------------------------------------
+def worker_count(parallel, pixels, num_tiles):
+    cpus = os.cpu_count() or 1
+    if not parallel or cpus < 2 or num_tiles < 2 or pixels < PARALLEL_MIN_PIXELS or \
+            multiprocessing.parent_process() is not None:
+        return 0
+    return min(num_tiles, cpus)
+
+
+# A function that compresses the channels of one tile (a height x width x
+# channels array) and returns the tile data.
+# ------------------------------------------------------------------------------
+def compress_tile(codec, tile):
+    data = []
+    for c in range(tile.shape[2]):
+        byte_array, extra_pad, info, _ = codec.compress_plane(np.ascontiguousarray(tile[..., c]))
+        data.append(CHANNEL_HEADER.pack(info, extra_pad, len(byte_array)))
+        data.append(byte_array)
+    return b''.join(data)
+
+
+# A function that decompresses the given tile data into the given height x
+# width x channels array (or only the given channel into a height x width x 1
+# array; the channels after it are not parsed).
+# ------------------------------------------------------------------------------
+def decompress_tile(codec, data, out, channel=None):
+    height, width, channels = out.shape
+    if channel is not None:
+        args = split_channels(data, 0, channel + 1)[channel]
+        out[..., 0] = codec.decompress_plane(*args, height, width)
+        return
+    for c, args in enumerate(split_channels(data, 0, channels)):
+        out[..., c] = codec.decompress_plane(*args, height, width)
+
+
+# A function that writes the given pixel array (height x width or height x
+# width x channels) to the given file object (e.g., a ContainerWriter) in the
+# tiled layout. params are the codec parameters stored in the header (e.g., an
+# offset).
+# ------------------------------------------------------------------------------
+def write_tiled_file(codec, out_file, pixel_array, tile_size=DEFAULT_TILE_SIZE,
+                     params=b'', parallel=True):
+    if not 0 < tile_size < 1 << 16:
+        raise ValueError(f"Invalid tile size: {tile_size}")
+    if pixel_array.ndim == 2:
+        pixel_array = pixel_array[..., np.newaxis]
+    height, width, channels = pixel_array.shape
+    tiles = tile_grid(height, width, tile_size)
+    workers = worker_count(parallel, height * width, len(tiles))
+    if workers:
+        payloads = compress_tiles_parallel(codec, pixel_array, tiles, workers)
+    else:
+        payloads = [compress_tile(codec, pixel_array[y:y + h, x:x + w])
+                    for y, x, h, w in tiles]
+
+    offsets = np.zeros(len(tiles) + 1, dtype='>u8')
+    offsets[1:] = np.cumsum([len(payload) for payload in payloads])
+    out_file.write(TILE_HEADER.pack(TILE_MAGIC, width, height, channels, tile_size, len(params)))
+    out_file.write(params)
+    out_file.write(offsets.tobytes())
+    for payload in payloads:
+        out_file.write(payload)
+
+
+# A class that reads a tiled image from a file or from memory (a path or a
+# bytes-like source). Only the header and the tile offset table are read when
+# the reader is created; the tiles are read when needed.
+# ------------------------------------------------------------------------------
+class TiledImageReader:
+    def __init__(self, source):
+        self.source = source
+        pos = data_offset(source)
+        header = read_at(source, pos, TILE_HEADER.size)
+        if len(header) < TILE_HEADER.size or bytes(header[:len(TILE_MAGIC)]) != TILE_MAGIC:
+            raise ValueError(f"{source_name(source)} is not a tiled image file.")
+        _, self.width, self.height, self.channels, self.tile_size, params_length = \
+            TILE_HEADER.unpack(header)
+        pos += TILE_HEADER.size
+        self.params = bytes(read_at(source, pos, params_length))
+        pos += params_length
+        self.tiles = tile_grid(self.height, self.width, self.tile_size)
+        table = read_at(source, pos, TILE_OFFSET.size * (len(self.tiles) + 1))
+        self.offsets = np.frombuffer(table, dtype='>u8').astype(np.int64)
+        self.data_start = pos + len(table)
+        self.tiles_per_row = -(-self.width // self.tile_size)
+
+    # A method that returns the code length field of the first channel of the
+    # first tile (the bits that all the channels share, e.g., the color
+    # transform; only the header of the channel is read).
+    # --------------------------------------------------------------------------
+    def first_field(self):
+        start = self.data_start + int(self.offsets[0])
+        return CHANNEL_HEADER.unpack(read_at(self.source, start, CHANNEL_HEADER.size))[0]
+
+    # A method that returns the indices of the tiles that cover the given
+    # rectangle.
+    # --------------------------------------------------------------------------
+    def covering_tiles(self, x, y, w, h):
+        first_row, last_row = y // self.tile_size, (y + h - 1) // self.tile_size
+        first_col, last_col = x // self.tile_size, (x + w - 1) // self.tile_size
+        return [row * self.tiles_per_row + col
+                for row in range(first_row, last_row + 1)
+                for col in range(first_col, last_col + 1)]
+
+    # A method that reads the data of the given tiles (slices of a bytes-like
+    # source, e.g., a memory-mapped file, are not copied).
+    # --------------------------------------------------------------------------
+    def read_tiles(self, indices):
+        ranges = [(self.data_start + int(self.offsets[i]),
+                   int(self.offsets[i + 1] - self.offsets[i])) for i in indices]
+        if not is_path(self.source):
+            return [read_at(self.source, start, length) for start, length in ranges]
+        payloads = []
+        with open(self.source, 'rb') as f:
+            for start, length in ranges:
+                f.seek(start)
+                payloads.append(f.read(length))
+        return payloads
+
+    # A method that decodes the pixels of the given rectangle by using the
+    # given codec and returns them as an h x w (or h x w x channels) array
+    # (only the given channel as an h x w array if channel is not None).
+    # --------------------------------------------------------------------------
+    def decode_region(self, codec, x, y, w, h, parallel=True, channel=None):
+        if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > self.width or y + h > self.height:
+            raise ValueError(f"Region ({x}, {y}, {w}, {h}) is outside the "
+                             f"{self.width} x {self.height} image.")
+        indices = self.covering_tiles(x, y, w, h)
+        # the rectangle covered by the tiles (the region is cropped from it)
+        top, left = self.tiles[indices[0]][:2]
+        bottom = self.tiles[indices[-1]][0] + self.tiles[indices[-1]][2]
+        right = self.tiles[indices[-1]][1] + self.tiles[indices[-1]][3]
+        channels = self.channels if channel is None else 1
+        shape = (bottom - top, right - left, channels)
+        tiles = [(ty - top, tx - left, th, tw) for ty, tx, th, tw in
+                 (self.tiles[i] for i in indices)]
+        payloads = self.read_tiles(indices)
+
+        workers = worker_count(parallel, shape[0] * shape[1], len(tiles))
+        if workers:
+            region = decompress_tiles_parallel(codec, payloads, tiles, shape, workers,
+                                               channel)
+        else:
+            region = np.empty(shape, dtype=np.uint8)
+            for (ty, tx, th, tw), payload in zip(tiles, payloads):
+                decompress_tile(codec, payload, region[ty:ty + th, tx:tx + tw], channel)
+        region = region[y - top:y - top + h, x - left:x - left + w]
+        return region[..., 0] if channels == 1 else region
+
+    # A method that decodes the whole image (or only the given channel).
+    # --------------------------------------------------------------------------
+    def decode_image(self, codec, parallel=True, channel=None):
+        return self.decode_region(codec, 0, 0, self.width, self.height, parallel, channel)
+
+
+# A function that compresses the given tiles in worker processes that read the
+# pixels from shared memory.
+# ------------------------------------------------------------------------------
+def compress_tiles_parallel(codec, pixel_array, tiles, workers):
+    shm = shared_memory.SharedMemory(create=True, size=pixel_array.nbytes)
+    try:
+        shared = np.ndarray(pixel_array.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[...] = pixel_array
+        del shared
+        channels = pixel_array.shape[2]
+        with measure(getattr(codec, 'stats', None), 'parallel'), \
+                WorkerPool(codec, workers, len(tiles) * channels) as pool:
+            futures = [pool.submit(compress_tile_task, shm.name, pixel_array.shape, tile)
+                       for tile in tiles]
+            pool.wait(futures, 'tiles')
+            payloads = []
+            for future in futures:
+                payload, worker_stats = future.result()
+                add_counts(codec, worker_stats)
+                payloads.append(payload)
+            return payloads
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# A function that decompresses the given tiles (or only the given channel of
+# them) in worker processes that write the pixels into shared memory and
+# returns the resulting array.
+# ------------------------------------------------------------------------------
+def decompress_tiles_parallel(codec, payloads, tiles, shape, workers, channel=None):
+    shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1] * shape[2])
+    try:
+        with measure(getattr(codec, 'stats', None), 'parallel'), \
+                WorkerPool(codec, workers, len(tiles) * shape[2]) as pool:
+            # (a memoryview cannot be pickled, so the tiles are sent as bytes)
+            futures = [pool.submit(decompress_tile_task, shm.name, shape, tile,
+                                   bytes(payload), channel)
+                       for tile, payload in zip(tiles, payloads)]
+            pool.wait(futures, 'tiles')
+            for future in futures:
+                add_counts(codec, future.result())
+        shared = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        region = shared.copy()
+        del shared
+        return region
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# The task run by a worker process to compress one tile (returns the tile data
+# and the statistics of the worker codec, if any).
+# ------------------------------------------------------------------------------
+def compress_tile_task(codec, shm_name, shape, tile):
+    y, x, h, w = tile
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        data = compress_tile(codec, pixels[y:y + h, x:x + w])
+        del pixels
+        return data, getattr(codec, 'stats', None)
+    finally:
+        shm.close()
+
+
+# The task run by a worker process to decompress one tile into shared memory
+# (returns the statistics of the worker codec, if any).
+# ------------------------------------------------------------------------------
+def decompress_tile_task(codec, shm_name, shape, tile, data, channel=None):
+    y, x, h, w = tile
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        decompress_tile(codec, data, pixels[y:y + h, x:x + w], channel)
+        del pixels
+        return getattr(codec, 'stats', None)
+    finally:
+        shm.close()
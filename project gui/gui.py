@@ -1,312 +1,249 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+from tkinter import filedialog, messagebox, scrolledtext, ttk
 import os
-import shutil
-from PIL import Image
-
-# Ana pencere oluşturma
-root = tk.Tk()
-root.title("LZW Compression GUI")
-
-# ------------------ DOSYA SEÇME ALANI ------------------
-file_frame = tk.Frame(root)
-file_frame.pack(pady=10)
-
-tk.Label(file_frame, text="Input File:").pack(side=tk.LEFT)
-
-file_entry = tk.Entry(file_frame, width=50)
-file_entry.pack(side=tk.LEFT, padx=5)
-
-def browse_file():
-    """Dosya seçme fonksiyonu (Browse butonuyla çağrılır)."""
-    filepath = filedialog.askopenfilename(filetypes=[("All Files", "*.*")])
-    if filepath:
-        file_entry.delete(0, tk.END)
-        file_entry.insert(0, filepath)
-
-tk.Button(file_frame, text="Browse", command=browse_file).pack(side=tk.LEFT)
-
-# ------------------ METOD SEÇİMİ (Level 1-5) ------------------
-method_var = tk.StringVar(root)
-method_var.set("Text Compression (Level 1)")
-
-method_options = [
-    "Text Compression (Level 1)",
-    "Gray Level Image Compression (Level 2)",
-    "Gray Level Difference Compression (Level 3)",
-    "Color Image Compression (Level 4)",
-    "Color Differences Compression (Level 5)"
-]
-
-tk.Label(root, text="Select Compression Method:").pack()
-method_menu = tk.OptionMenu(root, method_var, *method_options)
-method_menu.pack(pady=5)
-
-# ------------------ BUTONLAR (Compress / Decompress) ------------------
-button_frame = tk.Frame(root)
-button_frame.pack(pady=10)
-
-# ------------------ ÇIKTI ALANI (ScrolledText) ------------------
-output_text = scrolledtext.ScrolledText(root, width=80, height=20)
-output_text.pack(pady=10)
-
-# Çıktılar için klasörleri hazırla
-project_dir = os.path.dirname(os.path.abspath(__file__))
-compressed_dir = os.path.join(project_dir, "compressed")
-decompressed_dir = os.path.join(project_dir, "decompressed")
-os.makedirs(compressed_dir, exist_ok=True)
-os.makedirs(decompressed_dir, exist_ok=True)
-
-def compress_file():
-    """Seçili yöntem ve dosya için sıkıştırma işlemini yapan fonksiyon."""
-    filepath = file_entry.get()
-    if not filepath:
-        messagebox.showerror("Error", "Please select an input file!")
-        return
-
-    method = method_var.get()
-    base_name = os.path.splitext(os.path.basename(filepath))[0]
-    ext = os.path.splitext(filepath)[1].lower()
-    file_dir = os.path.dirname(filepath)
-
-    output_text.insert(tk.END, f"[INFO] Compressing '{filepath}' with '{method}'\n")
-    try:
-        if method == "Text Compression (Level 1)":
-            # Girdi metnini proje dizinine .txt uzantısıyla kopyala (gerekiyorsa)
-            dest_input = filepath
-            if ext != ".txt" or file_dir != project_dir:
-                dest_input = os.path.join(project_dir, base_name + ".txt")
-                shutil.copy(filepath, dest_input)
-            from LZW import LZWCoding
-            compressor = LZWCoding(base_name, "text")
-            out_path = compressor.compress_text_file()
-            # Sıkıştırılmış dosyayı 'compressed' klasörüne taşı
-            if out_path and os.path.exists(out_path):
-                final_path = os.path.join(compressed_dir, os.path.basename(out_path))
-                shutil.move(out_path, final_path)
-                out_path = final_path
-            else:
-                raise FileNotFoundError("Compressed output not found.")
-            # Geçici kopyalanan dosyayı sil
-            if dest_input != filepath and os.path.exists(dest_input):
-                os.remove(dest_input)
-
-        elif method == "Gray Level Image Compression (Level 2)":
-            # Gri seviye görüntüyü proje dizinine .png olarak kopyala/dönüştür
-            dest_input = filepath
-            if ext != ".png" or file_dir != project_dir:
-                dest_input = os.path.join(project_dir, base_name + ".png")
-                try:
-                    img = Image.open(filepath)
-                    img = img.convert('L')  # Gri formata çevir
-                    img.save(dest_input)
-                    img.close()
-                except Exception as e:
-                    raise RuntimeError(f"Failed to prepare image for compression: {e}")
-            from LZWImage import LZWImageCoding
-            compressor = LZWImageCoding(base_name, "image")
-            out_path = compressor.compress_image_file()
-            if out_path and os.path.exists(out_path):
-                final_path = os.path.join(compressed_dir, os.path.basename(out_path))
-                shutil.move(out_path, final_path)
-                out_path = final_path
-            else:
-                raise FileNotFoundError("Compressed output not found.")
-            if dest_input != filepath and os.path.exists(dest_input):
-                os.remove(dest_input)
-
-        elif method == "Gray Level Difference Compression (Level 3)":
-            # Gri seviye fark görüntüsünü proje dizinine .png olarak hazırla
-            dest_input = filepath
-            if ext != ".png" or file_dir != project_dir:
-                dest_input = os.path.join(project_dir, base_name + ".png")
-                try:
-                    img = Image.open(filepath)
-                    img = img.convert('L')
-                    img.save(dest_input)
-                    img.close()
-                except Exception as e:
-                    raise RuntimeError(f"Failed to prepare image for compression: {e}")
-            from LZWImageDiff import LZWImageDiffCoding
-            compressor = LZWImageDiffCoding(base_name, "image")
-            out_path = compressor.compress_image_file()
-            if out_path and os.path.exists(out_path):
-                final_path = os.path.join(compressed_dir, os.path.basename(out_path))
-                shutil.move(out_path, final_path)
-                out_path = final_path
-            else:
-                raise FileNotFoundError("Compressed output not found.")
-            if dest_input != filepath and os.path.exists(dest_input):
-                os.remove(dest_input)
-
-        elif method == "Color Image Compression (Level 4)":
-            # Renkli görüntüyü proje dizinine .png (RGB) olarak hazırla
-            dest_input = filepath
-            actual_base = base_name  # Sınıfa verilecek dosya adı gövdesi
-            if ext != ".png" or file_dir != project_dir:
-                dest_input = os.path.join(project_dir, base_name + ".png")
-                try:
-                    img = Image.open(filepath)
-                    img = img.convert('RGB')
-                    img.save(dest_input)
-                    img.close()
-                except Exception as e:
-                    raise RuntimeError(f"Failed to prepare image for compression: {e}")
-            else:
-                # Dosya zaten .png ise, 3 kanallı olduğundan emin ol
-                img = Image.open(filepath)
-                if img.mode != 'RGB':
-                    dest_input = os.path.join(project_dir, base_name + "_rgb.png")
-                    img = img.convert('RGB')
-                    img.save(dest_input)
-                    actual_base = base_name + "_rgb"
-                img.close()
-            from LZWColor import LZWColorCoding
-            compressor = LZWColorCoding(actual_base, "image")
-            out_path = compressor.compress_image_file()
-            # Eğer çıktı yolu dönmediyse veya dosya yoksa tahmin et
-            if not out_path or not os.path.exists(out_path):
-                guess_path = os.path.join(project_dir, actual_base + ".bin")
-                if os.path.exists(guess_path):
-                    out_path = guess_path
-                else:
-                    raise FileNotFoundError("Compressed output not found.")
-            # Sıkıştırılmış dosyayı 'compressed' klasörüne taşı
-            final_path = os.path.join(compressed_dir, os.path.basename(out_path))
-            shutil.move(out_path, final_path)
-            out_path = final_path
-            if dest_input != filepath and os.path.exists(dest_input):
-                os.remove(dest_input)
-
-        elif method == "Color Differences Compression (Level 5)":
-            # Renkli 2D fark görüntüsünü proje dizinine .png (RGB) olarak hazırla
-            dest_input = filepath
-            actual_base = base_name
-            if ext != ".png" or file_dir != project_dir:
-                dest_input = os.path.join(project_dir, base_name + ".png")
-                try:
-                    img = Image.open(filepath)
-                    img = img.convert('RGB')
-                    img.save(dest_input)
-                    img.close()
-                except Exception as e:
-                    raise RuntimeError(f"Failed to prepare image for compression: {e}")
-            else:
-                img = Image.open(filepath)
-                if img.mode != 'RGB':
-                    dest_input = os.path.join(project_dir, base_name + "_rgb.png")
-                    img = img.convert('RGB')
-                    img.save(dest_input)
-                    actual_base = base_name + "_rgb"
-                img.close()
-            from LZWColor2DDiff import LZWColor2DDiffCoding
-            compressor = LZWColor2DDiffCoding(actual_base, "image")
-            out_path = compressor.compress_image_file()
-            # Eğer çıktı yolu dönmediyse veya dosya yoksa tahmin et
-            if not out_path or not os.path.exists(out_path):
-                guess_path = os.path.join(project_dir, actual_base + ".bin")
-                if os.path.exists(guess_path):
-                    out_path = guess_path
-                else:
-                    raise FileNotFoundError("Compressed output not found.")
-            # Sıkıştırılmış dosyayı 'compressed' klasörüne taşı
-            final_path = os.path.join(compressed_dir, os.path.basename(out_path))
-            shutil.move(out_path, final_path)
-            out_path = final_path
-            if dest_input != filepath and os.path.exists(dest_input):
-                os.remove(dest_input)
+import queue
+import threading
+from LZWCore import Cancelled
+
+# Paralel sıkıştırmada (LZWParallel) işçi süreçler, spawn yönteminde bu dosyayı
+# yeniden içe aktarır; arayüz yalnızca doğrudan çalıştırıldığında oluşturulur
+if __name__ == "__main__":
+    # Ana pencere oluşturma
+    root = tk.Tk()
+    root.title("LZW Compression GUI")
+
+    # ------------------ DOSYA SEÇME ALANI ------------------
+    file_frame = tk.Frame(root)
+    file_frame.pack(pady=10)
+
+    tk.Label(file_frame, text="Input File:").pack(side=tk.LEFT)
+
+    file_entry = tk.Entry(file_frame, width=50)
+    file_entry.pack(side=tk.LEFT, padx=5)
+
+    def browse_file():
+        """Dosya seçme fonksiyonu (Browse butonuyla çağrılır)."""
+        filepath = filedialog.askopenfilename(filetypes=[("All Files", "*.*")])
+        if filepath:
+            file_entry.delete(0, tk.END)
+            file_entry.insert(0, filepath)
+
+    tk.Button(file_frame, text="Browse", command=browse_file).pack(side=tk.LEFT)
+
+    # ------------------ METOD SEÇİMİ (Level 1-5) ------------------
+    method_var = tk.StringVar(root)
+    method_var.set("Text Compression (Level 1)")
+
+    method_options = [
+        "Text Compression (Level 1)",
+        "Gray Level Image Compression (Level 2)",
+        "Gray Level Difference Compression (Level 3)",
+        "Color Image Compression (Level 4)",
+        "Color Differences Compression (Level 5)"
+    ]
+
+    tk.Label(root, text="Select Compression Method:").pack()
+    method_menu = tk.OptionMenu(root, method_var, *method_options)
+    method_menu.pack(pady=5)
+
+    # ------------------ BUTONLAR (Compress / Decompress) ------------------
+    button_frame = tk.Frame(root)
+    button_frame.pack(pady=10)
+
+    # ------------------ ÇIKTI ALANI (ScrolledText) ------------------
+    output_text = scrolledtext.ScrolledText(root, width=80, height=20)
+    output_text.pack(pady=10)
+
+    # ------------------ İLERLEME ALANI (Progress / Cancel) ------------------
+    progress_frame = tk.Frame(root)
+    progress_frame.pack(pady=5)
+
+    progress_bar = ttk.Progressbar(progress_frame, length=400, mode="determinate", maximum=100)
+    progress_bar.pack(side=tk.LEFT, padx=5)
+
+    status_var = tk.StringVar(root, value="Idle")
+    tk.Label(root, textvariable=status_var).pack(pady=(0, 10))
+
+    # Çıktılar için klasörleri hazırla
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    compressed_dir = os.path.join(project_dir, "compressed")
+    decompressed_dir = os.path.join(project_dir, "decompressed")
+    os.makedirs(compressed_dir, exist_ok=True)
+    os.makedirs(decompressed_dir, exist_ok=True)
+
+    # İşler arka planda tek bir işçi thread'de sırayla çalışır, böylece pencere
+    # donmaz ve bir iş çalışırken yenileri kuyruğa eklenebilir. İşçi thread Tk
+    # nesnelerine dokunmaz; mesajlarını events kuyruğuna koyar ve ana thread bu
+    # kuyruğu root.after ile düzenli olarak okur.
+    jobs = queue.Queue()              # bekleyen işler: (kind, filepath, method)
+    events = queue.Queue()            # işçi thread'den arayüze gelen mesajlar
+    cancel_event = threading.Event()  # çalışan işin iptal isteği
+    job_state = {"pending": 0}        # kuyrukta bekleyen + çalışan iş sayısı
+
+    def log(text):
+        """Çıktı alanına yazılacak metni (işçi thread'den) gönderir."""
+        events.put(("log", text))
+
+    # Yöntem adı -> seviye (kapsayıcıdaki kodek numarası, bkz. LZWContainer)
+    method_levels = {name: level for level, name in enumerate(method_options, 1)}
+
+    def run_compress(filepath, method, progress):
+        """Seçili yöntem ve dosya için sıkıştırma işlemini yapan fonksiyon.
+        İşçi thread'de çalışır ve sıkıştırılmış dosyanın yolunu döndürür.
+        Girdi bulunduğu yerden okunur (görüntüler gri/RGB'ye bellekte
+        dönüştürülür) ve çıktı doğrudan 'compressed' klasörüne yazılır."""
+        base_name = os.path.splitext(os.path.basename(filepath))[0]
+        log(f"[INFO] Compressing '{filepath}' with '{method}'\n")
+        if method not in method_levels:
+            raise ValueError(f"Unknown method: {method}")
+        from LZWContainer import TEXT, codec_class
+        level = method_levels[method]
+        out_path = os.path.join(compressed_dir, base_name + ".bin")
+        if level == TEXT:
+            # 'binary' modu dosyayı bayt bayt okur (UTF-8 ve ikili dosyalar kayıpsız)
+            compressor = codec_class(TEXT)(base_name, "binary", progress=progress)
+            result = compressor.compress_text_file(filepath, out_path)
+        else:
+            compressor = codec_class(level)(base_name, "image", progress=progress)
+            result = compressor.compress_image_file(filepath, out_path)
+        # Kodlayıcılar bir şey yazdırmaz; işlemin ayrıntıları (boyutlar, aşama
+        # süreleri, kod sayıları) istatistiklerden alınır (bkz. LZWStats)
+        log(f"{compressor.stats}\n")
+        return result
+
+    def run_decompress(filepath, method, progress):
+        """Seçili yöntem ve dosya için açma (decompression) işlemini yapan fonksiyon.
+        İşçi thread'de çalışır ve açılmış dosyanın yolunu döndürür; çıktı
+        doğrudan 'decompressed' klasörüne yazılır."""
+        base_name = os.path.splitext(os.path.basename(filepath))[0]
+        log(f"[INFO] Decompressing '{filepath}' with '{method}'\n")
+
+        # Kapsayıcı (LZWC) dosyalarda seviye dosyanın başlığından okunur;
+        # seçilen yöntem yalnızca eski biçimdeki dosyalar için kullanılır
+        from LZWContainer import TEXT, CODEC_NAMES, codec_class, detect_codec, open_codec
+        codec_id = detect_codec(filepath)
+        if codec_id is not None:
+            log(f"[INFO] Detected codec: {CODEC_NAMES.get(codec_id, codec_id)}\n")
+            decompressor = open_codec(base_name, filepath)
+        elif method in method_levels:
+            level = method_levels[method]
+            decompressor = codec_class(level)(base_name, "binary" if level == TEXT else "image")
+        else:
+            raise ValueError(f"Unknown method: {method}")
 
+        decompressor.progress = progress
+        if isinstance(decompressor, codec_class(TEXT)):
+            out_path = os.path.join(decompressed_dir, base_name + "_decompressed.txt")
+            result = decompressor.decompress_text_file(filepath, out_path)
         else:
-            messagebox.showerror("Error", f"Unknown method: {method}")
+            out_path = os.path.join(decompressed_dir, base_name + "_decompressed.png")
+            result = decompressor.decompress_image_file(filepath, out_path)
+        log(f"{decompressor.stats}\n")
+        return result
+
+    def worker():
+        """Kuyruktaki işleri sırayla çalıştıran işçi thread."""
+        while True:
+            kind, filepath, method = jobs.get()
+            cancel_event.clear()
+            events.put(("start", kind, filepath))
+
+            def progress(stage, done, total):
+                # Kodlayıcılar bu fonksiyonu düzenli aralıklarla çağırır; iptal
+                # istenmişse iş Cancelled istisnasıyla durdurulur
+                if cancel_event.is_set():
+                    raise Cancelled()
+                events.put(("progress", stage, done, total))
+
+            try:
+                run = run_compress if kind == "Compression" else run_decompress
+                events.put(("done", kind, run(filepath, method, progress)))
+            except Cancelled:
+                events.put(("cancelled", kind, filepath))
+            except Exception as e:
+                events.put(("error", kind, e))
+
+    def poll_events():
+        """İşçi thread'in mesajlarını ana thread'de arayüze yansıtır."""
+        try:
+            while True:
+                event = events.get_nowait()
+                if event[0] == "log":
+                    output_text.insert(tk.END, event[1])
+                elif event[0] == "start":
+                    progress_bar["value"] = 0
+                    status_var.set(f"{event[1]}: {os.path.basename(event[2])}")
+                    cancel_button.config(state=tk.NORMAL)
+                elif event[0] == "progress":
+                    _, stage, done, total = event
+                    progress_bar["value"] = 100 * done / total if total else 100
+                    status_var.set(f"{stage.capitalize()}: {done:,d} / {total:,d}"
+                                   f" (jobs left: {job_state['pending']})")
+                else:
+                    job_state["pending"] -= 1
+                    kind = event[1]
+                    if event[0] == "done":
+                        progress_bar["value"] = 100
+                        output_text.insert(tk.END, f"{kind} complete!\nOutput: {event[2]}\n\n")
+                    elif event[0] == "cancelled":
+                        progress_bar["value"] = 0
+                        output_text.insert(tk.END, f"[INFO] {kind} cancelled: {event[2]}\n\n")
+                    else:
+                        progress_bar["value"] = 0
+                        output_text.insert(tk.END, f"[ERROR] {kind} failed: {event[2]}\n\n")
+                        messagebox.showerror(f"{kind} Error", str(event[2]))
+                    output_text.see(tk.END)
+                    if job_state["pending"] == 0:
+                        status_var.set("Idle")
+                        cancel_button.config(state=tk.DISABLED)
+                    else:
+                        status_var.set(f"Jobs left: {job_state['pending']}")
+        except queue.Empty:
+            pass
+        root.after(100, poll_events)
+
+    def submit_job(kind, filepath, method):
+        """Yeni bir işi kuyruğa ekler (çalışan iş bitince sırası gelir)."""
+        job_state["pending"] += 1
+        jobs.put((kind, filepath, method))
+        if job_state["pending"] > 1:
+            output_text.insert(tk.END, f"[INFO] Queued: {os.path.basename(filepath)} "
+                                       f"({job_state['pending'] - 1} job(s) ahead)\n")
+
+    def compress_file():
+        """Compress butonu: seçili dosyayı sıkıştırma kuyruğuna ekler."""
+        filepath = file_entry.get()
+        if not filepath:
+            messagebox.showerror("Error", "Please select an input file!")
             return
+        submit_job("Compression", filepath, method_var.get())
 
-        output_text.insert(tk.END, f"Compression complete!\nOutput: {out_path}\n\n")
-    except Exception as e:
-        messagebox.showerror("Compression Error", str(e))
-        output_text.insert(tk.END, f"[ERROR] Compression failed: {e}\n\n")
-
-def decompress_file():
-    """Seçili yöntem ve dosya için açma (decompression) işlemini yapan fonksiyon."""
-    filepath = file_entry.get()
-    if not filepath:
-        messagebox.showerror("Error", "Please select an input file!")
-        return
-
-    method = method_var.get()
-    base_name = os.path.splitext(os.path.basename(filepath))[0]
-    ext = os.path.splitext(filepath)[1].lower()
-    file_dir = os.path.dirname(filepath)
-
-    output_text.insert(tk.END, f"[INFO] Decompressing '{filepath}' with '{method}'\n")
-
-    # Yalnızca .bin dosyaları açabiliriz, uzantıyı kontrol et
-    if ext != ".bin":
-        messagebox.showerror("Error", "Please select a .bin file for decompression!")
-        return
-
-    try:
-        # .bin dosyasını proje dizinine kopyala (gerekiyorsa)
-        temp_bin_path = None
-        if file_dir != project_dir:
-            temp_bin_path = os.path.join(project_dir, os.path.basename(filepath))
-            shutil.copy(filepath, temp_bin_path)
-        # Seçilen seviyeye göre uygun LZW sınıfını kullanarak açma
-        if method == "Text Compression (Level 1)":
-            from LZW import LZWCoding
-            decompressor = LZWCoding(base_name, "text")
-            out_path = decompressor.decompress_text_file()
-        elif method == "Gray Level Image Compression (Level 2)":
-            from LZWImage import LZWImageCoding
-            decompressor = LZWImageCoding(base_name, "image")
-            out_path = decompressor.decompress_image_file()
-        elif method == "Gray Level Difference Compression (Level 3)":
-            from LZWImageDiff import LZWImageDiffCoding
-            decompressor = LZWImageDiffCoding(base_name, "image")
-            out_path = decompressor.decompress_image_file()
-        elif method == "Color Image Compression (Level 4)":
-            from LZWColor import LZWColorCoding
-            decompressor = LZWColorCoding(base_name, "image")
-            out_path = decompressor.decompress_image_file()
-        elif method == "Color Differences Compression (Level 5)":
-            from LZWColor2DDiff import LZWColor2DDiffCoding
-            decompressor = LZWColor2DDiffCoding(base_name, "image")
-            out_path = decompressor.decompress_image_file()
-        else:
-            messagebox.showerror("Error", f"Unknown method: {method}")
-            # Temizle ve çık
-            if temp_bin_path and os.path.exists(temp_bin_path):
-                os.remove(temp_bin_path)
+    def decompress_file():
+        """Decompress butonu: seçili .bin dosyasını açma kuyruğuna ekler."""
+        filepath = file_entry.get()
+        if not filepath:
+            messagebox.showerror("Error", "Please select an input file!")
+            return
+        # Yalnızca .bin dosyaları açabiliriz, uzantıyı kontrol et
+        if os.path.splitext(filepath)[1].lower() != ".bin":
+            messagebox.showerror("Error", "Please select a .bin file for decompression!")
             return
+        submit_job("Decompression", filepath, method_var.get())
+
+    def cancel_job():
+        """Cancel butonu: çalışan işi durdurur (kuyruktaki işler devam eder)."""
+        cancel_event.set()
+        status_var.set("Cancelling...")
+
+    # Compress / Decompress / Cancel butonlarını oluştur ve yerleştir
+    tk.Button(button_frame, text="Compress", command=compress_file).pack(side=tk.LEFT, padx=10)
+    tk.Button(button_frame, text="Decompress", command=decompress_file).pack(side=tk.LEFT, padx=10)
+    cancel_button = tk.Button(progress_frame, text="Cancel", command=cancel_job, state=tk.DISABLED)
+    cancel_button.pack(side=tk.LEFT, padx=5)
+
+    # İşçi thread'i başlat ve mesaj kuyruğunu okumaya başla
+    threading.Thread(target=worker, daemon=True).start()
+    root.after(100, poll_events)
 
-        # Sınıfın döndürdüğü çıktı yoksa (renkli sıkıştırmalarda None dönüyordu), tahmin et
-        if not out_path or not os.path.exists(out_path):
-            expected_ext = ".txt" if method.startswith("Text") else ".png"
-            guess_path = os.path.join(project_dir, base_name + "_decompressed" + expected_ext)
-            if os.path.exists(guess_path):
-                out_path = guess_path
-            else:
-                raise FileNotFoundError("Decompressed output file not found.")
-
-        # Açılmış dosyayı 'decompressed' klasörüne taşı
-        final_path = os.path.join(decompressed_dir, os.path.basename(out_path))
-        shutil.move(out_path, final_path)
-        out_path = final_path
-
-        # Geçici kopyalanan .bin dosyasını sil
-        if temp_bin_path and os.path.exists(temp_bin_path):
-            os.remove(temp_bin_path)
-
-        output_text.insert(tk.END, f"Decompression complete!\nOutput: {out_path}\n\n")
-    except Exception as e:
-        messagebox.showerror("Decompression Error", str(e))
-        output_text.insert(tk.END, f"[ERROR] Decompression failed: {e}\n\n")
-        # Hata durumunda geçici dosya kalmışsa sil
-        if 'temp_bin_path' in locals() and temp_bin_path and os.path.exists(temp_bin_path):
-            os.remove(temp_bin_path)
-
-# Compress / Decompress butonlarını oluştur ve yerleştir
-tk.Button(button_frame, text="Compress", command=compress_file).pack(side=tk.LEFT, padx=10)
-tk.Button(button_frame, text="Decompress", command=decompress_file).pack(side=tk.LEFT, padx=10)
-
-# Tkinter döngüsünü başlat
-root.mainloop()
+    # Tkinter döngüsünü başlat
+    root.mainloop()
@@ -0,0 +1,45 @@
+# The shared fixtures of the tests (run from the repository root or from
+# 'project gui', e.g. python -m pytest -q "project gui/tests").
+# ------------------------------------------------------------------------------
+# The modules of the coding classes import each other by name, so their
+# directory is added to the module search path. The inputs are small (a part of
+# lena_color.png, a part of sample.txt and synthetic images), so the pure Python
+# LZW loops stay fast.
+import os
+import sys
+import numpy as np
+import pytest
+from PIL import Image
+
+SOURCE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+
+@pytest.fixture(scope='session')
+def sample_text():
+    with open(os.path.join(SOURCE_DIRECTORY, 'sample.txt'), encoding='latin-1') as f:
+        return f.read()[:20000]
+
+
+@pytest.fixture(scope='session')
+def rgb_image():
+    lena = Image.open(os.path.join(SOURCE_DIRECTORY, 'lena_color.png')).convert('RGB')
+    return np.array(lena)[40:140, 50:170]
+
+
+@pytest.fixture(scope='session')
+def gray_image(rgb_image):
+    return np.array(Image.fromarray(rgb_image).convert('L'))
+
+
+# A fixture that returns a function that makes a random height x width
+# (x channels) image with a few levels, so it has long repeated runs and
+# is still different everywhere.
+# ------------------------------------------------------------------------------
+@pytest.fixture
+def make_image():
+    def make(height, width, channels=None, seed=1):
+        rng = np.random.default_rng(seed)
+        shape = (height, width) if channels is None else (height, width, channels)
+        return (rng.integers(0, 6, shape) * 40).astype(np.uint8)
+    return make
@@ -0,0 +1,79 @@
+# The tests of the blocked text mode (LZWBlocks): the round trips and the
+# random access by byte range and by line.
+import pytest
+import LZWApi
+from LZW import LZWCoding
+from LZWBlocks import BlockedTextReader, is_blocked_file
+from LZWContainer import FLAG_BLOCKED, read_info
+
+BLOCK_SIZE = 1000
+
+
+@pytest.fixture(scope='module')
+def lines():
+    return [f"{i:05d} value={i * 37 % 1009} {'x' * (i % 50)}\n".encode() for i in range(600)]
+
+
+@pytest.fixture(scope='module')
+def blocked(lines):
+    raw = b''.join(lines)
+    return raw, LZWApi.compress(raw, block_size=BLOCK_SIZE)
+
+
+def test_round_trip(blocked):
+    raw, data = blocked
+    assert is_blocked_file(data) and read_info(data).flags & FLAG_BLOCKED
+    assert BlockedTextReader(data).num_blocks == -(-len(raw) // BLOCK_SIZE)
+    assert LZWApi.decompress(data) == raw
+
+
+@pytest.mark.parametrize('text', ['', 'a', 'x' * BLOCK_SIZE, 'x' * (BLOCK_SIZE + 1)])
+def test_block_boundaries(text):
+    data = LZWApi.compress(text, block_size=BLOCK_SIZE)
+    assert LZWApi.decompress(data) == text
+
+
+@pytest.mark.parametrize('start, length', [(0, 0), (0, 1), (0, 10 ** 9), (999, 2),
+                                           (1500, 3000), (12345, 1), (10 ** 9, 5)])
+def test_read_range(blocked, start, length):
+    raw, data = blocked
+    codec = LZWCoding('memory', 'binary')
+    assert codec.read_range(start, length, data) == raw[start:start + length]
+
+
+def test_read_range_decodes_only_the_covering_blocks(blocked):
+    raw, data = blocked
+    codec = LZWCoding('memory', 'binary')
+    codec.read_range(2500, 100, data)
+    assert codec.stats.output_bytes == 100
+    assert codec.stats.symbols == BLOCK_SIZE
+
+
+@pytest.mark.parametrize('first, last', [(0, 0), (0, 1), (5, 6), (100, 250), (599, 600),
+                                         (0, 600), (590, 1000), (700, 800), (10, 5)])
+def test_read_lines(blocked, lines, first, last):
+    _, data = blocked
+    codec = LZWCoding('memory', 'binary')
+    assert codec.read_lines(first, last, data) == b''.join(lines[first:last])
+
+
+def test_read_from_file(tmp_path, blocked, lines):
+    raw, data = blocked
+    path = tmp_path / 'blocked.bin'
+    path.write_bytes(data)
+    codec = LZWCoding('blocked', 'text')
+    assert codec.read_lines(3, 7, str(path)) == b''.join(lines[3:7]).decode()
+    assert codec.read_range(10, 20, str(path)) == raw[10:30].decode()
+
+
+def test_invalid_arguments(blocked, sample_text):
+    _, data = blocked
+    codec = LZWCoding('memory', 'binary')
+    with pytest.raises(ValueError):
+        codec.read_range(-1, 5, data)
+    with pytest.raises(ValueError):
+        codec.read_lines(-1, 5, data)
+    with pytest.raises(ValueError):
+        codec.read_range(0, 5, LZWApi.compress(sample_text))
+    with pytest.raises(ValueError):
+        LZWCoding('memory', 'binary', block_size=0)
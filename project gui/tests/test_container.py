@@ -0,0 +1,116 @@
+# The tests of the container format (LZWContainer): the header, the codec id,
+# the checksums of the header and of the sections, the truncated files and the
+# files written without the container.
+import pytest
+import LZWApi
+from LZWContainer import DATA, HEAD, HEADER, HEADER_CRC, IMAGE, MAGIC, SECTION, TEXT, \
+    VERSION, FLAG_VARIABLE_WIDTH, ContainerWriter, data_offset, decompress_file, \
+    detect_codec, open_codec, read_data, read_info, verify_file
+
+
+def test_header(sample_text):
+    data = LZWApi.compress(sample_text, variable_width=True)
+    info = read_info(data)
+    assert data[:len(MAGIC)] == MAGIC
+    assert (info.version, info.codec_id) == (VERSION, TEXT)
+    assert info.flags & FLAG_VARIABLE_WIDTH and info.header_ok
+    _, offset, length, _ = info.section(DATA)
+    assert offset + length == len(data)
+
+
+def test_sections(tmp_path):
+    path = tmp_path / 'two.bin'
+    with ContainerWriter(str(path), IMAGE, tags=(b'META', DATA)) as container:
+        container.write(b'meta')
+        container.next_section()
+        container.write(b'data' * 100)
+    assert detect_codec(str(path)) == IMAGE
+    assert bytes(read_data(str(path))) == b'data' * 100
+    assert read_info(str(path)).section(b'META')[2] == 4
+    assert verify_file(str(path)) == []
+    with pytest.raises(ValueError):
+        read_info(str(path)).section(b'NONE')
+
+
+# A function that returns the data with the given byte inverted.
+# ------------------------------------------------------------------------------
+def damaged(data, position):
+    data = bytearray(data)
+    data[position] ^= 0xFF
+    return bytes(data)
+
+
+# A damaged codec id, flag or section table is found by the header CRC32
+# (before the data is decoded with a wrong codec).
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('position', [5, 7, HEADER.size + 4, HEADER.size + SECTION.size])
+def test_header_crc_mismatch(tmp_path, sample_text, position):
+    data = damaged(LZWApi.compress(sample_text), position)
+    with pytest.raises(ValueError, match='header'):
+        read_info(data)
+    with pytest.raises(ValueError, match='header'):
+        LZWApi.decompress(data)
+    assert not read_info(data, verify=False).header_ok
+    path = tmp_path / 'bad.bin'
+    path.write_bytes(data)
+    assert verify_file(str(path))[0] == HEAD
+    with pytest.raises(ValueError, match='header'):
+        decompress_file('bad', str(path), str(tmp_path / 'out.txt'))
+
+
+def test_header_crc_covers_the_crc(tmp_path, sample_text):
+    data = LZWApi.compress(sample_text)
+    position = HEADER.size + SECTION.size
+    data = data[:position] + bytes(HEADER_CRC.size) + data[position + HEADER_CRC.size:]
+    with pytest.raises(ValueError, match='header'):
+        read_info(data)
+
+
+def test_section_crc_mismatch(tmp_path, sample_text):
+    data = LZWApi.compress(sample_text)
+    data = damaged(data, len(data) - 10)
+    with pytest.raises(ValueError, match='DATA section'):
+        LZWApi.decompress(data)
+    path = tmp_path / 'bad.bin'
+    path.write_bytes(data)
+    assert verify_file(str(path)) == [DATA]
+
+
+@pytest.mark.parametrize('size', [len(MAGIC), HEADER.size - 1, HEADER.size + 5,
+                                  HEADER.size + SECTION.size + HEADER_CRC.size + 3, -1])
+def test_truncated_file(tmp_path, sample_text, size):
+    data = LZWApi.compress(sample_text)[:size]
+    with pytest.raises(ValueError, match='truncated|corrupted'):
+        LZWApi.decompress(data)
+    path = tmp_path / 'short.bin'
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match='truncated|corrupted'):
+        decompress_file('short', str(path), str(tmp_path / 'out.txt'))
+    if size > HEADER.size + SECTION.size:
+        assert verify_file(str(path)) == [DATA]
+
+
+# The files written without the container (and the output of compress_stream)
+# are returned as they are, so the level has to be chosen by the caller.
+# ------------------------------------------------------------------------------
+def test_legacy_fallback(tmp_path, sample_text):
+    legacy = bytes(read_data(LZWApi.compress(sample_text)))
+    assert legacy[:len(MAGIC)] != MAGIC
+    assert read_info(legacy) is None and detect_codec(legacy) is None
+    assert data_offset(legacy) == 0
+    assert bytes(read_data(legacy)) == legacy
+    assert LZWApi.decompress(legacy, level=TEXT) == sample_text.encode('latin-1')
+    path = tmp_path / 'legacy.bin'
+    path.write_bytes(legacy)
+    assert open_codec('legacy', str(path)) is None
+    with pytest.raises(ValueError, match='without the container'):
+        decompress_file('legacy', str(path))
+    with pytest.raises(ValueError, match='not a container'):
+        verify_file(str(path))
+
+
+def test_unsupported_version(sample_text):
+    data = bytearray(LZWApi.compress(sample_text))
+    data[len(MAGIC)] = VERSION + 1
+    with pytest.raises(ValueError, match='version'):
+        read_info(bytes(data))
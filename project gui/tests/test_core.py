@@ -0,0 +1,95 @@
+# The tests of the shared LZW dictionary engine (LZWCore) and the packing of
+# the code streams (LZWBits, LZWEntropy).
+import numpy as np
+import pytest
+from LZWBits import pack_code_stream, pack_codes, unpack_code_stream, unpack_codes
+from LZWCore import POLICIES, RESET, decode_bytes, decode_symbols, encode_symbols, \
+    peak_dict_size
+from LZWEntropy import ENTROPY_CODERS, RANGE, entropy_decode, entropy_encode
+
+INPUTS = [b'', b'a', b'aaaaaaa', b'TOBEORNOTTOBEORTOBEORNOT',
+          bytes(range(256)) * 3, b'abcabcabcd' * 500]
+# the dictionary sizes and policies (the policies only apply to a bounded
+# dictionary)
+DICTIONARIES = [(None, 'freeze')] + [(size, policy) for size in (260, 512)
+                                     for policy in POLICIES]
+
+
+def test_classic_example():
+    codes, _ = encode_symbols(b'TOBEORNOTTOBEORTOBEORNOT')
+    assert codes == [84, 79, 66, 69, 79, 82, 78, 79, 84, 256, 258, 260, 265, 259,
+                     261, 263]
+
+
+@pytest.mark.parametrize('data', INPUTS)
+@pytest.mark.parametrize('max_dict_size, policy', DICTIONARIES)
+def test_engine_round_trip(data, max_dict_size, policy):
+    codes, dict_size = encode_symbols(data, 256, max_dict_size, policy)
+    assert bytes(decode_symbols(codes, 256, max_dict_size, policy)) == data
+    assert decode_bytes(codes, len(data), 256, max_dict_size, policy) == data
+    assert peak_dict_size(codes, 256, max_dict_size, policy) == dict_size
+    if max_dict_size is not None:
+        assert max(codes, default=0) < max_dict_size
+
+
+def test_small_alphabet():
+    symbols = [0, 1, 2, 1, 0, 1, 2, 1, 0, 3] * 20
+    codes, _ = encode_symbols(symbols, alphabet_size=4)
+    assert list(decode_symbols(codes, alphabet_size=4)) == symbols
+
+
+def test_decode_bytes_checks_size():
+    codes, _ = encode_symbols(b'abcabc')
+    with pytest.raises(ValueError):
+        decode_bytes(codes, 10)
+
+
+@pytest.mark.parametrize('code_length', [1, 7, 8, 9, 12, 16, 24, 32, 40])
+def test_pack_codes(code_length):
+    rng = np.random.default_rng(code_length)
+    codes = rng.integers(0, 2 ** code_length, 1000, dtype=np.uint64)
+    packed, extra_padding = pack_codes(codes, code_length)
+    assert len(packed) * 8 - extra_padding == codes.size * code_length
+    np.testing.assert_array_equal(unpack_codes(packed, code_length, extra_padding), codes)
+
+
+def test_pack_codes_bit_order():
+    # the codes are written MSB first, one after the other
+    packed, extra_padding = pack_codes([0x1FF, 0, 0x155], 9)
+    assert packed == bytes([0xFF, 0x80, 0x2A, 0xA0]) and extra_padding == 5
+
+
+@pytest.mark.parametrize('policy', POLICIES)
+@pytest.mark.parametrize('variable_width, entropy', [(False, None), (True, None),
+                                                     (False, 'huffman'), (False, 'range')])
+def test_code_stream(policy, variable_width, entropy):
+    data = bytes(np.random.default_rng(7).integers(0, 4, 20000, dtype=np.uint8))
+    max_dict_size = 1 << 10
+    codes, _ = encode_symbols(data, 256, max_dict_size, policy)
+    packed, extra_padding, field = pack_code_stream(codes, 10, variable_width, policy,
+                                                    entropy=entropy)
+    unpacked = unpack_code_stream(packed, field, extra_padding)
+    assert unpacked.tolist() == codes
+    if policy == RESET:
+        assert 256 in codes   # the dictionary was reset at least once
+
+
+# A large alphabet (e.g., a palette) has low bits of the single symbols that are
+# not entropy coded, and the CLEAR code of the 'reset' policy is one of them.
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('coder', ENTROPY_CODERS)
+def test_entropy_large_alphabet(coder):
+    symbols = np.random.default_rng(3).integers(0, 9000, 20000) // 7
+    codes, _ = encode_symbols(symbols.tolist(), 9000, 1 << 14, RESET)
+    assert 9000 in codes   # the dictionary was reset at least once
+    coder_id = ENTROPY_CODERS.index(coder) + 1
+    data, _ = entropy_encode(codes, coder_id, 14, RESET, 9000)
+    assert entropy_decode(data, coder_id, 14, RESET, 9000).tolist() == codes
+
+
+def test_range_coder_truncated():
+    codes, _ = encode_symbols(b'abcabcabcd' * 500, 256, 1 << 10, RESET)
+    data, _ = entropy_encode(codes, RANGE, 10, RESET)
+    for size in (6, len(data) // 2, len(data) - 1):
+        with pytest.raises(ValueError):
+            entropy_decode(data[:size], RANGE, 10, RESET)
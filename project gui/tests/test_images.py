@@ -0,0 +1,69 @@
+# The tests of the image coding classes (Level 2-5): the round trips with every
+# dictionary policy, the variable-width codes, the entropy coders and the
+# options of each level, the file methods and the files written without the
+# container.
+import numpy as np
+import pytest
+from PIL import Image
+import LZWApi
+from LZWContainer import codec_class, read_data
+
+COMMON_OPTIONS = [{},
+                  {'variable_width': True},
+                  {'max_code_length': 10, 'policy': 'freeze'},
+                  {'max_code_length': 10, 'policy': 'reset'},
+                  {'max_code_length': 10, 'policy': 'lru'},
+                  {'max_code_length': 9, 'policy': 'reset', 'variable_width': True},
+                  {'entropy': 'huffman'},
+                  {'entropy': 'range', 'max_code_length': 10, 'policy': 'lru'}]
+LEVEL_OPTIONS = {2: [],
+                 3: [{'predictor': 'paeth'}, {'predictor': 'adaptive'}],
+                 4: [{'color_transform': 'ycocg'}, {'color_transform': 'subtract_green'},
+                     {'interleaved': True}, {'interleaved': True, 'entropy': 'huffman'}],
+                 5: [{'predictor': 'med'}, {'predictor': 'adaptive', 'color_transform': 'ycocg'}]}
+CASES = [(level, options) for level in (2, 3, 4, 5)
+         for options in COMMON_OPTIONS + LEVEL_OPTIONS[level]]
+
+
+def image_for(level, gray_image, rgb_image):
+    return gray_image if level in (2, 3) else rgb_image
+
+
+@pytest.mark.parametrize('level, options', CASES)
+def test_round_trip(level, options, gray_image, rgb_image):
+    image = image_for(level, gray_image, rgb_image)
+    decoded = LZWApi.decompress(LZWApi.compress(image, level, **options))
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, image)
+
+
+@pytest.mark.parametrize('level', [2, 3, 4, 5])
+@pytest.mark.parametrize('shape', [(1, 1), (1, 7), (9, 1), (3, 5)])
+def test_small_images(level, shape, make_image):
+    image = make_image(*shape, None if level in (2, 3) else 3)
+    np.testing.assert_array_equal(LZWApi.decompress(LZWApi.compress(image, level)), image)
+
+
+@pytest.mark.parametrize('level', [2, 3, 4, 5])
+def test_file_methods(level, tmp_path, gray_image, rgb_image):
+    image = image_for(level, gray_image, rgb_image)
+    Image.fromarray(image).save(tmp_path / 'in.png')
+    codec = codec_class(level)('in', 'image')
+    codec.compress_image_file(str(tmp_path / 'in.png'), str(tmp_path / 'in.bin'))
+    # the file holds the same bytes as the in-memory API
+    assert (tmp_path / 'in.bin').read_bytes() == LZWApi.compress(image, level)
+    codec.decompress_image_file(str(tmp_path / 'in.bin'), str(tmp_path / 'out.png'))
+    np.testing.assert_array_equal(np.array(Image.open(tmp_path / 'out.png')), image)
+    assert codec.stats.output_bytes == image.size
+
+
+# The DATA section of a container holds the layout of the files written before
+# the container was introduced, so it is read as such a file.
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('level', [2, 3, 4, 5])
+def test_legacy_file(level, gray_image, rgb_image):
+    image = image_for(level, gray_image, rgb_image)
+    legacy = bytes(read_data(LZWApi.compress(image, level)))
+    np.testing.assert_array_equal(LZWApi.decompress(legacy, level=level), image)
+    with pytest.raises(ValueError):
+        LZWApi.decompress(legacy)
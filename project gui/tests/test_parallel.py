@@ -0,0 +1,102 @@
+# The tests of the parallel coding (LZWParallel, LZWTiles, LZWBlocks) and of
+# the progress reports and the cancelling of a job through the progress
+# callback. The worker processes are forced (the tests may run on a single CPU)
+# and the size limits are lowered, so the small inputs are coded in parallel.
+import os
+import numpy as np
+import pytest
+import LZWBlocks
+import LZWParallel
+import LZWTiles
+from LZW import LZWCoding
+from LZWContainer import codec_class
+from LZWCore import Cancelled
+
+
+@pytest.fixture
+def many_cpus(monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    monkeypatch.setattr(LZWParallel, 'PARALLEL_MIN_PIXELS', 1)
+    monkeypatch.setattr(LZWTiles, 'PARALLEL_MIN_PIXELS', 1)
+    monkeypatch.setattr(LZWBlocks, 'PARALLEL_MIN_BYTES', 1)
+
+
+def image_for(level, gray_image, rgb_image):
+    return gray_image if level in (2, 3) else rgb_image
+
+
+# A function that compresses and decompresses the image with the given level
+# and options and returns the compressed data and the codec of the
+# decompression.
+# ------------------------------------------------------------------------------
+def image_round_trip(level, image, **options):
+    data = codec_class(level)('memory', 'image', **options).compress(image)
+    codec = codec_class(level)('memory', 'image', parallel=options.get('parallel', True))
+    np.testing.assert_array_equal(codec.decompress(data), image)
+    return data, codec
+
+
+@pytest.mark.parametrize('level, options', [(4, {}), (5, {}), (2, {'tile_size': 32}),
+                                            (3, {'tile_size': 32}), (4, {'tile_size': 48}),
+                                            (5, {'tile_size': 32, 'predictor': 'med'})])
+def test_parallel_images_match_serial(many_cpus, level, options, gray_image, rgb_image):
+    image = image_for(level, gray_image, rgb_image)
+    serial, _ = image_round_trip(level, image, parallel=False, **options)
+    parallel, codec = image_round_trip(level, image, parallel=True, **options)
+    assert parallel == serial
+    assert 'parallel' in codec.stats.stages
+
+
+@pytest.mark.parametrize('options', [{}, {'variable_width': True},
+                                     {'max_code_length': 10, 'policy': 'reset'}])
+def test_parallel_blocks_match_serial(many_cpus, sample_text, options):
+    serial = LZWCoding('memory', 'text', block_size=2000, parallel=False,
+                       **options).compress(sample_text)
+    codec = LZWCoding('memory', 'text', block_size=2000, **options)
+    assert codec.compress(sample_text) == serial
+    assert 'parallel' in codec.stats.stages
+    assert codec.decompress(serial) == sample_text
+    assert codec.stats.symbols == len(sample_text)
+
+
+def test_worker_count():
+    assert LZWBlocks.worker_count(False, 1 << 30, 100) == 0
+    assert LZWTiles.worker_count(True, 1, 100) == 0
+    assert LZWParallel.channel_workers(True, 1, 1, 3) == 0
+
+
+def test_progress_reports(many_cpus, rgb_image):
+    reports = []
+    codec = codec_class(4)('memory', 'image',
+                           progress=lambda *report: reports.append(report))
+    codec.compress(rgb_image)
+    channels = [report for report in reports if report[0] == 'channels']
+    assert channels and channels[-1][1] == channels[-1][2]
+    assert all(a[1] <= b[1] for a, b in zip(channels, channels[1:]))
+
+
+def cancel(stage, done, total):
+    raise Cancelled()
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+@pytest.mark.parametrize('level, options', [(2, {}), (3, {'tile_size': 32}), (4, {}),
+                                            (5, {'tile_size': 32})])
+def test_cancel_image(many_cpus, parallel, level, options, gray_image, rgb_image):
+    image = image_for(level, gray_image, rgb_image)
+    codec = codec_class(level)('memory', 'image', parallel=parallel, progress=cancel,
+                               **options)
+    with pytest.raises(Cancelled):
+        codec.compress(image)
+    data = codec_class(level)('memory', 'image', **options).compress(image)
+    with pytest.raises(Cancelled):
+        codec.decompress(data)
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+@pytest.mark.parametrize('block_size', [None, 2000])
+def test_cancel_text(many_cpus, parallel, block_size, sample_text):
+    codec = LZWCoding('memory', 'text', block_size=block_size, parallel=parallel,
+                      progress=cancel)
+    with pytest.raises(Cancelled):
+        codec.compress(sample_text)
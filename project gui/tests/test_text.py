@@ -0,0 +1,115 @@
+# The tests of the text coding class (Level 1): the round trips with every
+# dictionary policy, the variable-width codes, the entropy coders, the files
+# written without the container and the streaming encoder.
+import io
+import os
+import pytest
+import LZWApi
+from LZW import LZWCoding, LZWCompressor, compress_stream
+from LZWCore import encode_symbols
+
+OPTIONS = [{},
+           {'variable_width': True},
+           {'max_code_length': 10, 'policy': 'freeze'},
+           {'max_code_length': 10, 'policy': 'reset'},
+           {'max_code_length': 10, 'policy': 'lru'},
+           {'max_code_length': 9, 'policy': 'reset', 'variable_width': True},
+           {'max_code_length': 9, 'policy': 'lru', 'variable_width': True},
+           {'entropy': 'huffman'},
+           {'entropy': 'huffman', 'max_code_length': 10, 'policy': 'reset'},
+           {'entropy': 'range'},
+           {'entropy': 'range', 'max_code_length': 10, 'policy': 'lru'}]
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+def test_text_round_trip(sample_text, options):
+    data = LZWApi.compress(sample_text, **options)
+    assert LZWApi.decompress(data) == sample_text
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+def test_binary_round_trip(options):
+    raw = os.urandom(3000) + b'abcab' * 2000 + bytes(range(256))
+    assert LZWApi.decompress(LZWApi.compress(raw, **options)) == raw
+
+
+@pytest.mark.parametrize('text', ['', 'a', 'aa', 'abababab', '\n\n  trailing  \n'])
+def test_short_inputs(text):
+    assert LZWApi.decompress(LZWApi.compress(text)) == text
+
+
+def test_extended_ascii_text():
+    text = 'café ÿ ¼ ' * 50
+    assert LZWApi.decompress(LZWApi.compress(text)) == text
+
+
+# The text mode maps the characters to the 256 single symbols, so the other
+# characters are rejected and their UTF-8 bytes are coded in the binary mode.
+# ------------------------------------------------------------------------------
+@pytest.mark.parametrize('text', ['€', 'naïve €uro', 'ğüşıöç' * 10, '😀'])
+def test_text_outside_extended_ascii(tmp_path, text):
+    with pytest.raises(ValueError, match="data_type='binary'"):
+        LZWApi.compress(text)
+    with pytest.raises(ValueError, match="data_type='binary'"):
+        LZWCoding('memory', 'text').compress(text)
+    with pytest.raises(ValueError, match="data_type='binary'"):
+        LZWCompressor().compress(text)
+    path = tmp_path / 'utf8.txt'
+    path.write_text(text, encoding='utf-8')
+    with pytest.raises(ValueError, match="data_type='binary'"):
+        LZWCoding('utf8', 'text').compress_text_file(str(path), str(tmp_path / 'utf8.bin'))
+    raw = text.encode('utf-8')
+    assert LZWApi.decompress(LZWApi.compress(raw)).decode('utf-8') == text
+
+
+def test_bounded_dictionary_limits_code_length(sample_text):
+    codec = LZWCoding('memory', 'text', max_code_length=10, policy='reset')
+    codec.compress(sample_text)
+    assert codec.codelength == 10
+
+
+def test_file_methods(tmp_path, sample_text):
+    input_path, output_path = tmp_path / 'in.txt', tmp_path / 'out.txt'
+    raw = sample_text.encode('latin-1') + b'\r\n\t  \n'
+    input_path.write_bytes(raw)
+    codec = LZWCoding('in', 'binary')
+    codec.compress_text_file(str(input_path), str(tmp_path / 'in.bin'))
+    codec.decompress_text_file(str(tmp_path / 'in.bin'), str(output_path))
+    assert output_path.read_bytes() == raw
+    assert codec.stats.output_bytes == len(raw)
+
+
+# A function that writes the given text in the layout of the files of the
+# first version (without the container and the original size: the padding
+# info, the code length info and the codes with codelength bits each).
+# ------------------------------------------------------------------------------
+def legacy_file(text):
+    codes, dict_size = encode_symbols(text.encode('latin-1'))
+    codelength = max(dict_size - 1, 1).bit_length()
+    bits = ''.join(format(code, f'0{codelength}b') for code in codes)
+    extra_bits = -len(bits) % 8
+    bits = format(extra_bits, '08b') + format(codelength, '08b') + bits + '0' * extra_bits
+    return bytes(int(bits[i:i + 8], 2) for i in range(0, len(bits), 8))
+
+
+def test_legacy_file(tmp_path, sample_text):
+    data = legacy_file(sample_text)
+    assert LZWApi.decompress(data, level=1) == sample_text.encode('latin-1')
+    assert LZWCoding('memory', 'text').decompress(data) == sample_text
+    path = tmp_path / 'legacy.bin'
+    path.write_bytes(data)
+    LZWCoding('legacy', 'text').decompress_text_file(str(path), str(tmp_path / 'out.txt'))
+    assert (tmp_path / 'out.txt').read_text(encoding='latin-1') == sample_text
+
+
+def test_legacy_file_needs_level(sample_text):
+    with pytest.raises(ValueError):
+        LZWApi.decompress(legacy_file(sample_text))
+
+
+@pytest.mark.parametrize('variable_width', [False, True])
+def test_stream(sample_text, variable_width):
+    raw = sample_text.encode('latin-1') * 3
+    out = io.BytesIO()
+    compress_stream(io.BytesIO(raw), out, chunk_size=1000, variable_width=variable_width)
+    assert LZWApi.decompress(out.getvalue(), level=1) == raw
@@ -0,0 +1,99 @@
+# The tests of the partial decoding of the images: the tiled mode with the
+# decoding of a region (LZWTiles) and the decoding of a single channel of the
+# color levels.
+import numpy as np
+import pytest
+import LZWApi
+from LZWContainer import DATA, FLAG_TILED, codec_class, read_info
+from LZWTiles import is_tiled_file
+
+TILE_SIZE = 32
+REGIONS = [(0, 0, 1, 1), (0, 0, 120, 100), (31, 31, 2, 2), (10, 20, 70, 45),
+           (119, 99, 1, 1), (100, 90, 20, 10)]
+
+
+def image_for(level, gray_image, rgb_image):
+    return gray_image if level in (2, 3) else rgb_image
+
+
+@pytest.mark.parametrize('level', [2, 3, 4, 5])
+@pytest.mark.parametrize('options', [{}, {'variable_width': True},
+                                     {'max_code_length': 9, 'policy': 'lru'}])
+def test_tiled_round_trip(level, options, gray_image, rgb_image):
+    image = image_for(level, gray_image, rgb_image)
+    data = LZWApi.compress(image, level, tile_size=TILE_SIZE, **options)
+    assert is_tiled_file(data) and read_info(data).flags & FLAG_TILED
+    np.testing.assert_array_equal(LZWApi.decompress(data), image)
+
+
+@pytest.mark.parametrize('level', [2, 3, 4, 5])
+@pytest.mark.parametrize('x, y, w, h', REGIONS)
+def test_decompress_region(level, x, y, w, h, gray_image, rgb_image):
+    image = image_for(level, gray_image, rgb_image)
+    data = LZWApi.compress(image, level, tile_size=TILE_SIZE)
+    region = LZWApi.decompress_region(data, x, y, w, h)
+    np.testing.assert_array_equal(region, image[y:y + h, x:x + w])
+
+
+def test_region_decodes_only_the_covering_tiles(gray_image):
+    data = LZWApi.compress(gray_image, 2, tile_size=TILE_SIZE)
+    codec = codec_class(2)('memory', 'image')
+    codec.decode_region(40, 40, 10, 10, data)
+    assert codec.stats.symbols == TILE_SIZE * TILE_SIZE
+
+
+def test_region_from_file(tmp_path, rgb_image):
+    path = tmp_path / 'tiled.bin'
+    path.write_bytes(LZWApi.compress(rgb_image, 5, tile_size=TILE_SIZE))
+    region = codec_class(5)('tiled', 'image').decode_region(5, 6, 40, 30, str(path))
+    np.testing.assert_array_equal(region, rgb_image[6:36, 5:45])
+
+
+@pytest.mark.parametrize('x, y, w, h', [(100, 90, 50, 50), (-1, 0, 5, 5), (0, 0, 0, 5)])
+def test_region_outside_image(gray_image, x, y, w, h):
+    with pytest.raises(ValueError):
+        LZWApi.decompress_region(LZWApi.compress(gray_image, 2, tile_size=TILE_SIZE),
+                                 x, y, w, h)
+
+
+def test_region_needs_tiles(gray_image, sample_text):
+    with pytest.raises(ValueError):
+        LZWApi.decompress_region(LZWApi.compress(gray_image, 2), 0, 0, 1, 1)
+    with pytest.raises(ValueError):
+        LZWApi.decompress_region(LZWApi.compress(sample_text), 0, 0, 1, 1)
+
+
+@pytest.mark.parametrize('level, options', [(4, {}), (4, {'tile_size': TILE_SIZE}),
+                                            (4, {'interleaved': True}),
+                                            (4, {'color_transform': 'ycocg'}),
+                                            (5, {}), (5, {'tile_size': TILE_SIZE}),
+                                            (5, {'predictor': 'adaptive'}),
+                                            (5, {'color_transform': 'subtract_green'})])
+def test_decompress_channel(level, options, rgb_image):
+    data = LZWApi.compress(rgb_image, level, **options)
+    for index, name in enumerate('RGB'):
+        for channel in (index, name, name.lower()):
+            np.testing.assert_array_equal(LZWApi.decompress_channel(data, channel),
+                                          rgb_image[..., index])
+
+
+def test_channel_skips_damaged_channels(rgb_image):
+    data = bytearray(LZWApi.compress(rgb_image, 4))
+    # damage the end of the last (B) channel: G is still decoded, since the
+    # checksum is not verified for a single channel
+    data[-20:] = bytes(20)
+    np.testing.assert_array_equal(LZWApi.decompress_channel(bytes(data), 'G'),
+                                  rgb_image[..., 1])
+    with pytest.raises(ValueError, match=DATA.decode()):
+        LZWApi.decompress(bytes(data))
+
+
+@pytest.mark.parametrize('channel', [3, -1, 'X', 'RG'])
+def test_invalid_channel(channel, rgb_image):
+    with pytest.raises(ValueError):
+        LZWApi.decompress_channel(LZWApi.compress(rgb_image, 4), channel)
+
+
+def test_channel_needs_color(gray_image):
+    with pytest.raises(ValueError):
+        LZWApi.decompress_channel(LZWApi.compress(gray_image, 2), 0)